@@ -0,0 +1,94 @@
+-- ============================================
+-- DARUMA - Portfolio Snapshot Backfill
+-- ============================================
+-- Run this in Supabase SQL Editor after price_daily.sql and tax_lots.sql
+-- Fills portfolio_snapshots for every day of a range from the ledger
+-- and daily closes, in one INSERT: positions at the end of each day come
+-- from position_ledger (shares and open-lot cost after each transaction),
+-- prices are the last close on or before the day (price_daily). Value and
+-- cost follow holdings_with_value: open positions only, tickers without a
+-- price count as 0.
+--   client.rpc('backfill_portfolio_snapshots', {'p_from': '2022-01-01'})
+-- Existing snapshots are kept unless p_overwrite is true.
+-- ============================================
+
+CREATE OR REPLACE FUNCTION backfill_portfolio_snapshots(
+    p_from DATE DEFAULT NULL,
+    p_to DATE DEFAULT NULL,
+    p_overwrite BOOLEAN DEFAULT FALSE
+)
+RETURNS INTEGER AS $$
+DECLARE
+    first_day DATE := COALESCE(
+        p_from,
+        (SELECT (MIN(date) AT TIME ZONE 'UTC')::DATE FROM transactions)
+    );
+    last_day DATE := COALESCE(p_to, CURRENT_DATE - 1);
+    written INTEGER;
+BEGIN
+    IF first_day IS NULL OR first_day > last_day THEN
+        RETURN 0;
+    END IF;
+
+    WITH days AS (
+        SELECT generate_series(first_day, last_day, INTERVAL '1 day')::DATE AS day
+    ),
+    running AS (
+        SELECT
+            ticker,
+            (date AT TIME ZONE 'UTC')::DATE AS day,
+            shares,
+            total_cost AS cost,
+            ROW_NUMBER()
+                OVER (PARTITION BY ticker, (date AT TIME ZONE 'UTC')::DATE ORDER BY date DESC, transaction_id DESC) AS rn
+        FROM position_ledger
+        WHERE (date AT TIME ZONE 'UTC')::DATE <= last_day
+    ),
+    -- Position at the end of each day with transactions, valid until the next one
+    positions AS (
+        SELECT
+            ticker, day, shares, cost,
+            LEAD(day) OVER (PARTITION BY ticker ORDER BY day) AS next_day
+        FROM running
+        WHERE rn = 1
+    ),
+    -- Daily close, valid until the next day with a price
+    closes AS (
+        SELECT
+            ticker, day, close,
+            LEAD(day) OVER (PARTITION BY ticker ORDER BY day) AS next_day
+        FROM price_daily
+        WHERE day <= last_day
+    ),
+    daily AS (
+        SELECT
+            d.day,
+            SUM(p.shares * c.close) AS total_value,
+            SUM(p.cost) AS total_cost
+        FROM days d
+        JOIN positions p
+          ON p.day <= d.day
+         AND (p.next_day IS NULL OR d.day < p.next_day)
+        LEFT JOIN closes c
+          ON c.ticker = p.ticker
+         AND c.day <= d.day
+         AND (c.next_day IS NULL OR d.day < c.next_day)
+        WHERE p.shares > 0
+        GROUP BY d.day
+    )
+    INSERT INTO portfolio_snapshots (snapshot_date, total_value, total_cost)
+    SELECT day, COALESCE(total_value, 0), total_cost
+    FROM daily
+    ON CONFLICT (snapshot_date) DO UPDATE SET
+        total_value = EXCLUDED.total_value,
+        total_cost = EXCLUDED.total_cost,
+        recorded_at = NOW()
+    WHERE p_overwrite;
+
+    GET DIAGNOSTICS written = ROW_COUNT;
+    RETURN written;
+END;
+$$ LANGUAGE plpgsql;
+
+REVOKE EXECUTE ON FUNCTION backfill_portfolio_snapshots(DATE, DATE, BOOLEAN) FROM PUBLIC, anon;
+GRANT EXECUTE ON FUNCTION backfill_portfolio_snapshots(DATE, DATE, BOOLEAN) TO service_role;
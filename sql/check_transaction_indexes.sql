@@ -0,0 +1,43 @@
+-- ============================================
+-- DARUMA - Transaction Index Check
+-- ============================================
+-- Run this in Supabase SQL Editor after transaction_indexes.sql
+-- Builds a synthetic copy of transactions with the same indexes
+-- (200k rows, 50 tickers) and EXPLAIN ANALYZEs every access path.
+-- Run it in three steps, since the SQL Editor runs a script as one
+-- transaction and VACUUM is not allowed inside one:
+--   1. this file up to step 2
+--   2. VACUUM (ANALYZE) transactions_index_check;   (on its own)
+--   3. the rest of the file
+-- The VACUUM sets the visibility map; without it the planner costs a
+-- heap fetch per row and may pick Index or Bitmap scans instead. After
+-- it, each row of the result should show index_only = true and
+-- heap_fetches = 0. Step 3 drops the copy again.
+-- ============================================
+
+-- Step 1
+
+DROP TABLE IF EXISTS transactions_index_check;
+CREATE TABLE transactions_index_check (LIKE transactions INCLUDING DEFAULTS INCLUDING INDEXES);
+
+-- Explicit ids, so the real transactions sequence is not consumed
+INSERT INTO transactions_index_check (id, date, ticker, name, type, asset_type, quantity, price, total_amount)
+SELECT
+    g,
+    NOW() - make_interval(mins => g),
+    'SYN' || (g % 50),
+    'Synthetic ' || (g % 50),
+    CASE WHEN g % 7 = 0 THEN 'SELL' ELSE 'BUY' END,
+    'STOCK',
+    1 + (g % 13),
+    10 + (g % 500),
+    (1 + (g % 13)) * (10 + (g % 500))
+FROM generate_series(1, 200000) AS g;
+
+-- Step 2 (run on its own):
+-- VACUUM (ANALYZE) transactions_index_check;
+
+-- Step 3
+SELECT * FROM explain_transaction_paths('transactions_index_check');
+
+DROP TABLE transactions_index_check;
@@ -0,0 +1,46 @@
+-- ============================================
+-- DARUMA - Dashboard Bundle RPC
+-- ============================================
+-- Run this in Supabase SQL Editor after schema.sql
+-- Returns holdings, summary totals and a snapshot window in one JSON
+-- document, so the Home page loads with a single request:
+--   client.rpc('dashboard_bundle', {'p_days': 730})
+-- ============================================
+
+CREATE OR REPLACE FUNCTION dashboard_bundle(p_days INTEGER DEFAULT 365)
+RETURNS JSON AS $$
+    WITH holdings AS (
+        SELECT
+            ticker, name, asset_type, shares, avg_buy_price, total_cost,
+            current_price, current_value, pnl, pnl_percent
+        FROM holdings_with_value
+    ),
+    -- Same totals as the portfolio_summary view, from the rows above
+    summary AS (
+        SELECT
+            SUM(current_value) AS total_value,
+            SUM(total_cost) AS total_invested,
+            SUM(pnl) AS total_pnl,
+            CASE
+                WHEN SUM(total_cost) > 0
+                THEN SUM(pnl) / SUM(total_cost) * 100
+                ELSE 0
+            END AS total_pnl_percent,
+            COUNT(*) AS num_holdings
+        FROM holdings
+    ),
+    snapshots AS (
+        SELECT snapshot_date, total_value, total_cost
+        FROM portfolio_snapshots
+        WHERE p_days IS NULL OR snapshot_date >= CURRENT_DATE - p_days
+    )
+    SELECT json_build_object(
+        'holdings', COALESCE((SELECT json_agg(h) FROM holdings h), '[]'::json),
+        'summary', (SELECT row_to_json(s) FROM summary s),
+        'snapshots', COALESCE((SELECT json_agg(s ORDER BY s.snapshot_date) FROM snapshots s), '[]'::json)
+    );
+$$ LANGUAGE sql STABLE;
+
+-- Runs with the caller's rights (RLS applies); only the service_role key may call it
+REVOKE EXECUTE ON FUNCTION dashboard_bundle(INTEGER) FROM PUBLIC, anon;
+GRANT EXECUTE ON FUNCTION dashboard_bundle(INTEGER) TO service_role;
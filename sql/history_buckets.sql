@@ -0,0 +1,105 @@
+-- ============================================
+-- DARUMA - Downsampled History RPCs
+-- ============================================
+-- Run this in Supabase SQL Editor after schema.sql
+-- Bucket price history (OHLC per bucket) and portfolio snapshots (last
+-- per bucket) on the server, so charts get a few hundred points for any
+-- range. Give either a target point count or a bucket width:
+--   client.rpc('price_history_buckets',
+--              {'p_ticker': 'AAPL', 'p_days': 1825, 'p_points': 300})
+--   client.rpc('portfolio_snapshot_buckets', {'p_days': 730, 'p_bucket_days': 7})
+-- ============================================
+
+CREATE OR REPLACE FUNCTION price_history_buckets(
+    p_ticker VARCHAR,
+    p_days INTEGER DEFAULT 365,
+    p_points INTEGER DEFAULT 300,
+    p_bucket INTERVAL DEFAULT NULL
+)
+RETURNS TABLE (
+    bucket_start TIMESTAMPTZ,
+    recorded_at TIMESTAMPTZ,
+    open DECIMAL(18,4),
+    high DECIMAL(18,4),
+    low DECIMAL(18,4),
+    price DECIMAL(18,4),
+    n INTEGER
+) AS $$
+    WITH bounds AS (
+        SELECT COALESCE(
+            NOW() - make_interval(days => p_days),
+            (SELECT MIN(ph.recorded_at) FROM price_history ph WHERE ph.ticker = p_ticker)
+        ) AS since
+    ),
+    width AS (
+        SELECT since, COALESCE(
+            p_bucket,
+            GREATEST(
+                (NOW() - since) / GREATEST(p_points, 1),
+                INTERVAL '1 minute'
+            )
+        ) AS stride
+        FROM bounds
+    )
+    SELECT
+        date_bin(w.stride, ph.recorded_at, w.since) AS bucket_start,
+        MAX(ph.recorded_at) AS recorded_at,
+        (array_agg(ph.price ORDER BY ph.recorded_at, ph.id))[1] AS open,
+        MAX(ph.price) AS high,
+        MIN(ph.price) AS low,
+        (array_agg(ph.price ORDER BY ph.recorded_at DESC, ph.id DESC))[1] AS price,
+        COUNT(*)::INTEGER AS n
+    FROM price_history ph, width w
+    WHERE ph.ticker = p_ticker
+      AND ph.recorded_at >= w.since
+    GROUP BY 1
+    ORDER BY 1;
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION portfolio_snapshot_buckets(
+    p_days INTEGER DEFAULT NULL,
+    p_points INTEGER DEFAULT 300,
+    p_bucket_days INTEGER DEFAULT NULL
+)
+RETURNS TABLE (
+    snapshot_date DATE,
+    total_value DECIMAL(18,4),
+    total_cost DECIMAL(18,4),
+    n INTEGER
+) AS $$
+    WITH bounds AS (
+        SELECT COALESCE(
+            CURRENT_DATE - p_days,
+            (SELECT MIN(ps.snapshot_date) FROM portfolio_snapshots ps)
+        ) AS since
+    ),
+    width AS (
+        SELECT since, COALESCE(
+            p_bucket_days,
+            GREATEST(CEIL((CURRENT_DATE - since + 1)::NUMERIC / GREATEST(p_points, 1))::INTEGER, 1)
+        ) AS days
+        FROM bounds
+    ),
+    -- Last snapshot of each bucket
+    ranked AS (
+        SELECT
+            ps.snapshot_date, ps.total_value, ps.total_cost,
+            ROW_NUMBER() OVER (
+                PARTITION BY (ps.snapshot_date - w.since) / w.days
+                ORDER BY ps.snapshot_date DESC
+            ) AS rn,
+            COUNT(*) OVER (PARTITION BY (ps.snapshot_date - w.since) / w.days) AS n
+        FROM portfolio_snapshots ps, width w
+        WHERE ps.snapshot_date >= w.since
+    )
+    SELECT snapshot_date, total_value, total_cost, n::INTEGER
+    FROM ranked
+    WHERE rn = 1
+    ORDER BY snapshot_date;
+$$ LANGUAGE sql STABLE;
+
+-- Run with the caller's rights (RLS applies); only the service_role key may call them
+REVOKE EXECUTE ON FUNCTION price_history_buckets(VARCHAR, INTEGER, INTEGER, INTERVAL) FROM PUBLIC, anon;
+REVOKE EXECUTE ON FUNCTION portfolio_snapshot_buckets(INTEGER, INTEGER, INTEGER) FROM PUBLIC, anon;
+GRANT EXECUTE ON FUNCTION price_history_buckets(VARCHAR, INTEGER, INTEGER, INTERVAL) TO service_role;
+GRANT EXECUTE ON FUNCTION portfolio_snapshot_buckets(INTEGER, INTEGER, INTEGER) TO service_role;
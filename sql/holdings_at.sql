@@ -0,0 +1,56 @@
+-- ============================================
+-- DARUMA - Point-in-Time Holdings RPC
+-- ============================================
+-- Run this in Supabase SQL Editor after schema.sql
+-- Shares held per ticker at the end of each given (UTC) day, computed
+-- with running sums over the ledger in one set-based query:
+--   client.rpc('holdings_at', {'p_dates': ['2024-03-15', '2024-06-14']})
+--   client.rpc('holdings_at', {'p_dates': [...], 'p_tickers': ['AAPL']})
+-- Returns one JSON object {date: {ticker: shares}} (a single value, so
+-- the PostgREST row limit does not apply). Dates with no position are
+-- left out; closed or negative positions are omitted.
+-- ============================================
+
+CREATE OR REPLACE FUNCTION holdings_at(
+    p_dates DATE[],
+    p_tickers VARCHAR[] DEFAULT NULL
+)
+RETURNS JSON AS $$
+    WITH running AS (
+        SELECT
+            ticker,
+            (date AT TIME ZONE 'UTC')::DATE AS day,
+            SUM(CASE WHEN type = 'BUY' THEN quantity ELSE -quantity END)
+                OVER (PARTITION BY ticker ORDER BY date, id) AS shares,
+            ROW_NUMBER()
+                OVER (PARTITION BY ticker, (date AT TIME ZONE 'UTC')::DATE ORDER BY date DESC, id DESC) AS rn
+        FROM transactions
+        WHERE p_tickers IS NULL OR ticker = ANY(p_tickers)
+    ),
+    -- Position at the end of each day with transactions, valid until the next one
+    day_end AS (
+        SELECT
+            ticker, day, shares,
+            LEAD(day) OVER (PARTITION BY ticker ORDER BY day) AS next_day
+        FROM running
+        WHERE rn = 1
+    ),
+    positions AS (
+        SELECT d.as_of, de.ticker, de.shares
+        FROM unnest(p_dates) AS d(as_of)
+        JOIN day_end de
+          ON de.day <= d.as_of
+         AND (de.next_day IS NULL OR d.as_of < de.next_day)
+        WHERE de.shares > 0
+    )
+    SELECT COALESCE(json_object_agg(as_of, tickers), '{}'::json)
+    FROM (
+        SELECT as_of, json_object_agg(ticker, shares) AS tickers
+        FROM positions
+        GROUP BY as_of
+    ) per_date;
+$$ LANGUAGE sql STABLE;
+
+-- Runs with the caller's rights (RLS applies); only the service_role key may call it
+REVOKE EXECUTE ON FUNCTION holdings_at(DATE[], VARCHAR[]) FROM PUBLIC, anon;
+GRANT EXECUTE ON FUNCTION holdings_at(DATE[], VARCHAR[]) TO service_role;
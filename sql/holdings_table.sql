@@ -0,0 +1,211 @@
+-- ============================================
+-- DARUMA - Trigger-Maintained Holdings
+-- ============================================
+-- Run this in Supabase SQL Editor after schema.sql
+-- Keeps one row per ticker in the holdings table, updated by triggers
+-- on transactions, so current_holdings (and the views on top of it)
+-- read O(holdings) rows instead of aggregating the whole ledger.
+-- Inserts are applied as deltas; updates and deletes recompute only
+-- the touched tickers. To rebuild from scratch:
+--   client.rpc('rebuild_holdings')
+-- ============================================
+
+CREATE TABLE IF NOT EXISTS holdings (
+    ticker VARCHAR(20) PRIMARY KEY,
+    name VARCHAR(100),
+    asset_type VARCHAR(20),
+    shares DECIMAL NOT NULL DEFAULT 0,
+    total_cost DECIMAL NOT NULL DEFAULT 0,
+    -- Buy-side totals, for the average buy price
+    bought_quantity DECIMAL NOT NULL DEFAULT 0,
+    bought_cost DECIMAL NOT NULL DEFAULT 0,
+    first_buy_date TIMESTAMPTZ,
+    last_buy_date TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Recompute the rows of some tickers from their transactions
+CREATE OR REPLACE FUNCTION recompute_holdings(p_tickers VARCHAR[])
+RETURNS VOID AS $$
+BEGIN
+    DELETE FROM holdings WHERE ticker = ANY(p_tickers);
+
+    INSERT INTO holdings (
+        ticker, name, asset_type, shares, total_cost,
+        bought_quantity, bought_cost, first_buy_date, last_buy_date
+    )
+    SELECT
+        ticker,
+        MAX(name),
+        MAX(asset_type),
+        SUM(CASE WHEN type = 'BUY' THEN quantity ELSE -quantity END),
+        SUM(CASE WHEN type = 'BUY' THEN quantity * price ELSE -quantity * price END),
+        SUM(CASE WHEN type = 'BUY' THEN quantity ELSE 0 END),
+        SUM(CASE WHEN type = 'BUY' THEN quantity * price ELSE 0 END),
+        MIN(CASE WHEN type = 'BUY' THEN date END),
+        MAX(CASE WHEN type = 'BUY' THEN date END)
+    FROM transactions
+    WHERE ticker = ANY(p_tickers)
+    GROUP BY ticker;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION rebuild_holdings()
+RETURNS INTEGER AS $$
+DECLARE
+    rebuilt INTEGER;
+BEGIN
+    DELETE FROM holdings;
+    PERFORM recompute_holdings(ARRAY(SELECT DISTINCT ticker FROM transactions));
+    SELECT COUNT(*) INTO rebuilt FROM holdings;
+    RETURN rebuilt;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Inserts: add the per-ticker deltas of the whole statement (one upsert
+-- per import chunk). GREATEST ignores NULLs, like MAX in the old view.
+CREATE OR REPLACE FUNCTION apply_holdings_insert()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO holdings AS h (
+        ticker, name, asset_type, shares, total_cost,
+        bought_quantity, bought_cost, first_buy_date, last_buy_date
+    )
+    SELECT
+        ticker,
+        MAX(name),
+        MAX(asset_type),
+        SUM(CASE WHEN type = 'BUY' THEN quantity ELSE -quantity END),
+        SUM(CASE WHEN type = 'BUY' THEN quantity * price ELSE -quantity * price END),
+        SUM(CASE WHEN type = 'BUY' THEN quantity ELSE 0 END),
+        SUM(CASE WHEN type = 'BUY' THEN quantity * price ELSE 0 END),
+        MIN(CASE WHEN type = 'BUY' THEN date END),
+        MAX(CASE WHEN type = 'BUY' THEN date END)
+    FROM new_rows
+    GROUP BY ticker
+    ON CONFLICT (ticker) DO UPDATE SET
+        name = GREATEST(h.name, EXCLUDED.name),
+        asset_type = GREATEST(h.asset_type, EXCLUDED.asset_type),
+        shares = h.shares + EXCLUDED.shares,
+        total_cost = h.total_cost + EXCLUDED.total_cost,
+        bought_quantity = h.bought_quantity + EXCLUDED.bought_quantity,
+        bought_cost = h.bought_cost + EXCLUDED.bought_cost,
+        first_buy_date = LEAST(h.first_buy_date, EXCLUDED.first_buy_date),
+        last_buy_date = GREATEST(h.last_buy_date, EXCLUDED.last_buy_date),
+        updated_at = NOW();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Updates and deletes: recompute the tickers the statement touched
+CREATE OR REPLACE FUNCTION apply_holdings_update()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM recompute_holdings(ARRAY(
+        SELECT ticker FROM old_rows
+        UNION
+        SELECT ticker FROM new_rows
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION apply_holdings_delete()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM recompute_holdings(ARRAY(SELECT DISTINCT ticker FROM old_rows));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_transactions_holdings_insert ON transactions;
+CREATE TRIGGER trg_transactions_holdings_insert
+AFTER INSERT ON transactions
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION apply_holdings_insert();
+
+DROP TRIGGER IF EXISTS trg_transactions_holdings_update ON transactions;
+CREATE TRIGGER trg_transactions_holdings_update
+AFTER UPDATE ON transactions
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION apply_holdings_update();
+
+DROP TRIGGER IF EXISTS trg_transactions_holdings_delete ON transactions;
+CREATE TRIGGER trg_transactions_holdings_delete
+AFTER DELETE ON transactions
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION apply_holdings_delete();
+
+-- Backfill from the existing ledger
+SELECT rebuild_holdings();
+
+-- Views: same columns as before, now read from the holdings table
+DROP VIEW IF EXISTS portfolio_summary;
+DROP VIEW IF EXISTS holdings_with_value;
+DROP VIEW IF EXISTS current_holdings;
+
+CREATE VIEW current_holdings AS
+SELECT
+    ticker,
+    name,
+    asset_type,
+    shares,
+    total_cost,
+    CASE
+        WHEN bought_quantity > 0
+        THEN bought_cost / bought_quantity
+        ELSE 0
+    END as avg_buy_price,
+    first_buy_date,
+    last_buy_date
+FROM holdings
+WHERE shares > 0;
+
+CREATE VIEW holdings_with_value AS
+SELECT
+    h.ticker,
+    h.name,
+    h.asset_type,
+    h.shares,
+    h.avg_buy_price,
+    h.total_cost,
+    h.first_buy_date,
+    h.last_buy_date,
+    cp.price as current_price,
+    cp.updated_at as price_updated_at,
+    h.shares * cp.price as current_value,
+    (h.shares * cp.price) - h.total_cost as pnl,
+    CASE
+        WHEN h.total_cost > 0
+        THEN ((h.shares * cp.price) - h.total_cost) / h.total_cost * 100
+        ELSE 0
+    END as pnl_percent
+FROM current_holdings h
+LEFT JOIN current_prices cp ON h.ticker = cp.ticker;
+
+CREATE VIEW portfolio_summary AS
+SELECT
+    SUM(current_value) as total_value,
+    SUM(total_cost) as total_invested,
+    SUM(pnl) as total_pnl,
+    CASE
+        WHEN SUM(total_cost) > 0
+        THEN SUM(pnl) / SUM(total_cost) * 100
+        ELSE 0
+    END as total_pnl_percent,
+    COUNT(*) as num_holdings
+FROM holdings_with_value;
+
+ALTER TABLE holdings ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Block anon access to holdings" ON holdings;
+CREATE POLICY "Block anon access to holdings"
+ON holdings
+FOR ALL
+TO anon
+USING (false);
+
+REVOKE EXECUTE ON FUNCTION recompute_holdings(VARCHAR[]) FROM PUBLIC, anon;
+REVOKE EXECUTE ON FUNCTION rebuild_holdings() FROM PUBLIC, anon;
+GRANT EXECUTE ON FUNCTION recompute_holdings(VARCHAR[]) TO service_role;
+GRANT EXECUTE ON FUNCTION rebuild_holdings() TO service_role;
@@ -0,0 +1,54 @@
+-- ============================================
+-- DARUMA - Ledger Change Log
+-- ============================================
+-- Run this in Supabase SQL Editor after schema.sql
+-- Every insert/delete on transactions is recorded here so
+-- dividends and snapshots can be recomputed only for the
+-- touched tickers and dates (src/scripts/recompute_changes.py)
+-- ============================================
+
+CREATE TABLE IF NOT EXISTS ledger_changes (
+    id BIGSERIAL PRIMARY KEY,
+    transaction_id INTEGER NOT NULL,
+    operation VARCHAR(6) NOT NULL CHECK (operation IN ('INSERT', 'DELETE')),
+    ticker VARCHAR(20) NOT NULL,
+    date TIMESTAMPTZ NOT NULL,
+    type VARCHAR(20) NOT NULL,
+    quantity DECIMAL(18,8) NOT NULL,
+    price DECIMAL(18,4) NOT NULL,
+    changed_at TIMESTAMPTZ DEFAULT NOW(),
+    processed_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS idx_ledger_changes_pending
+ON ledger_changes(id) WHERE processed_at IS NULL;
+
+-- Updates are logged as a DELETE of the old row plus an INSERT of the new one
+CREATE OR REPLACE FUNCTION log_ledger_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        INSERT INTO ledger_changes (transaction_id, operation, ticker, date, type, quantity, price)
+        VALUES (OLD.id, 'DELETE', OLD.ticker, OLD.date, OLD.type, OLD.quantity, OLD.price);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO ledger_changes (transaction_id, operation, ticker, date, type, quantity, price)
+        VALUES (NEW.id, 'INSERT', NEW.ticker, NEW.date, NEW.type, NEW.quantity, NEW.price);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_transactions_ledger_changes ON transactions;
+CREATE TRIGGER trg_transactions_ledger_changes
+AFTER INSERT OR UPDATE OR DELETE ON transactions
+FOR EACH ROW EXECUTE FUNCTION log_ledger_change();
+
+ALTER TABLE ledger_changes ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Block anon access to ledger_changes" ON ledger_changes;
+CREATE POLICY "Block anon access to ledger_changes"
+ON ledger_changes
+FOR ALL
+TO anon
+USING (false);
@@ -0,0 +1,33 @@
+-- ============================================
+-- DARUMA - Pipeline Run Reports
+-- ============================================
+-- Run this in Supabase SQL Editor after schema.sql
+-- One row per update_prices.py run with the full JSON report
+-- (stage timings, fetch latency histogram, DB traffic, rows written)
+-- ============================================
+
+CREATE TABLE IF NOT EXISTS pipeline_runs (
+    id BIGSERIAL PRIMARY KEY,
+    started_at TIMESTAMPTZ NOT NULL,
+    finished_at TIMESTAMPTZ NOT NULL,
+    status VARCHAR(10) NOT NULL,
+    duration_seconds DECIMAL(10,3) NOT NULL,
+    report JSONB NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_pipeline_runs_started ON pipeline_runs(started_at);
+
+ALTER TABLE pipeline_runs ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Block anon access to pipeline_runs" ON pipeline_runs;
+CREATE POLICY "Block anon access to pipeline_runs"
+ON pipeline_runs
+FOR ALL
+TO anon
+USING (false);
+
+-- Example: slowest provider fetches over the last week
+-- SELECT started_at, t.key AS ticker, (t.value->>'seconds')::numeric AS seconds
+-- FROM pipeline_runs, jsonb_each(report->'fetch'->'per_ticker') t
+-- WHERE started_at > NOW() - INTERVAL '7 days'
+-- ORDER BY seconds DESC LIMIT 20;
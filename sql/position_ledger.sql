@@ -0,0 +1,35 @@
+-- ============================================
+-- DARUMA - Running Position Ledger
+-- ============================================
+-- Run this in Supabase SQL Editor after schema.sql, then tax_lots.sql
+-- Stores, for every transaction, the ticker's shares and open-lot cost
+-- (like current_holdings) right after it. The position at any time is
+-- then one index probe:
+--   SELECT shares, total_cost FROM position_ledger
+--   WHERE ticker = 'AAPL' AND date <= '2024-03-15 23:59:59+00'
+--   ORDER BY date DESC, transaction_id DESC LIMIT 1;
+-- The rows are written by the lot engine in tax_lots.sql
+-- (apply_lot_transaction), which also fills the table for the existing
+-- ledger. Full rebuild:
+--   client.rpc('rebuild_position_ledger')
+-- ============================================
+
+CREATE TABLE IF NOT EXISTS position_ledger (
+    transaction_id INTEGER PRIMARY KEY,
+    ticker VARCHAR(20) NOT NULL,
+    date TIMESTAMPTZ NOT NULL,
+    shares DECIMAL NOT NULL,
+    total_cost DECIMAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_position_ledger_ticker_date
+ON position_ledger(ticker, date DESC, transaction_id DESC) INCLUDE (shares, total_cost);
+
+ALTER TABLE position_ledger ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Block anon access to position_ledger" ON position_ledger;
+CREATE POLICY "Block anon access to position_ledger"
+ON position_ledger
+FOR ALL
+TO anon
+USING (false);
@@ -0,0 +1,158 @@
+-- ============================================
+-- DARUMA - Incremental Daily Prices
+-- ============================================
+-- Run this in Supabase SQL Editor after price_history_partitions.sql
+-- Keeps price_daily (one OHLC row per ticker per UTC day) up to date as
+-- prices are inserted, so daily consumers read one row per day instead
+-- of every intraday tick. Also replaces price_history_buckets (from
+-- history_buckets.sql) so buckets of a day or more read price_daily.
+-- ============================================
+
+-- Same merge as in price_history_partitions.sql, except n: from here on
+-- the insert trigger below has already merged every raw row into its
+-- daily bar, so rolling those rows up again must not count them twice
+CREATE OR REPLACE FUNCTION rollup_price_daily(p_source REGCLASS, p_before TIMESTAMPTZ)
+RETURNS INTEGER AS $$
+DECLARE
+    rolled INTEGER;
+BEGIN
+    EXECUTE format(
+        'INSERT INTO price_daily AS d (ticker, day, open, high, low, close, n, first_at, last_at)
+        SELECT
+            ticker,
+            (recorded_at AT TIME ZONE %L)::DATE,
+            (array_agg(price ORDER BY recorded_at, id))[1],
+            MAX(price),
+            MIN(price),
+            (array_agg(price ORDER BY recorded_at DESC, id DESC))[1],
+            COUNT(*),
+            MIN(recorded_at),
+            MAX(recorded_at)
+        FROM %s
+        WHERE recorded_at < %L
+        GROUP BY 1, 2
+        ON CONFLICT (ticker, day) DO UPDATE SET
+            open = CASE WHEN EXCLUDED.first_at < d.first_at THEN EXCLUDED.open ELSE d.open END,
+            high = GREATEST(d.high, EXCLUDED.high),
+            low = LEAST(d.low, EXCLUDED.low),
+            close = CASE WHEN EXCLUDED.last_at >= d.last_at THEN EXCLUDED.close ELSE d.close END,
+            n = GREATEST(d.n, EXCLUDED.n),
+            first_at = LEAST(d.first_at, EXCLUDED.first_at),
+            last_at = GREATEST(d.last_at, EXCLUDED.last_at)',
+        'UTC', p_source, p_before
+    );
+    GET DIAGNOSTICS rolled = ROW_COUNT;
+    RETURN rolled;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Merge the days touched by an insert statement (one upsert per batch)
+CREATE OR REPLACE FUNCTION apply_price_daily_insert()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO price_daily AS d (ticker, day, open, high, low, close, n, first_at, last_at)
+    SELECT
+        ticker,
+        (recorded_at AT TIME ZONE 'UTC')::DATE,
+        (array_agg(price ORDER BY recorded_at, id))[1],
+        MAX(price),
+        MIN(price),
+        (array_agg(price ORDER BY recorded_at DESC, id DESC))[1],
+        COUNT(*),
+        MIN(recorded_at),
+        MAX(recorded_at)
+    FROM new_rows
+    GROUP BY 1, 2
+    ON CONFLICT (ticker, day) DO UPDATE SET
+        open = CASE WHEN EXCLUDED.first_at < d.first_at THEN EXCLUDED.open ELSE d.open END,
+        high = GREATEST(d.high, EXCLUDED.high),
+        low = LEAST(d.low, EXCLUDED.low),
+        close = CASE WHEN EXCLUDED.last_at >= d.last_at THEN EXCLUDED.close ELSE d.close END,
+        n = d.n + EXCLUDED.n,
+        first_at = LEAST(d.first_at, EXCLUDED.first_at),
+        last_at = GREATEST(d.last_at, EXCLUDED.last_at);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_price_history_daily ON price_history;
+CREATE TRIGGER trg_price_history_daily
+AFTER INSERT ON price_history
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION apply_price_daily_insert();
+
+-- Backfill the days that still have raw rows (rolled-up days are kept)
+SELECT rollup_price_daily('price_history', 'infinity');
+
+-- Buckets of at least a day are built from price_daily, which also covers
+-- history older than the raw retention window
+CREATE OR REPLACE FUNCTION price_history_buckets(
+    p_ticker VARCHAR,
+    p_days INTEGER DEFAULT 365,
+    p_points INTEGER DEFAULT 300,
+    p_bucket INTERVAL DEFAULT NULL
+)
+RETURNS TABLE (
+    bucket_start TIMESTAMPTZ,
+    recorded_at TIMESTAMPTZ,
+    open DECIMAL(18,4),
+    high DECIMAL(18,4),
+    low DECIMAL(18,4),
+    price DECIMAL(18,4),
+    n INTEGER
+) AS $$
+DECLARE
+    since TIMESTAMPTZ;
+    stride INTERVAL;
+BEGIN
+    IF p_days IS NOT NULL THEN
+        since := NOW() - make_interval(days => p_days);
+    ELSE
+        SELECT MIN(pd.day)::TIMESTAMP AT TIME ZONE 'UTC' INTO since
+        FROM price_daily pd WHERE pd.ticker = p_ticker;
+        IF since IS NULL THEN
+            SELECT MIN(ph.recorded_at) INTO since
+            FROM price_history ph WHERE ph.ticker = p_ticker;
+        END IF;
+    END IF;
+
+    stride := COALESCE(
+        p_bucket,
+        GREATEST((NOW() - since) / GREATEST(p_points, 1), INTERVAL '1 minute')
+    );
+
+    IF stride >= INTERVAL '1 day' THEN
+        -- Align to UTC days so each daily row falls in exactly one bucket
+        since := date_trunc('day', since AT TIME ZONE 'UTC') AT TIME ZONE 'UTC';
+        RETURN QUERY
+        SELECT
+            date_bin(stride, pd.day::TIMESTAMP AT TIME ZONE 'UTC', since),
+            MAX(pd.last_at),
+            (array_agg(pd.open ORDER BY pd.day))[1],
+            MAX(pd.high),
+            MIN(pd.low),
+            (array_agg(pd.close ORDER BY pd.day DESC))[1],
+            SUM(pd.n)::INTEGER
+        FROM price_daily pd
+        WHERE pd.ticker = p_ticker
+          AND pd.day >= (since AT TIME ZONE 'UTC')::DATE
+        GROUP BY 1
+        ORDER BY 1;
+    ELSE
+        RETURN QUERY
+        SELECT
+            date_bin(stride, ph.recorded_at, since),
+            MAX(ph.recorded_at),
+            (array_agg(ph.price ORDER BY ph.recorded_at, ph.id))[1],
+            MAX(ph.price),
+            MIN(ph.price),
+            (array_agg(ph.price ORDER BY ph.recorded_at DESC, ph.id DESC))[1],
+            COUNT(*)::INTEGER
+        FROM price_history ph
+        WHERE ph.ticker = p_ticker
+          AND ph.recorded_at >= since
+        GROUP BY 1
+        ORDER BY 1;
+    END IF;
+END;
+$$ LANGUAGE plpgsql STABLE;
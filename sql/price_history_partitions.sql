@@ -0,0 +1,230 @@
+-- ============================================
+-- DARUMA - Partitioned Price History
+-- ============================================
+-- Run this in Supabase SQL Editor after schema.sql and enable_rls.sql
+-- Turns price_history into a table range-partitioned by month (UTC) and
+-- adds the price_daily OHLC rollup. maintain_price_history() creates the
+-- next months' partitions, rolls partitions older than the raw window up
+-- into price_daily and drops them:
+--   client.rpc('maintain_price_history', {'p_raw_days': 90})
+-- Safe to run again: an already partitioned table is left as is, and
+-- maintenance only touches partitions that are missing or expired.
+-- ============================================
+
+-- One row per ticker per UTC day; first_at/last_at are the times of the
+-- day's first and last tick, so rows rolled up in several passes (e.g.
+-- late rows left in the default partition) merge into the right bar
+CREATE TABLE IF NOT EXISTS price_daily (
+    ticker VARCHAR(20) NOT NULL,
+    day DATE NOT NULL,
+    open DECIMAL(18,4) NOT NULL,
+    high DECIMAL(18,4) NOT NULL,
+    low DECIMAL(18,4) NOT NULL,
+    close DECIMAL(18,4) NOT NULL,
+    n INTEGER NOT NULL,
+    first_at TIMESTAMPTZ,
+    last_at TIMESTAMPTZ,
+    PRIMARY KEY (ticker, day)
+);
+
+-- Create the partition of one month (price_history_pYYYY_MM) if missing.
+-- Rows that landed in the default partition for that month are moved in.
+CREATE OR REPLACE FUNCTION ensure_price_history_partition(p_month DATE)
+RETURNS BOOLEAN AS $$
+DECLARE
+    month_start DATE := date_trunc('month', p_month)::DATE;
+    part TEXT := 'price_history_p' || to_char(month_start, 'YYYY_MM');
+    lower_bound TIMESTAMPTZ := month_start::TIMESTAMP AT TIME ZONE 'UTC';
+    upper_bound TIMESTAMPTZ := (month_start + INTERVAL '1 month')::TIMESTAMP AT TIME ZONE 'UTC';
+BEGIN
+    IF to_regclass(part) IS NOT NULL THEN
+        RETURN FALSE;
+    END IF;
+
+    EXECUTE format('CREATE TABLE %I (LIKE price_history INCLUDING DEFAULTS)', part);
+    IF to_regclass('price_history_default') IS NOT NULL THEN
+        EXECUTE format(
+            'WITH moved AS (
+                DELETE FROM price_history_default
+                WHERE recorded_at >= %L AND recorded_at < %L
+                RETURNING *
+            )
+            INSERT INTO %I SELECT * FROM moved',
+            lower_bound, upper_bound, part
+        );
+    END IF;
+    EXECUTE format(
+        'ALTER TABLE price_history ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+        part, lower_bound, upper_bound
+    );
+    -- Partitions are reachable on their own; keep them closed to anon too
+    EXECUTE format('ALTER TABLE %I ENABLE ROW LEVEL SECURITY', part);
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Convert the plain table once: copy rows into monthly partitions, keeping
+-- ids (and the id sequence)
+DO $$
+DECLARE
+    first_month DATE;
+    month_start DATE;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'price_history'::regclass) = 'p' THEN
+        RETURN;
+    END IF;
+
+    ALTER TABLE price_history RENAME TO price_history_unpartitioned;
+    ALTER INDEX IF EXISTS idx_price_history_ticker_date RENAME TO idx_price_history_unpartitioned;
+    ALTER SEQUENCE price_history_id_seq OWNED BY NONE;
+
+    -- The partition key must be part of the primary key
+    CREATE TABLE price_history (
+        id INTEGER NOT NULL DEFAULT nextval('price_history_id_seq'),
+        ticker VARCHAR(20) NOT NULL,
+        price DECIMAL(18,4) NOT NULL,
+        currency VARCHAR(3) DEFAULT 'USD',
+        recorded_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        PRIMARY KEY (id, recorded_at)
+    ) PARTITION BY RANGE (recorded_at);
+    ALTER SEQUENCE price_history_id_seq OWNED BY price_history.id;
+
+    CREATE TABLE price_history_default PARTITION OF price_history DEFAULT;
+    ALTER TABLE price_history_default ENABLE ROW LEVEL SECURITY;
+
+    SELECT date_trunc('month', MIN(recorded_at) AT TIME ZONE 'UTC')::DATE
+    INTO first_month
+    FROM price_history_unpartitioned;
+
+    month_start := COALESCE(first_month, date_trunc('month', NOW() AT TIME ZONE 'UTC')::DATE);
+    WHILE month_start <= date_trunc('month', NOW() AT TIME ZONE 'UTC') + INTERVAL '2 months' LOOP
+        PERFORM ensure_price_history_partition(month_start);
+        month_start := (month_start + INTERVAL '1 month')::DATE;
+    END LOOP;
+
+    INSERT INTO price_history (id, ticker, price, currency, recorded_at)
+    SELECT id, ticker, price, currency, COALESCE(recorded_at, NOW())
+    FROM price_history_unpartitioned;
+
+    DROP TABLE price_history_unpartitioned;
+END $$;
+
+-- Created on the parent, so every partition (current and future) gets it
+CREATE INDEX IF NOT EXISTS idx_price_history_ticker_date
+ON price_history(ticker, recorded_at);
+
+-- Roll whole UTC days of raw rows up into price_daily, merging into a bar
+-- already rolled up from other rows of the same day
+CREATE OR REPLACE FUNCTION rollup_price_daily(p_source REGCLASS, p_before TIMESTAMPTZ)
+RETURNS INTEGER AS $$
+DECLARE
+    rolled INTEGER;
+BEGIN
+    EXECUTE format(
+        'INSERT INTO price_daily AS d (ticker, day, open, high, low, close, n, first_at, last_at)
+        SELECT
+            ticker,
+            (recorded_at AT TIME ZONE %L)::DATE,
+            (array_agg(price ORDER BY recorded_at, id))[1],
+            MAX(price),
+            MIN(price),
+            (array_agg(price ORDER BY recorded_at DESC, id DESC))[1],
+            COUNT(*),
+            MIN(recorded_at),
+            MAX(recorded_at)
+        FROM %s
+        WHERE recorded_at < %L
+        GROUP BY 1, 2
+        ON CONFLICT (ticker, day) DO UPDATE SET
+            open = CASE WHEN EXCLUDED.first_at < d.first_at THEN EXCLUDED.open ELSE d.open END,
+            high = GREATEST(d.high, EXCLUDED.high),
+            low = LEAST(d.low, EXCLUDED.low),
+            close = CASE WHEN EXCLUDED.last_at >= d.last_at THEN EXCLUDED.close ELSE d.close END,
+            n = d.n + EXCLUDED.n,
+            first_at = LEAST(d.first_at, EXCLUDED.first_at),
+            last_at = GREATEST(d.last_at, EXCLUDED.last_at)',
+        'UTC', p_source, p_before
+    );
+    GET DIAGNOSTICS rolled = ROW_COUNT;
+    RETURN rolled;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION maintain_price_history(
+    p_raw_days INTEGER DEFAULT 90,
+    p_months_ahead INTEGER DEFAULT 2
+)
+RETURNS JSON AS $$
+DECLARE
+    -- Raw rows older than this are kept only as daily rollups
+    raw_since TIMESTAMPTZ := NOW() - make_interval(days => p_raw_days);
+    this_month DATE := date_trunc('month', NOW() AT TIME ZONE 'UTC')::DATE;
+    part RECORD;
+    created INTEGER := 0;
+    dropped INTEGER := 0;
+    rolled INTEGER := 0;
+    i INTEGER;
+BEGIN
+    FOR i IN 0..p_months_ahead LOOP
+        IF ensure_price_history_partition((this_month + make_interval(months => i))::DATE) THEN
+            created := created + 1;
+        END IF;
+    END LOOP;
+
+    FOR part IN
+        SELECT c.oid::REGCLASS AS relid, c.relname,
+               to_date(substring(c.relname FROM 16), 'YYYY_MM') AS month_start
+        FROM pg_inherits inh
+        JOIN pg_class c ON c.oid = inh.inhrelid
+        WHERE inh.inhparent = 'price_history'::REGCLASS
+          AND c.relname ~ '^price_history_p[0-9]{4}_[0-9]{2}$'
+        ORDER BY c.relname
+    LOOP
+        -- Whole month older than the raw window: the partition holds whole days
+        EXIT WHEN ((part.month_start + INTERVAL '1 month')::TIMESTAMP AT TIME ZONE 'UTC') > raw_since;
+        rolled := rolled + rollup_price_daily(part.relid, 'infinity');
+        EXECUTE format('DROP TABLE %I', part.relname);
+        dropped := dropped + 1;
+    END LOOP;
+
+    -- Stray old rows in the default partition: roll up their whole days
+    IF to_regclass('price_history_default') IS NOT NULL THEN
+        rolled := rolled + rollup_price_daily(
+            'price_history_default',
+            date_trunc('day', raw_since AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'
+        );
+        DELETE FROM price_history_default
+        WHERE recorded_at < date_trunc('day', raw_since AT TIME ZONE 'UTC') AT TIME ZONE 'UTC';
+    END IF;
+
+    RETURN json_build_object(
+        'partitions_created', created,
+        'partitions_dropped', dropped,
+        'daily_rows', rolled
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+ALTER TABLE price_history ENABLE ROW LEVEL SECURITY;
+ALTER TABLE price_daily ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Block anon access to price_history" ON price_history;
+CREATE POLICY "Block anon access to price_history"
+ON price_history
+FOR ALL
+TO anon
+USING (false);
+
+DROP POLICY IF EXISTS "Block anon access to price_daily" ON price_daily;
+CREATE POLICY "Block anon access to price_daily"
+ON price_daily
+FOR ALL
+TO anon
+USING (false);
+
+REVOKE EXECUTE ON FUNCTION ensure_price_history_partition(DATE) FROM PUBLIC, anon;
+REVOKE EXECUTE ON FUNCTION rollup_price_daily(REGCLASS, TIMESTAMPTZ) FROM PUBLIC, anon;
+REVOKE EXECUTE ON FUNCTION maintain_price_history(INTEGER, INTEGER) FROM PUBLIC, anon;
+GRANT EXECUTE ON FUNCTION ensure_price_history_partition(DATE) TO service_role;
+GRANT EXECUTE ON FUNCTION rollup_price_daily(REGCLASS, TIMESTAMPTZ) TO service_role;
+GRANT EXECUTE ON FUNCTION maintain_price_history(INTEGER, INTEGER) TO service_role;
@@ -0,0 +1,21 @@
+-- ============================================
+-- DARUMA - Refresh State (tiered price updates)
+-- ============================================
+-- Run this in Supabase SQL Editor after schema.sql
+-- Stores when each refresh tier / job last ran so the
+-- scheduler in update_prices.py can decide what is due
+-- ============================================
+
+CREATE TABLE IF NOT EXISTS refresh_state (
+    name VARCHAR(30) PRIMARY KEY,
+    last_run_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+ALTER TABLE refresh_state ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Block anon access to refresh_state" ON refresh_state;
+CREATE POLICY "Block anon access to refresh_state"
+ON refresh_state
+FOR ALL
+TO anon
+USING (false);
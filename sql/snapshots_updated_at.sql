@@ -0,0 +1,30 @@
+-- ============================================
+-- DARUMA - Snapshot Modification Time
+-- ============================================
+-- Run this in Supabase SQL Editor after schema.sql
+-- portfolio_snapshots.updated_at is set by the server on every insert and
+-- update, so it only moves forward. recorded_at is not: the ledger
+-- recompute writes it as the time of the last change it applied, which
+-- is in the past, so readers that sync incrementally (the local mirror)
+-- use updated_at instead. Existing rows get the time this script runs,
+-- so mirrors re-pull them once.
+-- ============================================
+
+ALTER TABLE portfolio_snapshots ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT NOW();
+
+CREATE OR REPLACE FUNCTION set_snapshot_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at := NOW();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_portfolio_snapshots_updated_at ON portfolio_snapshots;
+CREATE TRIGGER trg_portfolio_snapshots_updated_at
+BEFORE INSERT OR UPDATE ON portfolio_snapshots
+FOR EACH ROW EXECUTE FUNCTION set_snapshot_updated_at();
+
+-- Keyset pages of the mirror sync: (updated_at, id) from a watermark
+CREATE INDEX IF NOT EXISTS idx_portfolio_snapshots_updated_at
+ON portfolio_snapshots(updated_at, id);
@@ -0,0 +1,483 @@
+-- ============================================
+-- DARUMA - Tax Lots and Realized P&L
+-- ============================================
+-- Run this in Supabase SQL Editor after holdings_table.sql and
+-- position_ledger.sql
+-- Every BUY opens a lot; every SELL consumes open lots, FIFO or at
+-- average cost (lot_settings.method), and books realized P&L per lot in
+-- realized_pnl. Shares sold beyond the position open a short lot that
+-- later buys cover, so the lots always net to the ticker's shares.
+-- Triggers on transactions keep everything up to date: transactions
+-- newer than the last one applied to a ticker are applied incrementally,
+-- anything else (backdated inserts, edits, deletes) replays that ticker.
+-- Cost basis means open-lot cost everywhere: current_holdings, and
+-- position_ledger, which the lot engine now writes (so snapshot backfill
+-- and point-in-time positions agree with the holdings views).
+-- The holdings table (holdings_table.sql) keeps shares, names and buy
+-- dates only; its net-cost columns are dropped.
+-- Switch methods (replays every ticker):
+--   UPDATE lot_settings SET method = 'AVERAGE';
+-- ============================================
+
+CREATE TABLE IF NOT EXISTS lot_settings (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    method VARCHAR(10) NOT NULL DEFAULT 'FIFO' CHECK (method IN ('FIFO', 'AVERAGE')),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+INSERT INTO lot_settings (id) VALUES (TRUE) ON CONFLICT (id) DO NOTHING;
+
+-- One lot per BUY transaction, plus a short lot (negative quantity,
+-- cost_per_share = sale price) per SELL larger than the open position
+CREATE TABLE IF NOT EXISTS tax_lots (
+    id BIGSERIAL PRIMARY KEY,
+    transaction_id INTEGER NOT NULL UNIQUE,
+    ticker VARCHAR(20) NOT NULL,
+    opened_at TIMESTAMPTZ NOT NULL,
+    quantity DECIMAL(18,8) NOT NULL,
+    remaining DECIMAL NOT NULL,
+    cost_per_share DECIMAL(18,4) NOT NULL,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_tax_lots_open
+ON tax_lots(ticker, opened_at, transaction_id) INCLUDE (remaining, cost_per_share)
+WHERE remaining > 0;
+
+CREATE INDEX IF NOT EXISTS idx_tax_lots_short
+ON tax_lots(ticker, opened_at, transaction_id)
+WHERE remaining < 0;
+
+-- One row per (SELL, lot consumed); for a covered short lot,
+-- sell_transaction_id is the short sale and lot_transaction_id the buy
+CREATE TABLE IF NOT EXISTS realized_pnl (
+    id BIGSERIAL PRIMARY KEY,
+    ticker VARCHAR(20) NOT NULL,
+    sell_transaction_id INTEGER NOT NULL,
+    lot_transaction_id INTEGER NOT NULL,
+    closed_at TIMESTAMPTZ NOT NULL,
+    quantity DECIMAL NOT NULL,
+    proceeds DECIMAL NOT NULL,
+    cost DECIMAL NOT NULL,
+    realized DECIMAL GENERATED ALWAYS AS (proceeds - cost) STORED,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_realized_pnl_ticker
+ON realized_pnl(ticker, closed_at);
+
+-- Last transaction applied per ticker, to tell appends from backdated
+-- edits, and the shares after it
+CREATE TABLE IF NOT EXISTS lot_state (
+    ticker VARCHAR(20) PRIMARY KEY,
+    last_date TIMESTAMPTZ NOT NULL,
+    last_id INTEGER NOT NULL,
+    shares DECIMAL NOT NULL DEFAULT 0
+);
+
+-- Apply one transaction to its ticker's lots and write its position_ledger row
+CREATE OR REPLACE FUNCTION apply_lot_transaction(p_tx transactions, p_method VARCHAR)
+RETURNS VOID AS $$
+DECLARE
+    lot RECORD;
+    left_qty DECIMAL := p_tx.quantity;
+    take DECIMAL;
+    open_qty DECIMAL;
+    ratio DECIMAL;
+    position_shares DECIMAL;
+    position_cost DECIMAL;
+BEGIN
+    IF p_tx.type = 'BUY' THEN
+        -- Cover short lots first, oldest first
+        FOR lot IN
+            SELECT transaction_id, remaining, cost_per_share
+            FROM tax_lots
+            WHERE ticker = p_tx.ticker AND remaining < 0
+            ORDER BY opened_at, transaction_id
+        LOOP
+            EXIT WHEN left_qty <= 0;
+            take := LEAST(-lot.remaining, left_qty);
+
+            INSERT INTO realized_pnl (ticker, sell_transaction_id, lot_transaction_id,
+                                      closed_at, quantity, proceeds, cost)
+            VALUES (p_tx.ticker, lot.transaction_id, p_tx.id, p_tx.date,
+                    take, take * lot.cost_per_share, take * p_tx.price);
+
+            UPDATE tax_lots
+            SET remaining = remaining + take, updated_at = NOW()
+            WHERE transaction_id = lot.transaction_id;
+
+            left_qty := left_qty - take;
+        END LOOP;
+
+        INSERT INTO tax_lots (transaction_id, ticker, opened_at, quantity, remaining, cost_per_share)
+        VALUES (p_tx.id, p_tx.ticker, p_tx.date, p_tx.quantity, left_qty, p_tx.price);
+
+    ELSE
+        IF p_method = 'AVERAGE' THEN
+            -- Every open lot gives up the same fraction, so the average cost
+            -- of what is left does not change
+            SELECT SUM(remaining) INTO open_qty
+            FROM tax_lots
+            WHERE ticker = p_tx.ticker AND remaining > 0;
+
+            IF open_qty > 0 THEN
+                take := LEAST(left_qty, open_qty);
+                ratio := take / open_qty;
+
+                INSERT INTO realized_pnl (ticker, sell_transaction_id, lot_transaction_id,
+                                          closed_at, quantity, proceeds, cost)
+                SELECT ticker, p_tx.id, transaction_id, p_tx.date,
+                       remaining * ratio,
+                       remaining * ratio * p_tx.price,
+                       remaining * ratio * cost_per_share
+                FROM tax_lots
+                WHERE ticker = p_tx.ticker AND remaining > 0;
+
+                UPDATE tax_lots
+                SET remaining = CASE WHEN take = open_qty THEN 0 ELSE remaining - remaining * ratio END,
+                    updated_at = NOW()
+                WHERE ticker = p_tx.ticker AND remaining > 0;
+
+                left_qty := left_qty - take;
+            END IF;
+
+        ELSE
+            FOR lot IN
+                SELECT transaction_id, remaining, cost_per_share
+                FROM tax_lots
+                WHERE ticker = p_tx.ticker AND remaining > 0
+                ORDER BY opened_at, transaction_id
+            LOOP
+                EXIT WHEN left_qty <= 0;
+                take := LEAST(lot.remaining, left_qty);
+
+                INSERT INTO realized_pnl (ticker, sell_transaction_id, lot_transaction_id,
+                                          closed_at, quantity, proceeds, cost)
+                VALUES (p_tx.ticker, p_tx.id, lot.transaction_id, p_tx.date,
+                        take, take * p_tx.price, take * lot.cost_per_share);
+
+                UPDATE tax_lots
+                SET remaining = remaining - take, updated_at = NOW()
+                WHERE transaction_id = lot.transaction_id;
+
+                left_qty := left_qty - take;
+            END LOOP;
+        END IF;
+
+        -- Sold beyond the position: a short lot, covered by later buys
+        IF left_qty > 0 THEN
+            INSERT INTO tax_lots (transaction_id, ticker, opened_at, quantity, remaining, cost_per_share)
+            VALUES (p_tx.id, p_tx.ticker, p_tx.date, -left_qty, -left_qty, p_tx.price);
+        END IF;
+    END IF;
+
+    INSERT INTO lot_state (ticker, last_date, last_id, shares)
+    VALUES (p_tx.ticker, p_tx.date, p_tx.id,
+            CASE WHEN p_tx.type = 'BUY' THEN p_tx.quantity ELSE -p_tx.quantity END)
+    ON CONFLICT (ticker) DO UPDATE SET
+        last_date = EXCLUDED.last_date,
+        last_id = EXCLUDED.last_id,
+        shares = lot_state.shares + EXCLUDED.shares
+    RETURNING shares INTO position_shares;
+
+    SELECT COALESCE(SUM(remaining * cost_per_share), 0) INTO position_cost
+    FROM tax_lots
+    WHERE ticker = p_tx.ticker AND remaining > 0;
+
+    INSERT INTO position_ledger (transaction_id, ticker, date, shares, total_cost)
+    VALUES (p_tx.id, p_tx.ticker, p_tx.date, position_shares, position_cost)
+    ON CONFLICT (transaction_id) DO UPDATE SET
+        ticker = EXCLUDED.ticker,
+        date = EXCLUDED.date,
+        shares = EXCLUDED.shares,
+        total_cost = EXCLUDED.total_cost;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Replay the lots of some tickers (all when NULL) from their transactions
+CREATE OR REPLACE FUNCTION rebuild_tax_lots(p_tickers VARCHAR[] DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    lot_method VARCHAR := (SELECT method FROM lot_settings);
+    tx transactions;
+    replayed INTEGER := 0;
+BEGIN
+    DELETE FROM realized_pnl WHERE p_tickers IS NULL OR ticker = ANY(p_tickers);
+    DELETE FROM tax_lots WHERE p_tickers IS NULL OR ticker = ANY(p_tickers);
+    DELETE FROM lot_state WHERE p_tickers IS NULL OR ticker = ANY(p_tickers);
+    DELETE FROM position_ledger WHERE p_tickers IS NULL OR ticker = ANY(p_tickers);
+
+    FOR tx IN
+        SELECT * FROM transactions
+        WHERE p_tickers IS NULL OR ticker = ANY(p_tickers)
+        ORDER BY ticker, date, id
+    LOOP
+        PERFORM apply_lot_transaction(tx, lot_method);
+        replayed := replayed + 1;
+    END LOOP;
+
+    RETURN replayed;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Inserts: append when every new row of a ticker is after the last one
+-- applied, otherwise replay the ticker
+CREATE OR REPLACE FUNCTION apply_tax_lots_insert()
+RETURNS TRIGGER AS $$
+DECLARE
+    lot_method VARCHAR := (SELECT method FROM lot_settings);
+    touched RECORD;
+    tx transactions;
+    replay VARCHAR[] := '{}';
+BEGIN
+    FOR touched IN
+        SELECT DISTINCT ON (n.ticker) n.ticker, n.date, n.id, s.last_date, s.last_id
+        FROM new_rows n
+        LEFT JOIN lot_state s ON s.ticker = n.ticker
+        ORDER BY n.ticker, n.date, n.id
+    LOOP
+        IF touched.last_date IS NOT NULL
+           AND (touched.date, touched.id) > (touched.last_date, touched.last_id) THEN
+            FOR tx IN
+                SELECT * FROM new_rows WHERE ticker = touched.ticker ORDER BY date, id
+            LOOP
+                PERFORM apply_lot_transaction(tx, lot_method);
+            END LOOP;
+        ELSE
+            replay := replay || touched.ticker;
+        END IF;
+    END LOOP;
+
+    IF cardinality(replay) > 0 THEN
+        PERFORM rebuild_tax_lots(replay);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION apply_tax_lots_update()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM rebuild_tax_lots(ARRAY(
+        SELECT ticker FROM old_rows
+        UNION
+        SELECT ticker FROM new_rows
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION apply_tax_lots_delete()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM rebuild_tax_lots(ARRAY(SELECT DISTINCT ticker FROM old_rows));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION apply_lot_method_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM rebuild_tax_lots();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_transactions_tax_lots_insert ON transactions;
+CREATE TRIGGER trg_transactions_tax_lots_insert
+AFTER INSERT ON transactions
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION apply_tax_lots_insert();
+
+DROP TRIGGER IF EXISTS trg_transactions_tax_lots_update ON transactions;
+CREATE TRIGGER trg_transactions_tax_lots_update
+AFTER UPDATE ON transactions
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION apply_tax_lots_update();
+
+DROP TRIGGER IF EXISTS trg_transactions_tax_lots_delete ON transactions;
+CREATE TRIGGER trg_transactions_tax_lots_delete
+AFTER DELETE ON transactions
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION apply_tax_lots_delete();
+
+DROP TRIGGER IF EXISTS trg_lot_settings_method ON lot_settings;
+CREATE TRIGGER trg_lot_settings_method
+AFTER UPDATE OF method ON lot_settings
+FOR EACH STATEMENT EXECUTE FUNCTION apply_lot_method_change();
+
+-- position_ledger (position_ledger.sql) is written by apply_lot_transaction,
+-- so rebuilding it means replaying the lots
+CREATE OR REPLACE FUNCTION rebuild_position_ledger(p_tickers VARCHAR[] DEFAULT NULL)
+RETURNS INTEGER AS $$
+    SELECT rebuild_tax_lots(p_tickers);
+$$ LANGUAGE sql;
+
+-- Backfill from the existing ledger (also rewrites position_ledger)
+SELECT rebuild_tax_lots();
+
+-- Realized P&L per ticker
+CREATE OR REPLACE VIEW realized_pnl_summary AS
+SELECT
+    ticker,
+    SUM(quantity) as quantity_sold,
+    SUM(proceeds) as proceeds,
+    SUM(cost) as cost,
+    SUM(realized) as realized_pnl,
+    MAX(closed_at) as last_sale_date
+FROM realized_pnl
+GROUP BY ticker;
+
+-- Holdings views: cost basis from the open lots (replaces holdings_table.sql)
+DROP VIEW IF EXISTS portfolio_summary;
+DROP VIEW IF EXISTS holdings_with_value;
+DROP VIEW IF EXISTS current_holdings;
+
+-- The holdings table now only needs shares, names and buy dates; its
+-- net-cost columns are not read by any view, so stop maintaining them
+CREATE OR REPLACE FUNCTION recompute_holdings(p_tickers VARCHAR[])
+RETURNS VOID AS $$
+BEGIN
+    DELETE FROM holdings WHERE ticker = ANY(p_tickers);
+
+    INSERT INTO holdings (ticker, name, asset_type, shares, first_buy_date, last_buy_date)
+    SELECT
+        ticker,
+        MAX(name),
+        MAX(asset_type),
+        SUM(CASE WHEN type = 'BUY' THEN quantity ELSE -quantity END),
+        MIN(CASE WHEN type = 'BUY' THEN date END),
+        MAX(CASE WHEN type = 'BUY' THEN date END)
+    FROM transactions
+    WHERE ticker = ANY(p_tickers)
+    GROUP BY ticker;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION apply_holdings_insert()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO holdings AS h (ticker, name, asset_type, shares, first_buy_date, last_buy_date)
+    SELECT
+        ticker,
+        MAX(name),
+        MAX(asset_type),
+        SUM(CASE WHEN type = 'BUY' THEN quantity ELSE -quantity END),
+        MIN(CASE WHEN type = 'BUY' THEN date END),
+        MAX(CASE WHEN type = 'BUY' THEN date END)
+    FROM new_rows
+    GROUP BY ticker
+    ON CONFLICT (ticker) DO UPDATE SET
+        name = GREATEST(h.name, EXCLUDED.name),
+        asset_type = GREATEST(h.asset_type, EXCLUDED.asset_type),
+        shares = h.shares + EXCLUDED.shares,
+        first_buy_date = LEAST(h.first_buy_date, EXCLUDED.first_buy_date),
+        last_buy_date = GREATEST(h.last_buy_date, EXCLUDED.last_buy_date),
+        updated_at = NOW();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+ALTER TABLE holdings
+    DROP COLUMN IF EXISTS total_cost,
+    DROP COLUMN IF EXISTS bought_quantity,
+    DROP COLUMN IF EXISTS bought_cost;
+
+CREATE VIEW current_holdings AS
+SELECT
+    h.ticker,
+    h.name,
+    h.asset_type,
+    h.shares,
+    COALESCE(l.cost, 0) as total_cost,
+    CASE
+        WHEN h.shares > 0
+        THEN COALESCE(l.cost, 0) / h.shares
+        ELSE 0
+    END as avg_buy_price,
+    h.first_buy_date,
+    h.last_buy_date
+FROM holdings h
+LEFT JOIN (
+    SELECT ticker, SUM(remaining * cost_per_share) as cost
+    FROM tax_lots
+    WHERE remaining > 0
+    GROUP BY ticker
+) l ON l.ticker = h.ticker
+WHERE h.shares > 0;
+
+CREATE VIEW holdings_with_value AS
+SELECT
+    h.ticker,
+    h.name,
+    h.asset_type,
+    h.shares,
+    h.avg_buy_price,
+    h.total_cost,
+    h.first_buy_date,
+    h.last_buy_date,
+    cp.price as current_price,
+    cp.updated_at as price_updated_at,
+    h.shares * cp.price as current_value,
+    (h.shares * cp.price) - h.total_cost as pnl,
+    CASE
+        WHEN h.total_cost > 0
+        THEN ((h.shares * cp.price) - h.total_cost) / h.total_cost * 100
+        ELSE 0
+    END as pnl_percent
+FROM current_holdings h
+LEFT JOIN current_prices cp ON h.ticker = cp.ticker;
+
+CREATE VIEW portfolio_summary AS
+SELECT
+    SUM(current_value) as total_value,
+    SUM(total_cost) as total_invested,
+    SUM(pnl) as total_pnl,
+    CASE
+        WHEN SUM(total_cost) > 0
+        THEN SUM(pnl) / SUM(total_cost) * 100
+        ELSE 0
+    END as total_pnl_percent,
+    COUNT(*) as num_holdings
+FROM holdings_with_value;
+
+ALTER TABLE lot_settings ENABLE ROW LEVEL SECURITY;
+ALTER TABLE tax_lots ENABLE ROW LEVEL SECURITY;
+ALTER TABLE realized_pnl ENABLE ROW LEVEL SECURITY;
+ALTER TABLE lot_state ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Block anon access to lot_settings" ON lot_settings;
+CREATE POLICY "Block anon access to lot_settings"
+ON lot_settings
+FOR ALL
+TO anon
+USING (false);
+
+DROP POLICY IF EXISTS "Block anon access to tax_lots" ON tax_lots;
+CREATE POLICY "Block anon access to tax_lots"
+ON tax_lots
+FOR ALL
+TO anon
+USING (false);
+
+DROP POLICY IF EXISTS "Block anon access to realized_pnl" ON realized_pnl;
+CREATE POLICY "Block anon access to realized_pnl"
+ON realized_pnl
+FOR ALL
+TO anon
+USING (false);
+
+DROP POLICY IF EXISTS "Block anon access to lot_state" ON lot_state;
+CREATE POLICY "Block anon access to lot_state"
+ON lot_state
+FOR ALL
+TO anon
+USING (false);
+
+REVOKE EXECUTE ON FUNCTION apply_lot_transaction(transactions, VARCHAR) FROM PUBLIC, anon;
+REVOKE EXECUTE ON FUNCTION rebuild_tax_lots(VARCHAR[]) FROM PUBLIC, anon;
+REVOKE EXECUTE ON FUNCTION rebuild_position_ledger(VARCHAR[]) FROM PUBLIC, anon;
+GRANT EXECUTE ON FUNCTION apply_lot_transaction(transactions, VARCHAR) TO service_role;
+GRANT EXECUTE ON FUNCTION rebuild_tax_lots(VARCHAR[]) TO service_role;
+GRANT EXECUTE ON FUNCTION rebuild_position_ledger(VARCHAR[]) TO service_role;
@@ -0,0 +1,65 @@
+-- ============================================
+-- DARUMA - Ticker Directory RPC
+-- ============================================
+-- Run this in Supabase SQL Editor after schema.sql
+-- Returns one row per distinct ticker with the name, asset type and
+-- currency of its latest transaction, without reading every row:
+--   client.rpc('ticker_directory')
+-- ============================================
+
+-- Serves both the distinct-ticker skip scan and the latest-row probe
+-- (same definition as in transaction_indexes.sql)
+CREATE INDEX IF NOT EXISTS idx_transactions_ticker_date_covering
+ON transactions(ticker, date, id) INCLUDE (type, quantity, price);
+
+CREATE OR REPLACE FUNCTION ticker_directory()
+RETURNS TABLE (
+    ticker VARCHAR(20),
+    name VARCHAR(100),
+    asset_type VARCHAR(20),
+    currency VARCHAR(3)
+) AS $$
+    -- Loose index scan: jump from one ticker to the next instead of
+    -- scanning (or grouping) all transactions
+    WITH RECURSIVE tickers AS (
+        (SELECT t.ticker FROM transactions t ORDER BY t.ticker LIMIT 1)
+        UNION ALL
+        SELECT (
+            SELECT t.ticker FROM transactions t
+            WHERE t.ticker > tickers.ticker
+            ORDER BY t.ticker
+            LIMIT 1
+        )
+        FROM tickers
+        WHERE tickers.ticker IS NOT NULL
+    )
+    SELECT
+        tk.ticker,
+        COALESCE(latest.name, (
+            SELECT t.name FROM transactions t
+            WHERE t.ticker = tk.ticker AND t.name IS NOT NULL
+            ORDER BY t.date DESC, t.id DESC
+            LIMIT 1
+        )),
+        COALESCE(latest.asset_type, (
+            SELECT t.asset_type FROM transactions t
+            WHERE t.ticker = tk.ticker AND t.asset_type IS NOT NULL
+            ORDER BY t.date DESC, t.id DESC
+            LIMIT 1
+        )),
+        latest.currency
+    FROM tickers tk
+    CROSS JOIN LATERAL (
+        SELECT t.name, t.asset_type, t.currency
+        FROM transactions t
+        WHERE t.ticker = tk.ticker
+        ORDER BY t.date DESC, t.id DESC
+        LIMIT 1
+    ) latest
+    WHERE tk.ticker IS NOT NULL
+    ORDER BY tk.ticker;
+$$ LANGUAGE sql STABLE;
+
+-- Runs with the caller's rights (RLS applies); only the service_role key may call it
+REVOKE EXECUTE ON FUNCTION ticker_directory() FROM PUBLIC, anon;
+GRANT EXECUTE ON FUNCTION ticker_directory() TO service_role;
@@ -0,0 +1,57 @@
+-- ============================================
+-- DARUMA - Transaction Fingerprint
+-- ============================================
+-- Run this in Supabase SQL Editor after schema.sql
+-- Every transaction gets a hash of its natural key (ticker, timestamp,
+-- type, quantity, price, platform) with a unique index, so imports can
+-- skip duplicates inside the insert itself:
+--   upsert(rows, on_conflict='fingerprint', ignore_duplicates=True)
+-- ============================================
+
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS fingerprint CHAR(32);
+
+-- Computed from the stored (typed) values, so 10 and 10.0 hash the same
+CREATE OR REPLACE FUNCTION set_transaction_fingerprint()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.fingerprint := md5(concat_ws('|',
+        upper(NEW.ticker),
+        extract(epoch FROM NEW.date)::text,
+        NEW.type,
+        NEW.quantity::text,
+        NEW.price::text,
+        coalesce(NEW.platform, '')
+    ));
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_transactions_fingerprint ON transactions;
+CREATE TRIGGER trg_transactions_fingerprint
+BEFORE INSERT OR UPDATE ON transactions
+FOR EACH ROW EXECUTE FUNCTION set_transaction_fingerprint();
+
+-- Backfill existing rows (the trigger fills in the value). The ledger
+-- change trigger is paused so the backfill is not logged as edits.
+DO $$
+DECLARE
+    has_ledger BOOLEAN := EXISTS (
+        SELECT 1 FROM pg_trigger
+        WHERE tgname = 'trg_transactions_ledger_changes'
+    );
+BEGIN
+    IF has_ledger THEN
+        ALTER TABLE transactions DISABLE TRIGGER trg_transactions_ledger_changes;
+    END IF;
+    UPDATE transactions SET fingerprint = NULL WHERE fingerprint IS NULL;
+    IF has_ledger THEN
+        ALTER TABLE transactions ENABLE TRIGGER trg_transactions_ledger_changes;
+    END IF;
+END $$;
+
+-- Fails if the ledger already holds duplicates. List them with:
+--   SELECT fingerprint, array_agg(id) FROM transactions
+--   GROUP BY fingerprint HAVING count(*) > 1;
+-- and delete the extra rows before running this statement again.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_transactions_fingerprint
+ON transactions(fingerprint);
@@ -0,0 +1,94 @@
+-- ============================================
+-- DARUMA - Covering Transaction Indexes
+-- ============================================
+-- Run this in Supabase SQL Editor after ticker_directory.sql
+-- Replaces the single-column transaction indexes with composite ones
+-- that cover the app's actual queries, so each is an index-only scan:
+--   per ticker by date    ticker = ? ORDER BY date, id
+--                         (shares at date, ledger recompute, skip scan)
+--   dedup lookup          ticker = ? AND date = ? AND quantity = ?
+--   recent first          ORDER BY date DESC, id DESC LIMIT n
+-- Verify the plans with sql/check_transaction_indexes.sql.
+-- ============================================
+
+CREATE INDEX IF NOT EXISTS idx_transactions_ticker_date_covering
+ON transactions(ticker, date, id) INCLUDE (type, quantity, price);
+
+CREATE INDEX IF NOT EXISTS idx_transactions_recent
+ON transactions(date DESC, id DESC) INCLUDE (ticker, type, quantity, price, total_amount);
+
+-- Superseded: ticker and (ticker, date, id) are prefixes of the covering
+-- index, date is served by idx_transactions_recent in either direction,
+-- and type alone (two values) is never selective
+DROP INDEX IF EXISTS idx_transactions_ticker_date;
+DROP INDEX IF EXISTS idx_transactions_ticker;
+DROP INDEX IF EXISTS idx_transactions_date;
+DROP INDEX IF EXISTS idx_transactions_type;
+
+-- EXPLAIN ANALYZE each access path against a table with the same indexes
+-- as transactions (the real one, or a synthetic copy) and report the
+-- scan node and index that answered it
+CREATE OR REPLACE FUNCTION explain_transaction_paths(p_table REGCLASS DEFAULT 'transactions')
+RETURNS TABLE (
+    path TEXT,
+    node TEXT,
+    index_name TEXT,
+    heap_fetches BIGINT,
+    index_only BOOLEAN
+) AS $$
+DECLARE
+    sample RECORD;
+    query RECORD;
+    plan JSON;
+    scan JSON;
+BEGIN
+    EXECUTE format('SELECT ticker, date, quantity FROM %s ORDER BY id DESC LIMIT 1', p_table)
+    INTO sample;
+    IF sample IS NULL THEN
+        RAISE EXCEPTION '% is empty', p_table;
+    END IF;
+
+    FOR query IN
+        SELECT * FROM (VALUES
+            ('per ticker by date', format(
+                'SELECT id, date, type, quantity, price FROM %s
+                 WHERE ticker = %L ORDER BY date, id', p_table, sample.ticker)),
+            ('shares at date', format(
+                'SELECT type, quantity FROM %s
+                 WHERE ticker = %L AND date <= %L', p_table, sample.ticker, sample.date)),
+            ('dedup lookup', format(
+                'SELECT id FROM %s
+                 WHERE ticker = %L AND date = %L AND quantity = %L',
+                p_table, sample.ticker, sample.date, sample.quantity)),
+            ('recent first', format(
+                'SELECT id, date, ticker, type, quantity, price, total_amount FROM %s
+                 ORDER BY date DESC, id DESC LIMIT 20', p_table))
+        ) AS q(path, sql)
+    LOOP
+        EXECUTE 'EXPLAIN (ANALYZE, FORMAT JSON) ' || query.sql INTO plan;
+
+        -- First scan node in the plan tree (below Limit/Sort, if any)
+        WITH RECURSIVE nodes AS (
+            SELECT plan -> 0 -> 'Plan' AS n, 0 AS depth
+            UNION ALL
+            SELECT child, depth + 1
+            FROM nodes, json_array_elements(nodes.n -> 'Plans') AS child
+        )
+        SELECT n INTO scan
+        FROM nodes
+        WHERE n ->> 'Node Type' LIKE '%Scan'
+        ORDER BY depth
+        LIMIT 1;
+
+        path := query.path;
+        node := scan ->> 'Node Type';
+        index_name := scan ->> 'Index Name';
+        heap_fetches := (scan ->> 'Heap Fetches')::BIGINT;
+        index_only := node = 'Index Only Scan';
+        RETURN NEXT;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+REVOKE EXECUTE ON FUNCTION explain_transaction_paths(REGCLASS) FROM PUBLIC, anon;
+GRANT EXECUTE ON FUNCTION explain_transaction_paths(REGCLASS) TO service_role;
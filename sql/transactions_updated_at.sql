@@ -0,0 +1,28 @@
+-- ============================================
+-- DARUMA - Transaction Modification Time
+-- ============================================
+-- Run this in Supabase SQL Editor after schema.sql
+-- transactions.updated_at moves on every insert and edit, so readers
+-- that sync incrementally (the local mirror) and the price updater's
+-- reload check see edited rows, not only new ones. Existing rows get
+-- the time this script runs, so mirrors re-pull them once.
+-- ============================================
+
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT NOW();
+
+CREATE OR REPLACE FUNCTION set_transaction_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at := NOW();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_transactions_updated_at ON transactions;
+CREATE TRIGGER trg_transactions_updated_at
+BEFORE UPDATE ON transactions
+FOR EACH ROW EXECUTE FUNCTION set_transaction_updated_at();
+
+-- Keyset pages of the mirror sync: (updated_at, id) from a watermark
+CREATE INDEX IF NOT EXISTS idx_transactions_updated_at
+ON transactions(updated_at, id);
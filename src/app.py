@@ -3,13 +3,16 @@ Daruma - Investment Portfolio Tracker
 Main Dashboard - Alpine Dusk Theme
 """
 
+import os
 import streamlit as st
 import plotly.graph_objects as go
 from datetime import datetime
 import pandas as pd
-import numpy as np
 
-from utils import supabase_client as db
+from utils.local_mirror import get_reader, invalidate_reader
+from utils.supabase_client import to_holding_rows
+from utils import instrumentation
+from utils.instrumentation import cached_loader, begin_render
 from utils.auth import check_password, logout
 from utils.styles import apply_styles, get_chart_layout, section_label, page_header, CHART_COLORS, get_daruma_logo, render_fab_button, render_bottom_nav
 
@@ -40,6 +43,9 @@ apply_styles()
 # Authentication check
 check_password()
 
+# Tag this run's data-layer calls for the debug panel
+begin_render('Home')
+
 # Sidebar
 with st.sidebar:
     daruma_logo = get_daruma_logo(50)
@@ -57,6 +63,7 @@ with st.sidebar:
 
     if st.button("🔄 Refresh Data", use_container_width=True):
         st.cache_data.clear()
+        invalidate_reader()
         st.rerun()
 
     if st.button("🚪 Sign Out", use_container_width=True):
@@ -67,34 +74,25 @@ if 'selected_period' not in st.session_state:
     st.session_state.selected_period = '1M'
 
 
-@st.cache_data(ttl=300)
+# Snapshot window loaded with the dashboard (covers the longest chart period)
+HISTORY_DAYS = 730
+
+
+@cached_loader(ttl=300)
 def get_portfolio_data():
-    """Fetch real portfolio data from Supabase."""
+    """Fetch holdings, totals and snapshot history in one request."""
     try:
-        client = db.get_client()
-        holdings_raw = db.get_holdings_with_value(client)
-        summary = db.get_portfolio_summary(client)
-
-        holdings = []
-        for h in holdings_raw:
-            holdings.append({
-                'ticker': h['ticker'],
-                'name': h['name'] or h['ticker'],
-                'shares': float(h['shares'] or 0),
-                'avg_price': float(h['avg_buy_price'] or 0),
-                'current_value': float(h['current_value'] or 0),
-                'current_price': float(h['current_price'] or 0),
-                'pnl': float(h['pnl'] or 0),
-                'pnl_pct': float(h['pnl_percent'] or 0),
-                'type': h['asset_type'] or 'STOCK'
-            })
+        bundle = get_reader().get_dashboard_bundle(days=HISTORY_DAYS)
+        holdings = to_holding_rows(bundle['holdings'])
+        summary = bundle['summary']
 
         return {
-            'total_value': float(summary.get('total_value') or 0),
-            'total_invested': float(summary.get('total_invested') or 0),
-            'total_pnl': float(summary.get('total_pnl') or 0),
-            'total_pnl_pct': float(summary.get('total_pnl_percent') or 0),
+            'total_value': summary.get('total_value', 0.0),
+            'total_invested': summary.get('total_invested', 0.0),
+            'total_pnl': summary.get('total_pnl', 0.0),
+            'total_pnl_pct': summary.get('total_pnl_percent', 0.0),
             'holdings': holdings,
+            'history': bundle['snapshots'],
             'connected': True
         }
     except Exception as e:
@@ -105,54 +103,45 @@ def get_portfolio_data():
             'total_pnl': 0,
             'total_pnl_pct': 0,
             'holdings': [],
+            'history': pd.DataFrame(columns=['snapshot_date', 'total_value']),
             'connected': False
         }
 
 
-@st.cache_data(ttl=300)
-def get_portfolio_history(days: int = 365):
-    """Fetch portfolio snapshots for chart."""
-    try:
-        client = db.get_client()
-        return db.get_portfolio_snapshots(client, days=days)
-    except Exception:
-        return []
-
-
-def create_portfolio_chart(period: str, current_value: float = 0, total_cost: float = 0):
+def create_portfolio_chart(period: str, history: pd.DataFrame, current_value: float = 0):
     """Create portfolio evolution line chart with Alpine Dusk styling and crosshairs.
     
-    Uses current_value from live data, and historical snapshots if available.
-    Falls back to a simple cost->current line if no historical data.
+    Uses current_value from live data and the historical snapshots of the period.
+    Returns no figure when the period has fewer than two snapshots.
     """
     days_map = {'1D': 1, '1W': 7, '1M': 30, '3M': 90, 'YTD': 180, '1Y': 365, 'ALL': 730}
     days = days_map.get(period, 30)
 
-    snapshots = get_portfolio_history(days)
+    cutoff = (datetime.now() - pd.Timedelta(days=days)).date().isoformat()
+    snapshots = history[history['snapshot_date'] >= cutoff]
     
     # Determine if we have valid historical data
-    has_history = snapshots and len(snapshots) > 1
-    
-    if has_history:
-        dates = pd.to_datetime([s['snapshot_date'] for s in snapshots])
-        values = np.array([float(s['total_value']) for s in snapshots])
-        # Replace the last value with actual current value (live data)
-        values[-1] = current_value
-    else:
-        # No historical data - create a simple line from cost to current
-        if current_value > 0:
-            num_points = min(days, 30) if days > 1 else 2
-            dates = pd.date_range(end=datetime.now(), periods=num_points, freq='D')
-            # Interpolate from invested cost to current value
-            start_val = total_cost if total_cost > 0 else current_value * 0.9
-            values = np.linspace(start_val, current_value, num_points)
-        else:
-            dates = pd.date_range(end=datetime.now(), periods=2, freq='D')
-            values = np.array([0, 0])
+    has_history = len(snapshots) > 1
+
+    if not has_history:
+        # Nothing to draw; the page shows an empty state instead
+        return None, {
+            'start_value': current_value,
+            'end_value': current_value,
+            'period_change': 0,
+            'period_change_pct': 0,
+            'is_positive': True,
+            'has_history': False
+        }
+
+    dates = pd.to_datetime(snapshots['snapshot_date'].to_numpy())
+    values = snapshots['total_value'].to_numpy(dtype=float, copy=True)
+    # Replace the last value with actual current value (live data)
+    values[-1] = current_value
 
     # Always use current_value as the end value (live data)
     end_value = current_value
-    start_value = values[0] if len(values) > 0 else total_cost
+    start_value = values[0]
     
     is_positive = end_value >= start_value
     line_color = CHART_COLORS['gain'] if is_positive else CHART_COLORS['loss']
@@ -448,6 +437,30 @@ def render_holding_row(h: dict):
     """, unsafe_allow_html=True)
 
 
+def render_debug_panel():
+    """Sidebar panel with data-layer timings (enabled with DARUMA_DEBUG=1)."""
+    if os.getenv('DARUMA_DEBUG') != '1':
+        return
+
+    with st.sidebar.expander("🔍 Query Debug"):
+        totals = instrumentation.render_totals(instrumentation.current_render())
+        st.caption(
+            f"This render: {totals['queries']} queries in {totals['query_seconds']:.2f}s, "
+            f"{totals['round_trips']} round trips, {totals['bytes'] / 1024:.1f} KB, "
+            f"{totals['rows']} rows · cache {totals['cache_hits']} hit / {totals['cache_misses']} miss"
+        )
+
+        slowest = instrumentation.slowest(10)
+        if slowest:
+            st.dataframe(
+                pd.DataFrame(slowest)[['page', 'name', 'seconds', 'rows', 'round_trips', 'bytes', 'error']],
+                hide_index=True,
+                use_container_width=True
+            )
+        else:
+            st.caption("No queries recorded yet.")
+
+
 def main():
     data = get_portfolio_data()
 
@@ -524,11 +537,10 @@ def main():
                 st.rerun()
 
     # Portfolio chart with dynamic value display
-    # Pass both current_value and total_cost so chart can properly display
     chart, chart_data = create_portfolio_chart(
-        st.session_state.selected_period, 
-        current_value=data['total_value'],
-        total_cost=data['total_invested']
+        st.session_state.selected_period,
+        data['history'],
+        current_value=data['total_value']
     )
     
     # Dynamic Value Display Header
@@ -553,15 +565,15 @@ def main():
     </div>
     """, unsafe_allow_html=True)
     
-    st.plotly_chart(chart, use_container_width=True, config={
-        'displayModeBar': False,
-        'scrollZoom': False,
-        'staticPlot': False,
-    })
-    
-    # Show notice if no historical data
-    if not chart_data.get('has_history', True):
-        st.caption("📊 *Limited history - chart shows growth from invested to current value*")
+    if chart is not None:
+        st.plotly_chart(chart, use_container_width=True, config={
+            'displayModeBar': False,
+            'scrollZoom': False,
+            'staticPlot': False,
+        })
+    else:
+        st.info("📊 No portfolio history for this period yet. Snapshots are recorded on every "
+                "price update; fill in past days with `python src/scripts/backfill_snapshots.py`.")
 
     st.markdown("---")
     
@@ -628,6 +640,9 @@ def main():
     # Bottom Navigation Bar
     render_bottom_nav(active_page="home")
 
+    # Query timings of this render (last, so every call is counted)
+    render_debug_panel()
+
 
 if __name__ == "__main__":
     main()
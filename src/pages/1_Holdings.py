@@ -5,7 +5,9 @@ Alpine Dusk Theme
 
 import streamlit as st
 import pandas as pd
-from utils import supabase_client as db
+from utils.local_mirror import get_reader
+from utils.supabase_client import to_holding_rows
+from utils.instrumentation import cached_loader, begin_render
 from utils.auth import check_password
 from utils.styles import apply_styles, section_label, page_header, get_daruma_logo, render_bottom_nav, render_fab_button
 
@@ -22,28 +24,18 @@ apply_styles()
 # Authentication check
 check_password()
 
+# Tag this run's data-layer calls for the debug panel
+begin_render('Holdings')
 
-@st.cache_data(ttl=300)
+
+HOLDING_COLUMNS = 'ticker, name, asset_type, shares, avg_buy_price, current_price, current_value, pnl, pnl_percent'
+
+
+@cached_loader(ttl=300)
 def get_holdings():
     """Fetch holdings from Supabase."""
     try:
-        client = db.get_client()
-        holdings_raw = db.get_holdings_with_value(client)
-
-        holdings = []
-        for h in holdings_raw:
-            holdings.append({
-                'ticker': h['ticker'],
-                'name': h['name'] or h['ticker'],
-                'shares': float(h['shares'] or 0),
-                'avg_price': float(h['avg_buy_price'] or 0),
-                'current_price': float(h['current_price'] or 0),
-                'current_value': float(h['current_value'] or 0),
-                'pnl': float(h['pnl'] or 0),
-                'pnl_pct': float(h['pnl_percent'] or 0),
-                'type': h['asset_type'] or 'STOCK'
-            })
-        return holdings
+        return to_holding_rows(get_reader().get_holdings_frame(HOLDING_COLUMNS))
     except Exception as e:
         st.error(f"Error loading holdings: {str(e)}")
         return []
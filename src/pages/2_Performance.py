@@ -6,9 +6,11 @@ Alpine Dusk Theme
 import streamlit as st
 import plotly.graph_objects as go
 import pandas as pd
-from datetime import datetime, date
+from datetime import date
 import numpy as np
-from utils import supabase_client as db
+from utils.supabase_client import gather
+from utils.local_mirror import get_reader
+from utils.instrumentation import cached_loader, begin_render
 from utils.auth import check_password
 from utils.styles import apply_styles, section_label, page_header, get_chart_layout, CHART_COLORS, get_daruma_logo, render_bottom_nav, render_fab_button
 
@@ -25,8 +27,15 @@ apply_styles()
 # Authentication check
 check_password()
 
+# Tag this run's data-layer calls for the debug panel
+begin_render('Performance')
 
-@st.cache_data(ttl=300)
+
+# Snapshots are downsampled to about this many chart points for any period
+CHART_POINTS = 300
+
+
+@cached_loader(ttl=300)
 def get_portfolio_performance(period: str):
     """Get real portfolio performance from Supabase snapshots.
     
@@ -37,31 +46,30 @@ def get_portfolio_performance(period: str):
     days = days_map.get(period, 30)
 
     try:
-        client = db.get_client()
+        reader = get_reader()
         
-        # Always get live data first
-        summary = db.get_portfolio_summary(client)
-        current_value = float(summary.get('total_value') or 0)
-        total_cost = float(summary.get('total_invested') or 0)
+        # Live totals and historical snapshots, fetched concurrently
+        summary, snapshots = gather(
+            lambda: reader.get_portfolio_summary('total_value'),
+            lambda: reader.get_portfolio_snapshots_frame(
+                'snapshot_date, total_value', days=days, points=CHART_POINTS
+            ),
+        )
+        current_value = summary.get('total_value', 0.0)
         
-        # Get historical snapshots
-        snapshots = db.get_portfolio_snapshots(client, days=days)
-        
-        has_history = snapshots and len(snapshots) > 1
+        has_history = len(snapshots) > 1
 
         if has_history:
-            dates = pd.to_datetime([s['snapshot_date'] for s in snapshots])
-            values = np.array([float(s['total_value'] or 0) for s in snapshots])
+            dates = pd.to_datetime(snapshots['snapshot_date'].to_numpy())
+            values = snapshots['total_value'].to_numpy(dtype=float, copy=True)
             # Replace last value with LIVE current value
             values[-1] = current_value
             start_value = values[0]
         else:
-            # No history - create simple cost to current line
-            num_points = min(days, 30) if days > 1 else 2
-            dates = pd.date_range(end=datetime.now(), periods=num_points, freq='D')
-            start_val = total_cost if total_cost > 0 else current_value * 0.95
-            values = np.linspace(start_val, current_value, num_points)
-            start_value = start_val
+            # No history - nothing to chart, the period starts at the live value
+            dates = pd.DatetimeIndex([])
+            values = np.array([], dtype=float)
+            start_value = current_value
 
         return {
             'dates': dates,
@@ -70,16 +78,16 @@ def get_portfolio_performance(period: str):
             'end_value': current_value,  # Always use LIVE value
             'change': current_value - start_value,
             'change_pct': ((current_value - start_value) / start_value) * 100 if start_value > 0 else 0,
-            'high': max(max(values), current_value),
-            'low': min(values),
+            'high': values.max(initial=current_value),
+            'low': values.min(initial=current_value),
             'connected': True,
             'has_history': has_history
         }
     except Exception as e:
         st.error(f"Database error: {str(e)}")
         return {
-            'dates': pd.date_range(end=datetime.now(), periods=2, freq='D'),
-            'values': np.array([0, 0]),
+            'dates': pd.DatetimeIndex([]),
+            'values': np.array([], dtype=float),
             'start_value': 0,
             'end_value': 0,
             'change': 0,
@@ -91,34 +99,29 @@ def get_portfolio_performance(period: str):
         }
 
 
-@st.cache_data(ttl=300)
+@cached_loader(ttl=300)
 def get_asset_performance():
     """Get real per-asset performance from holdings."""
     try:
-        client = db.get_client()
-        holdings = db.get_holdings_with_value(client)
+        frame = get_reader().get_holdings_frame('ticker, pnl_percent, pnl')
 
-        if not holdings:
+        if frame.empty:
             return []
 
-        # Calculate P&L percentage for each holding
-        assets = []
-        for h in holdings:
-            pnl_pct = float(h.get('pnl_percent') or 0)
-            pnl = float(h.get('pnl') or 0)
-            assets.append({
-                'ticker': h['ticker'],
-                'change_pct': pnl_pct,
-                'change': pnl
-            })
-
-        return sorted(assets, key=lambda x: x['change_pct'], reverse=True)
+        assets = frame.rename(columns={'pnl_percent': 'change_pct', 'pnl': 'change'})
+        return assets.sort_values('change_pct', ascending=False).to_dict('records')
     except Exception:
         return []
 
 
 def create_performance_chart(data: dict):
-    """Create performance line chart with Alpine Dusk styling."""
+    """Create performance line chart with Alpine Dusk styling.
+
+    Returns no figure when the period has fewer than two snapshots.
+    """
+    if not data.get('has_history', True):
+        return None
+
     fig = go.Figure()
 
     is_positive = data['change'] >= 0
@@ -236,9 +239,6 @@ def main():
 
     if not data.get('connected', True):
         st.warning("⚠️ Could not connect to database.")
-    
-    if not data.get('has_history', True):
-        st.info("📊 Limited history available. Chart shows estimated growth from invested amount to current value. Historical snapshots will accumulate over time.")
 
     # Summary metrics - 2x2 grid for mobile
     is_positive = data['change'] >= 0
@@ -285,11 +285,15 @@ def main():
     # Chart
     section_label("Portfolio Evolution")
     chart = create_performance_chart(data)
-    st.plotly_chart(chart, use_container_width=True, config={
-        'displayModeBar': False,
-        'scrollZoom': False,
-        'staticPlot': False,
-    })
+    if chart is not None:
+        st.plotly_chart(chart, use_container_width=True, config={
+            'displayModeBar': False,
+            'scrollZoom': False,
+            'staticPlot': False,
+        })
+    else:
+        st.info("📊 No portfolio history for this period yet. Snapshots are recorded on every "
+                "price update; fill in past days with `python src/scripts/backfill_snapshots.py`.")
 
     st.markdown("---")
 
@@ -7,7 +7,9 @@ import streamlit as st
 import plotly.graph_objects as go
 import pandas as pd
 from datetime import datetime
-from utils import supabase_client as db
+from utils.supabase_client import gather
+from utils.local_mirror import get_reader
+from utils.instrumentation import cached_loader, begin_render
 from utils.auth import check_password
 from utils.styles import apply_styles, section_label, page_header, get_chart_layout, CHART_COLORS, get_daruma_logo, render_bottom_nav, render_fab_button
 
@@ -24,45 +26,47 @@ apply_styles()
 # Authentication check
 check_password()
 
+# Tag this run's data-layer calls for the debug panel
+begin_render('Dividends')
 
-@st.cache_data(ttl=300)
+
+@cached_loader(ttl=300)
 def get_dividend_data():
     """Fetch dividend data from Supabase."""
     try:
-        client = db.get_client()
-
-        all_dividends = db.get_dividends(client)
-        by_year_raw = db.get_dividends_by_year(client)
-        by_ticker_raw = db.get_dividend_summary(client)
-
-        year_totals = {}
-        for d in by_year_raw:
-            year = d['year']
-            if year not in year_totals:
-                year_totals[year] = 0
-            year_totals[year] += float(d['total_received'] or 0)
-
-        by_year = [{'year': y, 'amount': a} for y, a in sorted(year_totals.items(), reverse=True)]
-
-        by_ticker = []
-        for d in by_ticker_raw:
-            by_ticker.append({
-                'ticker': d['ticker'],
-                'amount': float(d['total_dividends'] or 0),
-                'payments': d['dividend_count'] or 0
-            })
-
-        total = sum(d['amount'] for d in by_ticker)
+        reader = get_reader()
+
+        recent_frame, by_year_frame, by_ticker_frame = gather(
+            lambda: reader.get_dividends_frame(
+                'payment_date, ticker, total_received', limit=10
+            ),
+            lambda: reader.get_dividends_by_year_frame('year, total_received'),
+            lambda: reader.get_dividend_summary_frame(
+                'ticker, total_dividends, dividend_count'
+            ),
+        )
+
+        year_totals = by_year_frame.groupby('year')['total_received'].sum()
+        by_year = [
+            {'year': int(y), 'amount': float(a)}
+            for y, a in year_totals.sort_index(ascending=False).items()
+        ]
+
+        by_ticker = by_ticker_frame.assign(
+            dividend_count=by_ticker_frame['dividend_count'].fillna(0).astype(int)
+        ).rename(columns={
+            'total_dividends': 'amount',
+            'dividend_count': 'payments'
+        }).to_dict('records')
+
+        total = float(by_ticker_frame['total_dividends'].sum())
         current_year = datetime.now().year
-        this_year = year_totals.get(current_year, 0)
-
-        recent = []
-        for d in all_dividends[:10]:
-            recent.append({
-                'date': d['payment_date'],
-                'ticker': d['ticker'],
-                'amount': float(d['total_received'] or 0)
-            })
+        this_year = float(year_totals.get(current_year, 0))
+
+        recent = recent_frame.rename(columns={
+            'payment_date': 'date',
+            'total_received': 'amount'
+        }).to_dict('records')
 
         return {
             'total': total,
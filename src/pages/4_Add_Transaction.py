@@ -5,7 +5,9 @@ Alpine Dusk Theme
 
 import streamlit as st
 from datetime import datetime, date
-from utils import supabase_client as db
+from utils.repository import get_repository
+from utils.local_mirror import get_reader, invalidate_reader
+from utils.instrumentation import cached_loader, begin_render
 from utils.auth import check_password
 from utils.styles import apply_styles, section_label, page_header, get_daruma_logo
 
@@ -22,24 +24,28 @@ apply_styles()
 # Authentication check
 check_password()
 
+# Tag this run's data-layer calls for the debug panel
+begin_render('Add Transaction')
 
-@st.cache_data(ttl=60)
+
+@cached_loader(ttl=60)
 def get_existing_tickers():
     """Get list of existing tickers for autocomplete."""
     try:
-        client = db.get_client()
-        return db.get_unique_tickers(client)
+        return get_reader().get_unique_tickers()
     except Exception:
         return []
 
 
-@st.cache_data(ttl=60)
+# Columns shown in the history table (covered by idx_transactions_recent)
+RECENT_COLUMNS = 'id, date, ticker, type, quantity, price, total_amount'
+
+
+@cached_loader(ttl=60)
 def get_recent_transactions(limit: int = 20):
     """Get recent transactions for display."""
     try:
-        client = db.get_client()
-        transactions = db.get_all_transactions(client)
-        return transactions[:limit]
+        return get_reader().get_recent_transactions(limit=limit, columns=RECENT_COLUMNS)
     except Exception:
         return []
 
@@ -47,9 +53,9 @@ def get_recent_transactions(limit: int = 20):
 def delete_transaction_by_id(tx_id: int) -> bool:
     """Delete a transaction and clear cache."""
     try:
-        client = db.get_client()
-        result = db.delete_transaction(client, tx_id)
+        result = get_repository().delete_transaction(tx_id)
         if result:
+            invalidate_reader()
             get_existing_tickers.clear()
             get_recent_transactions.clear()
         return result
@@ -60,15 +66,22 @@ def delete_transaction_by_id(tx_id: int) -> bool:
 def save_transaction(transaction: dict) -> bool:
     """Save transaction to Supabase."""
     try:
-        client = db.get_client()
-        result = db.insert_transaction(client, transaction)
+        result = get_repository().insert_transaction(transaction)
         if result:
+            invalidate_reader()
             get_existing_tickers.clear()
             get_recent_transactions.clear()
             return True
         return False
     except Exception as e:
-        st.error(f"Error saving transaction: {str(e)}")
+        # Unique fingerprint (sql/transaction_fingerprint.sql): same ticker,
+        # timestamp, type, quantity, price and platform as an existing row
+        if 'idx_transactions_fingerprint' in str(e):
+            st.error("❌ Duplicate transaction: one with the same date, ticker, type, "
+                     "quantity, price and platform is already recorded. If this is a "
+                     "separate trade, enter it with the combined quantity instead.")
+        else:
+            st.error(f"Error saving transaction: {str(e)}")
         return False
 
 
@@ -0,0 +1,65 @@
+"""
+Portfolio snapshot backfill script.
+Fills in daily portfolio_snapshots for a date range from the transactions
+and daily closes, in one server-side statement, so charts have real
+history for days the price update did not run.
+"""
+
+import os
+import sys
+import argparse
+import logging
+from datetime import date
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from utils.repository import get_repository, get_backend
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    """Main entry point for backfill script."""
+    parser = argparse.ArgumentParser(
+        description='Backfill daily portfolio snapshots'
+    )
+    parser.add_argument(
+        '--from',
+        dest='start',
+        type=date.fromisoformat,
+        help='First day, YYYY-MM-DD (default: first transaction)'
+    )
+    parser.add_argument(
+        '--to',
+        dest='end',
+        type=date.fromisoformat,
+        help='Last day, YYYY-MM-DD (default: yesterday)'
+    )
+    parser.add_argument(
+        '--overwrite',
+        action='store_true',
+        help='Replace snapshots that already exist'
+    )
+
+    args = parser.parse_args()
+
+    repo = get_repository()
+    logger.info(f'Connected to {get_backend()} backend')
+
+    written = repo.backfill_portfolio_snapshots(args.start, args.end, args.overwrite)
+
+    logger.info(f'Snapshots written: {written}')
+
+
+if __name__ == '__main__':
+    main()
@@ -15,12 +15,9 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-from utils.supabase_client import (
-    get_client,
-    insert_transaction,
-    transaction_exists
-)
+from utils.repository import get_repository, get_backend
 from utils.delta_parser import parse_delta_csv, get_import_summary
+from utils.ledger_recompute import recompute_pending
 
 # Configure logging
 logging.basicConfig(
@@ -30,13 +27,16 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def import_csv(file_path: str, dry_run: bool = False) -> dict:
+def import_csv(file_path: str, dry_run: bool = False, recompute: bool = True,
+               chunk_size: int = 500) -> dict:
     """
     Import transactions from a Delta CSV file.
 
     Args:
         file_path: Path to the CSV file
         dry_run: If True, parse but don't insert into database
+        recompute: Refresh dividends/snapshots of the imported tickers afterwards
+        chunk_size: Rows per insert request
 
     Returns:
         Dict with import results
@@ -72,31 +72,24 @@ def import_csv(file_path: str, dry_run: bool = False) -> dict:
         }
 
     # Connect to database and insert
-    client = get_client()
-    logger.info('Connected to Supabase')
-
-    inserted = 0
-    skipped = 0
-    errors = 0
+    repo = get_repository()
+    logger.info(f'Connected to {get_backend()} backend')
 
-    for tx in transactions:
-        try:
-            # Check for duplicates
-            if transaction_exists(client, tx['ticker'], tx['date'], tx['quantity']):
-                logger.debug(f'Skipping duplicate: {tx["ticker"]} on {tx["date"]}')
-                skipped += 1
-                continue
+    # Insert in chunks; Postgres skips rows whose fingerprint already exists
+    # and rejected rows are isolated and reported one by one
+    result = repo.insert_transactions(transactions, chunk_size=chunk_size,
+                                      ignore_duplicates=True)
+    inserted = len(result['inserted'])
+    errors = len(result['failed'])
+    skipped = len(transactions) - inserted - errors
 
-            # Insert transaction
-            insert_transaction(client, tx)
-            inserted += 1
+    for failure in result['failed']:
+        row = failure['row']
+        logger.error(f'Error inserting {row["ticker"]} {row["type"]} on {row["date"]}: '
+                     f'{failure["error"]}')
 
-            if inserted % 50 == 0:
-                logger.info(f'Progress: {inserted} inserted...')
-
-        except Exception as e:
-            logger.error(f'Error inserting transaction: {e}')
-            errors += 1
+    if recompute and inserted:
+        recompute_pending(repo)
 
     logger.info('=' * 50)
     logger.info('IMPORT COMPLETE')
@@ -129,6 +122,17 @@ def main():
         action='store_true',
         help='Parse CSV but do not insert into database'
     )
+    parser.add_argument(
+        '--chunk-size',
+        type=int,
+        default=500,
+        help='Rows per insert request (default: 500)'
+    )
+    parser.add_argument(
+        '--skip-recompute',
+        action='store_true',
+        help='Do not recompute dividends/snapshots for the imported tickers'
+    )
 
     args = parser.parse_args()
 
@@ -136,7 +140,9 @@ def main():
         logger.error(f'File not found: {args.file}')
         sys.exit(1)
 
-    results = import_csv(args.file, dry_run=args.dry_run)
+    results = import_csv(args.file, dry_run=args.dry_run,
+                         recompute=not args.skip_recompute,
+                         chunk_size=args.chunk_size)
 
     if results['errors'] > 0:
         sys.exit(1)
@@ -0,0 +1,62 @@
+"""
+Price history maintenance script.
+Creates the upcoming monthly price_history partitions, rolls raw prices
+older than the retention window up into price_daily and drops their
+partitions. Safe to run any number of times.
+"""
+
+import os
+import sys
+import argparse
+import logging
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from utils.repository import get_repository, get_backend
+from utils.supabase_client import PRICE_HISTORY_RAW_DAYS
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    """Main entry point for maintenance script."""
+    parser = argparse.ArgumentParser(
+        description='Partition, roll up and prune the price history'
+    )
+    parser.add_argument(
+        '--raw-days',
+        type=int,
+        default=PRICE_HISTORY_RAW_DAYS,
+        help='Days of raw intraday prices to keep (older ones become daily OHLC)'
+    )
+    parser.add_argument(
+        '--months-ahead',
+        type=int,
+        default=2,
+        help='Future monthly partitions to create'
+    )
+
+    args = parser.parse_args()
+
+    repo = get_repository()
+    logger.info(f'Connected to {get_backend()} backend')
+
+    results = repo.maintain_price_history(args.raw_days, args.months_ahead)
+
+    logger.info(f'Partitions created: {results["partitions_created"]}, '
+                f'dropped: {results["partitions_dropped"]}, '
+                f'daily rows rolled up: {results["daily_rows"]}')
+
+
+if __name__ == '__main__':
+    main()
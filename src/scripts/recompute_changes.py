@@ -0,0 +1,54 @@
+"""
+Ledger change recompute script.
+Recomputes dividends and portfolio snapshots only for the tickers and
+dates touched by transactions added or deleted since the last run.
+"""
+
+import os
+import sys
+import argparse
+import logging
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from utils.repository import get_repository, get_backend
+from utils.ledger_recompute import recompute_pending
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    """Main entry point for recompute script."""
+    parser = argparse.ArgumentParser(
+        description='Recompute dividends and snapshots for pending ledger changes'
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=1000,
+        help='Maximum ledger changes processed per batch'
+    )
+
+    args = parser.parse_args()
+
+    repo = get_repository()
+    logger.info(f'Connected to {get_backend()} backend')
+
+    results = recompute_pending(repo, limit=args.batch_size)
+
+    if not results['changes']:
+        logger.info('No pending ledger changes')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,19 +1,31 @@
 """
 Automated price update script.
-Runs via GitHub Actions every 4 hours.
+Runs via GitHub Actions every 30 minutes; each run only refreshes
+the tiers that are due (see utils/refresh_schedule.py).
+With --daemon it instead stays resident and runs the schedule itself.
 
 Tasks:
-1. Fetch current prices for all tickers in portfolio
+1. Fetch current prices for the tickers in due tiers
 2. Update current_prices and price_history tables
-3. Fetch and store FX rates
-4. Calculate and store dividends
-5. Create portfolio snapshot
+3. Fetch and store FX rates (hourly)
+4. Calculate and store dividends (daily)
+5. Roll old price_history partitions up into price_daily (daily)
+6. Create portfolio snapshot
+
+Every run also applies pending ledger changes (see utils/ledger_recompute.py).
 """
 
 import os
 import sys
+import json
+import time
+import queue
+import signal
+import argparse
 import logging
-from datetime import date, datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone
+from typing import Optional
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
@@ -22,24 +34,23 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-from utils.supabase_client import (
-    get_client,
-    get_unique_tickers,
-    get_all_transactions,
-    upsert_current_price,
-    insert_price_history,
-    upsert_current_fx_rate,
-    insert_fx_history,
-    upsert_dividend,
-    get_holdings_with_value,
-    insert_portfolio_snapshot
-)
+from utils.supabase_client import reset_client
+from utils.repository import get_repository, get_backend
 from utils.price_fetcher import (
     fetch_price_with_retry,
     fetch_dividend_history,
     fetch_fx_rate
 )
 from utils.calculations import calculate_shares_at_date
+from utils.ledger_recompute import recompute_pending
+from utils.run_report import RunReport, write_report_json
+from utils.refresh_schedule import (
+    REFRESH_TIERS,
+    REFRESH_JOBS,
+    get_due,
+    next_due_time,
+    group_tickers_by_tier
+)
 
 # Configure logging
 logging.basicConfig(
@@ -49,45 +60,166 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def update_prices(client) -> dict:
+class BatchWriter:
+    """Buffers fetched prices and writes them to the repository in batches."""
+
+    def __init__(self, repo, last_prices: dict, batch_size: int):
+        self.repo = repo
+        self.last_prices = last_prices
+        self.batch_size = batch_size
+        self.pending = []
+        self.last_flush = time.monotonic()
+        self.unchanged = 0
+        self.batches = 0
+        self.rows_written = {'current_prices': 0, 'price_history': 0}
+        self.failed_tickers = []
+        self.history_failed_tickers = []
+
+    def add(self, ticker: str, price: float):
+        """Queue a price for the next flush."""
+        self.pending.append({'ticker': ticker, 'price': price})
+
+    def should_flush(self, flush_interval: float) -> bool:
+        """True when the batch is full or has waited long enough."""
+        if not self.pending:
+            return False
+        return (len(self.pending) >= self.batch_size or
+                time.monotonic() - self.last_flush >= flush_interval)
+
+    def flush(self):
+        """Write pending prices: one upsert and one history insert per batch."""
+        batch, self.pending = self.pending, []
+        self.last_flush = time.monotonic()
+        if not batch:
+            return
+
+        # Only record history when the price actually moved
+        history = [
+            row for row in batch
+            if self.last_prices.get(row['ticker']) != round(row['price'], 4)
+        ]
+        self.unchanged += len(batch) - len(history)
+
+        # Separate writes, so a failed history insert doesn't report
+        # current prices that were written as failed
+        self.batches += 1
+        try:
+            self.repo.upsert_current_prices(batch)
+            self.rows_written['current_prices'] += len(batch)
+        except Exception as e:
+            tickers = [row['ticker'] for row in batch]
+            logger.error(f'Failed to write current_prices batch {tickers}: {e}')
+            self.failed_tickers.extend(tickers)
+
+        if not history:
+            return
+        try:
+            self.repo.insert_price_history_batch(history)
+            self.rows_written['price_history'] += len(history)
+        except Exception as e:
+            tickers = [row['ticker'] for row in history]
+            logger.error(f'Failed to write price_history batch {tickers}: {e}')
+            self.history_failed_tickers.extend(tickers)
+
+
+def update_prices(repo, tickers: Optional[list[str]] = None,
+                  fetch_workers: int = 4, queue_size: int = 100,
+                  batch_size: int = 50, flush_interval: float = 5.0,
+                  report: Optional[RunReport] = None) -> dict:
     """
-    Fetch and update prices for all tickers.
+    Fetch and update prices for the given tickers.
+
+    Fetcher threads push results into a bounded queue while this thread
+    drains it and writes batches, so network fetches and database writes
+    overlap. A price_history row is only written when the price actually
+    moved, so closed markets don't add identical points on every run.
+
+    Args:
+        repo: Data repository (see utils.repository)
+        tickers: Tickers to refresh (defaults to all tickers in transactions)
+        fetch_workers: Number of concurrent price fetchers
+        queue_size: Maximum fetched prices waiting to be written
+        batch_size: Flush when this many prices are pending
+        flush_interval: Flush pending prices at least this often (seconds)
+        report: Run report receiving fetch latencies and rows written
 
     Returns:
         Dict with success/failure counts
     """
     logger.info('Starting price update...')
 
-    tickers = get_unique_tickers(client)
-    logger.info(f'Found {len(tickers)} unique tickers')
+    if tickers is None:
+        tickers = repo.get_unique_tickers()
+    logger.info(f'Refreshing {len(tickers)} tickers')
+
+    last_prices = repo.get_current_prices()
+    writer = BatchWriter(repo, last_prices, batch_size)
+    results = queue.Queue(maxsize=queue_size)
+    fetch_failed = []
+
+    def produce(ticker: str):
+        price = None
+        stats = {'attempts': 0}
+        start = time.monotonic()
+        try:
+            price = fetch_price_with_retry(ticker, stats=stats)
+        finally:
+            if report is not None:
+                report.record_fetch(ticker, time.monotonic() - start,
+                                    stats['attempts'], price is not None)
+            # Blocks while the writer is behind, bounding memory
+            results.put((ticker, price))
+
+    with ThreadPoolExecutor(max_workers=fetch_workers) as pool:
+        for ticker in tickers:
+            pool.submit(produce, ticker)
+
+        received = 0
+        while received < len(tickers):
+            try:
+                ticker, price = results.get(timeout=flush_interval)
+            except queue.Empty:
+                writer.flush()
+                continue
+
+            received += 1
+            if price is not None:
+                writer.add(ticker, price)
+            else:
+                fetch_failed.append(ticker)
 
-    success = 0
-    failed = 0
-    failed_tickers = []
+            if writer.should_flush(flush_interval):
+                writer.flush()
 
-    for ticker in tickers:
-        price = fetch_price_with_retry(ticker)
+    writer.flush()
 
-        if price is not None:
-            upsert_current_price(client, ticker, price)
-            insert_price_history(client, ticker, price)
-            success += 1
-        else:
-            failed += 1
-            failed_tickers.append(ticker)
+    if report is not None:
+        for table, count in writer.rows_written.items():
+            report.add_rows(table, count)
 
-    logger.info(f'Price update complete: {success} success, {failed} failed')
+    failed_tickers = fetch_failed + writer.failed_tickers
+    failed = len(failed_tickers)
+    success = len(tickers) - failed
+    unchanged = writer.unchanged
+
+    logger.info(f'Price update complete: {success} success ({unchanged} unchanged), '
+                f'{failed} failed, {writer.batches} write batches')
     if failed_tickers:
         logger.warning(f'Failed tickers: {failed_tickers}')
+    if writer.history_failed_tickers:
+        logger.warning(f'Current price written but price_history failed: '
+                       f'{writer.history_failed_tickers}')
 
     return {
         'success': success,
         'failed': failed,
-        'failed_tickers': failed_tickers
+        'unchanged': unchanged,
+        'failed_tickers': failed_tickers,
+        'history_failed_tickers': writer.history_failed_tickers
     }
 
 
-def update_fx_rates(client) -> dict:
+def update_fx_rates(repo, report: Optional[RunReport] = None) -> dict:
     """
     Fetch and update FX rates.
 
@@ -108,8 +240,10 @@ def update_fx_rates(client) -> dict:
         rate = fetch_fx_rate(base, quote)
 
         if rate is not None:
-            upsert_current_fx_rate(client, pair_name, rate)
-            insert_fx_history(client, pair_name, rate)
+            repo.upsert_current_fx_rate(pair_name, rate)
+            repo.insert_fx_history(pair_name, rate)
+            if report is not None:
+                report.add_rows('fx_rates', 1)
             results[pair_name] = rate
             logger.info(f'Updated FX rate {pair_name}: {rate}')
         else:
@@ -119,38 +253,59 @@ def update_fx_rates(client) -> dict:
     return results
 
 
-def update_dividends(client) -> dict:
+def update_dividends(repo, transactions: Optional[list] = None,
+                     report: Optional[RunReport] = None) -> dict:
     """
     Calculate and update dividends for all tickers.
 
+    Args:
+        repo: Data repository (see utils.repository)
+        transactions: Preloaded transactions; when omitted the shares held
+            on each payment date come from one holdings_at query instead
+            of the full ledger
+        report: Run report receiving rows written
+
     Returns:
         Dict with dividend counts
     """
     logger.info('Starting dividend calculation...')
 
-    tickers = get_unique_tickers(client)
-    transactions = get_all_transactions(client)
-
-    total_dividends = 0
-    tickers_with_dividends = 0
+    if transactions is None:
+        tickers = repo.get_unique_tickers()
+    else:
+        tickers = sorted(set(tx['ticker'] for tx in transactions))
 
+    # Payment dates per ticker
+    payments = {}
     for ticker in tickers:
         div_history = fetch_dividend_history(ticker)
 
         if div_history.empty:
             continue
 
-        tickers_with_dividends += 1
+        payments[ticker] = [
+            (payment_date.date() if hasattr(payment_date, 'date') else payment_date,
+             dividend_per_share)
+            for payment_date, dividend_per_share in div_history.items()
+        ]
 
-        for payment_date, dividend_per_share in div_history.items():
-            # Convert timestamp to date
-            if hasattr(payment_date, 'date'):
-                pay_date = payment_date.date()
-            else:
-                pay_date = payment_date
+    if transactions is None:
+        pay_dates = {pay_date for rows in payments.values() for pay_date, _ in rows}
+        holdings = repo.get_holdings_at(sorted(pay_dates), list(payments))
+
+        def shares_at(ticker: str, pay_date: date) -> float:
+            return holdings[pay_date.isoformat()].get(ticker, 0.0)
+    else:
+        def shares_at(ticker: str, pay_date: date) -> float:
+            return calculate_shares_at_date(transactions, ticker, pay_date)
+
+    total_dividends = 0
+    tickers_with_dividends = len(payments)
 
+    for ticker, rows in payments.items():
+        for pay_date, dividend_per_share in rows:
             # Calculate shares held at dividend date
-            shares = calculate_shares_at_date(transactions, ticker, pay_date)
+            shares = shares_at(ticker, pay_date)
 
             if shares <= 0:
                 continue
@@ -159,8 +314,7 @@ def update_dividends(client) -> dict:
             total_received = shares * float(dividend_per_share)
 
             # Store dividend
-            upsert_dividend(
-                client,
+            repo.upsert_dividend(
                 ticker=ticker,
                 payment_date=pay_date,
                 dividend_per_share=float(dividend_per_share),
@@ -170,6 +324,9 @@ def update_dividends(client) -> dict:
 
             total_dividends += 1
 
+    if report is not None:
+        report.add_rows('dividends', total_dividends)
+
     logger.info(f'Dividend update complete: {total_dividends} records from '
                 f'{tickers_with_dividends} tickers')
 
@@ -179,7 +336,7 @@ def update_dividends(client) -> dict:
     }
 
 
-def create_portfolio_snapshot(client) -> dict:
+def create_portfolio_snapshot(repo) -> dict:
     """
     Create a snapshot of current portfolio value.
 
@@ -188,16 +345,16 @@ def create_portfolio_snapshot(client) -> dict:
     """
     logger.info('Creating portfolio snapshot...')
 
-    holdings = get_holdings_with_value(client)
+    holdings = repo.get_holdings_frame('current_value, total_cost')
 
-    if not holdings:
+    if holdings.empty:
         logger.warning('No holdings found for snapshot')
         return {'total_value': 0, 'total_cost': 0}
 
-    total_value = sum(float(h.get('current_value') or 0) for h in holdings)
-    total_cost = sum(float(h.get('total_cost') or 0) for h in holdings)
+    total_value = float(holdings['current_value'].sum())
+    total_cost = float(holdings['total_cost'].sum())
 
-    insert_portfolio_snapshot(client, date.today(), total_value, total_cost)
+    repo.insert_portfolio_snapshot(date.today(), total_value, total_cost)
 
     logger.info(f'Snapshot created: value=${total_value:,.2f}, cost=${total_cost:,.2f}')
 
@@ -208,41 +365,335 @@ def create_portfolio_snapshot(client) -> dict:
     }
 
 
+class ReferenceData:
+    """Transactions and ticker metadata kept warm between daemon cycles."""
+
+    def __init__(self):
+        self.version = None
+        self.transactions = []
+        self.asset_types = {}
+        self.reloads = 0
+
+    def refresh(self, repo) -> bool:
+        """Reload transactions only if the table changed. Returns True on reload."""
+        version = repo.get_transactions_version()
+        if version == self.version:
+            return False
+
+        self.transactions = repo.get_all_transactions()
+        asset_types = {}
+        for tx in self.transactions:
+            if tx.get('asset_type') or tx['ticker'] not in asset_types:
+                asset_types[tx['ticker']] = tx.get('asset_type')
+        self.asset_types = asset_types
+        self.version = version
+        self.reloads += 1
+
+        logger.info(f'Reloaded {len(self.transactions)} transactions '
+                    f'({len(asset_types)} tickers)')
+        return True
+
+
+def run_schedule(repo, only: Optional[list[str]] = None,
+                 reference: Optional[ReferenceData] = None,
+                 report: Optional[RunReport] = None) -> dict:
+    """
+    Run the refresh tiers and jobs that are due.
+
+    Args:
+        repo: Data repository (see utils.repository)
+        only: Force these tiers/jobs instead of asking the schedule
+        reference: Warm reference data (daemon mode); queried when omitted
+        report: Run report receiving stage timings and metrics
+
+    Returns:
+        Dict with the tiers/jobs that ran and their results
+    """
+    if report is None:
+        report = RunReport()
+
+    with report.stage('schedule'):
+        if only is None:
+            last_runs = repo.get_refresh_state()
+            due_tiers = get_due(REFRESH_TIERS, last_runs)
+            due_jobs = get_due(REFRESH_JOBS, last_runs)
+        else:
+            due_tiers = [name for name in only if name in REFRESH_TIERS]
+            due_jobs = [name for name in only if name in REFRESH_JOBS]
+
+        if reference is not None:
+            asset_types = reference.asset_types
+        else:
+            asset_types = repo.get_ticker_asset_types()
+        groups = group_tickers_by_tier(asset_types)
+
+    logger.info(f'Due tiers: {due_tiers or "none"}; due jobs: {due_jobs or "none"}')
+
+    report.tiers = due_tiers
+    report.jobs = due_jobs
+    report.deferred = [
+        ticker for tier, tickers in groups.items()
+        if tier not in due_tiers for ticker in tickers
+    ]
+
+    results = {'tiers': due_tiers, 'jobs': due_jobs}
+
+    # Apply ledger edits first so today's snapshot below already includes them
+    with report.stage('recompute'):
+        results['recompute'] = recompute_pending(repo)
+
+    if due_tiers:
+        tickers = [ticker for tier in due_tiers for ticker in groups[tier]]
+        with report.stage('prices'):
+            results['prices'] = update_prices(repo, tickers, report=report)
+        report.failed = results['prices']['failed_tickers']
+
+    if 'fx' in due_jobs:
+        with report.stage('fx'):
+            results['fx'] = update_fx_rates(repo, report=report)
+
+    if 'dividends' in due_jobs:
+        transactions = reference.transactions if reference is not None else None
+        with report.stage('dividends'):
+            results['dividends'] = update_dividends(repo, transactions, report=report)
+
+    # Any price movement changes today's portfolio value
+    if due_tiers:
+        with report.stage('snapshot'):
+            results['snapshot'] = create_portfolio_snapshot(repo)
+        report.add_rows('portfolio_snapshots', 1)
+
+    # Housekeeping last; a failure is logged and retried on the next run
+    # instead of skipping the snapshot and refresh state
+    done_jobs = list(due_jobs)
+    if 'price_maintenance' in due_jobs:
+        try:
+            with report.stage('price_maintenance'):
+                results['price_maintenance'] = repo.maintain_price_history()
+        except Exception as e:
+            logger.error(f'Price history maintenance failed: {e}')
+            results['price_maintenance'] = {'error': str(e)}
+            done_jobs.remove('price_maintenance')
+
+    # A tier whose every ticker failed stays due, so it is retried next run
+    failed = set(report.failed)
+    done_tiers = [
+        tier for tier in due_tiers
+        if not groups[tier] or any(ticker not in failed for ticker in groups[tier])
+    ]
+    repo.mark_refreshed(done_tiers + done_jobs)
+
+    return results
+
+
+def publish_report(repo, report: RunReport, report_dir: str,
+                   status: str = 'ok', error: Optional[str] = None) -> dict:
+    """
+    Save a run report as JSON in report_dir and in the pipeline_runs table.
+
+    Failures to store the report are logged, never raised.
+    """
+    data = report.to_dict(status=status, error=error)
+
+    try:
+        path = write_report_json(data, report_dir)
+        logger.info(f'Run report written to {path}')
+    except OSError as e:
+        logger.warning(f'Could not write run report file: {e}')
+
+    if repo is not None:
+        try:
+            repo.insert_pipeline_run(data)
+        except Exception as e:
+            logger.warning(f'Could not store run report: {e}')
+
+    return data
+
+
+def write_health(path: str, health: dict):
+    """Atomically write the daemon health/metrics file."""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(health, f, indent=2, default=str)
+    os.replace(tmp_path, path)
+
+
+def run_daemon(health_file: str, report_dir: str, max_sleep: float = 300.0):
+    """
+    Keep a warm process that runs the refresh schedule internally.
+
+    The repository and reference data are reused across cycles;
+    transactions are reloaded only when the table changes. After each
+    cycle the health/metrics file is rewritten and a run report is published.
+
+    Args:
+        health_file: Path of the JSON health/metrics file
+        report_dir: Directory for per-cycle run report JSON files
+        max_sleep: Upper bound in seconds between schedule checks
+    """
+    stopping = False
+
+    def request_stop(signum, frame):
+        nonlocal stopping
+        logger.info(f'Received signal {signum}, stopping after current cycle')
+        stopping = True
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    health = {
+        'pid': os.getpid(),
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'status': 'starting',
+        'cycles': 0,
+        'failures': 0,
+        'consecutive_failures': 0,
+        'transaction_reloads': 0,
+        'last_cycle_at': None,
+        'last_success_at': None,
+        'last_cycle_seconds': None,
+        'last_error': None,
+        'last_ran': None,
+        'next_due_at': None,
+    }
+    write_health(health_file, health)
+
+    repo = None
+    reference = ReferenceData()
+
+    while not stopping:
+        cycle_start = time.monotonic()
+        health['last_cycle_at'] = datetime.now(timezone.utc).isoformat()
+        report = RunReport(trigger='daemon')
+
+        try:
+            if repo is None:
+                repo = get_repository()
+                logger.info(f'Connected to {get_backend()} backend')
+
+            with report.stage('reference'):
+                reference.refresh(repo)
+            results = run_schedule(repo, reference=reference, report=report)
+            publish_report(repo, report, report_dir)
+
+            last_runs = repo.get_refresh_state()
+            next_due = min(next_due_time(REFRESH_TIERS, last_runs),
+                           next_due_time(REFRESH_JOBS, last_runs))
+
+            health['status'] = 'ok'
+            health['last_success_at'] = datetime.now(timezone.utc).isoformat()
+            health['consecutive_failures'] = 0
+            health['last_ran'] = results['tiers'] + results['jobs']
+            if 'prices' in results:
+                health['last_prices'] = results['prices']
+            health['next_due_at'] = next_due.isoformat()
+            sleep_for = (next_due - datetime.now(timezone.utc)).total_seconds()
+
+        except Exception as e:
+            logger.error(f'Daemon cycle failed: {e}')
+            health['status'] = 'error'
+            health['failures'] += 1
+            health['consecutive_failures'] += 1
+            health['last_error'] = str(e)
+            publish_report(repo, report, report_dir, status='error', error=str(e))
+            # Rebuild the connection next cycle and back off
+            reset_client()
+            repo = None
+            sleep_for = min(30 * (2 ** health['consecutive_failures']), max_sleep)
+
+        health['cycles'] += 1
+        health['transaction_reloads'] = reference.reloads
+        health['last_cycle_seconds'] = round(time.monotonic() - cycle_start, 3)
+        write_health(health_file, health)
+
+        # Wake up periodically so new transactions and signals are noticed
+        deadline = time.monotonic() + min(max(sleep_for, 1.0), max_sleep)
+        while not stopping and time.monotonic() < deadline:
+            time.sleep(1.0)
+
+    health['status'] = 'stopped'
+    write_health(health_file, health)
+    logger.info('Daemon stopped')
+
+
 def main():
     """Main entry point for price update script."""
+    parser = argparse.ArgumentParser(
+        description='Refresh prices, FX rates, dividends and snapshots'
+    )
+    parser.add_argument(
+        '--tier',
+        action='append',
+        choices=list(REFRESH_TIERS) + list(REFRESH_JOBS),
+        help='Run this tier/job regardless of schedule (repeatable)'
+    )
+    parser.add_argument(
+        '--all',
+        action='store_true',
+        help='Run every tier and job regardless of schedule'
+    )
+    parser.add_argument(
+        '--daemon',
+        action='store_true',
+        help='Stay resident and run the refresh schedule internally'
+    )
+    parser.add_argument(
+        '--health-file',
+        default=os.getenv('UPDATER_HEALTH_FILE', 'updater_health.json'),
+        help='Where the daemon writes its health/metrics JSON'
+    )
+    parser.add_argument(
+        '--report-dir',
+        default=os.getenv('RUN_REPORT_DIR', 'reports'),
+        help='Directory for the JSON run reports'
+    )
+    args = parser.parse_args()
+
+    if args.daemon:
+        logger.info('DARUMA - Price Update Daemon')
+        run_daemon(args.health_file, args.report_dir)
+        return
+
+    only = args.tier
+    if args.all:
+        only = list(REFRESH_TIERS) + list(REFRESH_JOBS)
+
     logger.info('=' * 50)
     logger.info('DARUMA - Price Update Script')
     logger.info(f'Started at: {datetime.utcnow().isoformat()}')
     logger.info('=' * 50)
 
-    try:
-        client = get_client()
-        logger.info('Connected to Supabase')
+    report = RunReport(trigger='manual' if only else 'cron')
+    repo = None
 
-        # Update prices
-        price_results = update_prices(client)
-
-        # Update FX rates
-        fx_results = update_fx_rates(client)
-
-        # Update dividends
-        dividend_results = update_dividends(client)
+    try:
+        repo = get_repository()
+        logger.info(f'Connected to {get_backend()} backend')
 
-        # Create snapshot
-        snapshot_results = create_portfolio_snapshot(client)
+        results = run_schedule(repo, only=only, report=report)
+        publish_report(repo, report, args.report_dir)
 
         # Summary
         logger.info('=' * 50)
         logger.info('UPDATE COMPLETE')
-        logger.info(f'Prices: {price_results["success"]} updated, '
-                   f'{price_results["failed"]} failed')
-        logger.info(f'FX Rates: {len([r for r in fx_results.values() if r])} updated')
-        logger.info(f'Dividends: {dividend_results["total_records"]} records')
-        logger.info(f'Portfolio Value: ${snapshot_results["total_value"]:,.2f}')
+        if 'prices' in results:
+            logger.info(f'Prices: {results["prices"]["success"]} updated, '
+                       f'{results["prices"]["failed"]} failed')
+        if 'fx' in results:
+            logger.info(f'FX Rates: {len([r for r in results["fx"].values() if r])} updated')
+        if 'dividends' in results:
+            logger.info(f'Dividends: {results["dividends"]["total_records"]} records')
+        if 'price_maintenance' in results:
+            maintenance = results['price_maintenance']
+            logger.info(f'Price history: {maintenance["partitions_dropped"]} partitions '
+                        f'rolled up into {maintenance["daily_rows"]} daily rows')
+        if 'snapshot' in results:
+            logger.info(f'Portfolio Value: ${results["snapshot"]["total_value"]:,.2f}')
         logger.info('=' * 50)
 
     except Exception as e:
         logger.error(f'Script failed with error: {e}')
+        publish_report(repo, report, args.report_dir, status='error', error=str(e))
         raise
 
 
@@ -41,6 +41,202 @@ def calculate_shares_at_date(transactions: list, ticker: str,
     return max(0, shares)
 
 
+def calculate_position_at_date(transactions: list, ticker: str,
+                               target_date: date, method: str = 'FIFO') -> tuple:
+    """
+    Calculate shares and cost of a ticker at a date, like position_ledger.
+
+    Cost is the cost basis of the lots still open at the end of the day
+    (see apply_lot_transaction), the same as current_holdings; a closed
+    or short position counts as (0, 0).
+
+    Args:
+        transactions: List of transaction dicts
+        ticker: Ticker symbol
+        target_date: Date to calculate the position for
+        method: Lot method, 'FIFO' or 'AVERAGE'
+
+    Returns:
+        Tuple of (shares, total_cost)
+    """
+    held = []
+
+    for tx in transactions:
+        if tx['ticker'] != ticker:
+            continue
+
+        tx_date = tx['date']
+        if isinstance(tx_date, str):
+            tx_date = datetime.fromisoformat(tx_date.replace('Z', '+00:00')).date()
+        elif isinstance(tx_date, datetime):
+            tx_date = tx_date.date()
+
+        if tx_date <= target_date:
+            held.append(tx)
+
+    lots, _ = build_tax_lots(held, method)
+    return lot_position(lots.get(ticker, []))
+
+
+def calculate_position_series(transactions: list, ticker: str,
+                              days: list, method: str = 'FIFO') -> list:
+    """
+    Calculate shares and cost of a ticker at the end of each of some days.
+
+    Same result as calculate_position_at_date for every day, but the lots
+    are replayed once for the whole series.
+
+    Args:
+        transactions: List of transaction dicts
+        ticker: Ticker symbol
+        days: Dates to calculate the position for, in ascending order
+        method: Lot method, 'FIFO' or 'AVERAGE'
+
+    Returns:
+        List of (shares, total_cost) tuples, one per day
+    """
+    ordered = []
+
+    for tx in transactions:
+        if tx['ticker'] != ticker:
+            continue
+
+        tx_date = tx['date']
+        if isinstance(tx_date, str):
+            tx_date = datetime.fromisoformat(tx_date.replace('Z', '+00:00')).date()
+        elif isinstance(tx_date, datetime):
+            tx_date = tx_date.date()
+        ordered.append((tx_date, tx))
+
+    ordered.sort(key=lambda item: (item[1]['date'], item[1]['id']))
+
+    lots = []
+    positions = []
+    index = 0
+    for day in days:
+        while index < len(ordered) and ordered[index][0] <= day:
+            apply_lot_transaction(lots, ordered[index][1], method)
+            index += 1
+        positions.append(lot_position(lots))
+    return positions
+
+
+def downsample_ohlc(rows: list, start: datetime, width: timedelta) -> list:
+    """
+    Bucket price rows into OHLC points (same output as price_history_buckets).
+
+    Args:
+        rows: Price history dicts with 'recorded_at' (ISO) and 'price', oldest first
+        start: Start of the first bucket
+        width: Bucket width
+
+    Returns:
+        One dict per non-empty bucket: bucket_start, recorded_at (last),
+        open, high, low, price (close) and n
+    """
+    buckets = []
+    for row in rows:
+        recorded = datetime.fromisoformat(row['recorded_at'].replace('Z', '+00:00'))
+        bucket_start = start + width * ((recorded - start) // width)
+        price = float(row['price'])
+        if not buckets or buckets[-1]['bucket_start'] != bucket_start.isoformat():
+            buckets.append({
+                'bucket_start': bucket_start.isoformat(), 'recorded_at': row['recorded_at'],
+                'open': price, 'high': price, 'low': price, 'price': price, 'n': 0,
+            })
+        bucket = buckets[-1]
+        bucket['recorded_at'] = row['recorded_at']
+        bucket['high'] = max(bucket['high'], price)
+        bucket['low'] = min(bucket['low'], price)
+        bucket['price'] = price
+        bucket['n'] += 1
+    return buckets
+
+
+def merge_daily_bar(bar: Optional[dict], row: dict) -> dict:
+    """
+    Fold one price row into a price_daily bar (like the price_daily trigger).
+
+    Args:
+        bar: Existing bar of the row's UTC day, or None
+        row: Price history dict with 'recorded_at' (UTC ISO) and 'price'
+
+    Returns:
+        The updated bar: day, open, high, low, close, n, first_at, last_at
+    """
+    price = float(row['price'])
+    at = row['recorded_at']
+    if bar is None:
+        return {'day': at[:10], 'open': price, 'high': price, 'low': price,
+                'close': price, 'n': 1, 'first_at': at, 'last_at': at}
+    if at < bar['first_at']:
+        bar['open'], bar['first_at'] = price, at
+    if at >= bar['last_at']:
+        bar['close'], bar['last_at'] = price, at
+    bar['high'] = max(bar['high'], price)
+    bar['low'] = min(bar['low'], price)
+    bar['n'] += 1
+    return bar
+
+
+def downsample_daily(bars: list, start: datetime, width: timedelta) -> list:
+    """
+    Bucket daily bars into wider OHLC points (same output as downsample_ohlc).
+
+    Args:
+        bars: price_daily dicts with 'day' (YYYY-MM-DD), oldest first
+        start: Start of the first bucket (UTC midnight)
+        width: Bucket width, a whole number of days
+
+    Returns:
+        One dict per non-empty bucket: bucket_start, recorded_at (last tick),
+        open, high, low, price (close) and n
+    """
+    buckets = []
+    for bar in bars:
+        day_start = datetime.combine(date.fromisoformat(bar['day']), datetime.min.time(),
+                                     tzinfo=start.tzinfo)
+        bucket_start = (start + width * ((day_start - start) // width)).isoformat()
+        if not buckets or buckets[-1]['bucket_start'] != bucket_start:
+            buckets.append({
+                'bucket_start': bucket_start, 'recorded_at': bar.get('last_at'),
+                'open': bar['open'], 'high': bar['high'], 'low': bar['low'],
+                'price': bar['close'], 'n': 0,
+            })
+        bucket = buckets[-1]
+        bucket['recorded_at'] = bar.get('last_at')
+        bucket['high'] = max(bucket['high'], bar['high'])
+        bucket['low'] = min(bucket['low'], bar['low'])
+        bucket['price'] = bar['close']
+        bucket['n'] += bar['n']
+    return buckets
+
+
+def downsample_last(rows: list, start: date, width_days: int) -> list:
+    """
+    Keep the last snapshot of each bucket (same output as portfolio_snapshot_buckets).
+
+    Args:
+        rows: Snapshot dicts with 'snapshot_date' (YYYY-MM-DD), oldest first
+        start: First day of the first bucket
+        width_days: Bucket width in days
+
+    Returns:
+        The last row of each non-empty bucket, with its row count as 'n'
+    """
+    buckets = {}
+    for row in rows:
+        bucket = (date.fromisoformat(row['snapshot_date'][:10]) - start).days // width_days
+        count = buckets[bucket]['n'] + 1 if bucket in buckets else 1
+        buckets[bucket] = {**row, 'n': count}
+    return list(buckets.values())
+
+
+def snapshot_bucket_days(days: int, points: int) -> int:
+    """Bucket width in days that fits a window of days into about points buckets."""
+    return max(-(-(days + 1) // max(points, 1)), 1)
+
+
 def calculate_period_return(current_value: float, previous_value: float) -> tuple:
     """
     Calculate return for a period.
@@ -121,6 +317,138 @@ def calculate_weighted_avg_price(transactions: list, ticker: str) -> float:
     return total_cost / total_shares
 
 
+# Cost basis methods of the tax lot engine (lot_settings.method)
+LOT_METHODS = ('FIFO', 'AVERAGE')
+
+
+def _realized_row(ticker: str, sell_id: int, lot_id: int, closed_at: str,
+                  quantity: float, sale_price: float, cost_per_share: float) -> dict:
+    """One realized P&L row (same columns as the realized_pnl table)."""
+    return {
+        'ticker': ticker,
+        'sell_transaction_id': sell_id,
+        'lot_transaction_id': lot_id,
+        'closed_at': closed_at,
+        'quantity': quantity,
+        'proceeds': quantity * sale_price,
+        'cost': quantity * cost_per_share,
+        'realized': quantity * (sale_price - cost_per_share),
+    }
+
+
+def apply_lot_transaction(lots: list, tx: dict, method: str = 'FIFO') -> list:
+    """
+    Apply one transaction to a ticker's lots, like apply_lot_transaction in SQL.
+
+    A SELL consumes the open lots oldest first (FIFO) or takes the same
+    fraction of every open lot (AVERAGE, so the average cost of what is
+    left does not change). Shares sold beyond the open position become a
+    short lot (negative remaining, cost_per_share is the sale price).
+    A BUY first covers short lots, oldest first, and opens a lot with the
+    rest; so the lots always net to the ticker's shares.
+
+    Args:
+        lots: Lot dicts of the ticker in opening order, updated in place
+        tx: Transaction dict
+        method: 'FIFO' or 'AVERAGE'
+
+    Returns:
+        Realized P&L rows of the transaction
+    """
+    quantity = float(tx['quantity'])
+    price = float(tx['price'])
+    rows = []
+    left = quantity
+
+    if tx['type'] == 'BUY':
+        for lot in lots:
+            if left <= 0:
+                break
+            if lot['remaining'] >= 0:
+                continue
+            take = min(-lot['remaining'], left)
+            rows.append(_realized_row(tx['ticker'], lot['transaction_id'], tx['id'], tx['date'],
+                                      take, lot['cost_per_share'], price))
+            lot['remaining'] += take
+            left -= take
+        lots.append({
+            'transaction_id': tx['id'],
+            'ticker': tx['ticker'],
+            'opened_at': tx['date'],
+            'quantity': quantity,
+            'remaining': left,
+            'cost_per_share': price,
+        })
+        return rows
+
+    open_lots = [lot for lot in lots if lot['remaining'] > 0]
+
+    if method == 'AVERAGE':
+        open_qty = sum(lot['remaining'] for lot in open_lots)
+        if open_qty > 0:
+            take = min(left, open_qty)
+            ratio = take / open_qty
+            for lot in open_lots:
+                part = lot['remaining'] * ratio
+                rows.append(_realized_row(tx['ticker'], tx['id'], lot['transaction_id'], tx['date'],
+                                          part, price, lot['cost_per_share']))
+                lot['remaining'] = 0.0 if take == open_qty else lot['remaining'] - part
+            left -= take
+    else:
+        for lot in open_lots:
+            if left <= 0:
+                break
+            take = min(lot['remaining'], left)
+            rows.append(_realized_row(tx['ticker'], tx['id'], lot['transaction_id'], tx['date'],
+                                      take, price, lot['cost_per_share']))
+            lot['remaining'] -= take
+            left -= take
+
+    if left > 0:
+        lots.append({
+            'transaction_id': tx['id'],
+            'ticker': tx['ticker'],
+            'opened_at': tx['date'],
+            'quantity': -left,
+            'remaining': -left,
+            'cost_per_share': price,
+        })
+    return rows
+
+
+def lot_position(lots: list) -> tuple:
+    """
+    Shares and cost basis of a ticker's lots, like a position_ledger row.
+
+    Returns:
+        Tuple of (shares, cost of the open lots); (0, 0) when the lots
+        net to zero or a short position
+    """
+    shares = sum(lot['remaining'] for lot in lots)
+    if shares <= 0:
+        return (0.0, 0.0)
+    return (shares, sum(lot['remaining'] * lot['cost_per_share']
+                        for lot in lots if lot['remaining'] > 0))
+
+
+def build_tax_lots(transactions: list, method: str = 'FIFO') -> tuple:
+    """
+    Replay transactions into lots and realized P&L, like rebuild_tax_lots.
+
+    Args:
+        transactions: List of transaction dicts (any order, any tickers)
+        method: 'FIFO' or 'AVERAGE'
+
+    Returns:
+        Tuple of ({ticker: [lot dicts]}, [realized P&L rows])
+    """
+    lots = {}
+    realized = []
+    for tx in sorted(transactions, key=lambda t: (t['ticker'], t['date'], t['id'])):
+        realized.extend(apply_lot_transaction(lots.setdefault(tx['ticker'], []), tx, method))
+    return lots, realized
+
+
 def format_currency(value: float, currency: str = 'USD') -> str:
     """Format value as currency string."""
     if currency == 'USD':
@@ -0,0 +1,212 @@
+"""
+Lightweight instrumentation of data-layer calls.
+
+Every public function in utils.supabase_client is wrapped so each call
+records its latency, row count, HTTP round trips and response bytes in a
+ring buffer. Page loaders decorated with cached_loader also record whether
+Streamlit's cache answered (hit) or the loader ran (miss). Records are
+tagged with the page render that issued them (see begin_render).
+"""
+
+import time
+import uuid
+import threading
+import functools
+import contextvars
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+# Number of records kept in memory
+BUFFER_SIZE = 500
+
+_records = deque(maxlen=BUFFER_SIZE)
+_records_lock = threading.Lock()
+
+# Traffic counters of the data-layer call in progress (None outside a call)
+_current_call = contextvars.ContextVar('current_call', default=None)
+# Render the current call belongs to: (render id, page name)
+_current_render = contextvars.ContextVar('current_render', default=(None, None))
+# Set by the body of a cached loader when it actually runs
+_loader_ran = contextvars.ContextVar('loader_ran', default=None)
+
+
+def begin_render(page: str) -> str:
+    """
+    Tag the calls of this script run with a new render id.
+
+    Args:
+        page: Page name shown in the debug panel
+
+    Returns:
+        The render id
+    """
+    render_id = uuid.uuid4().hex[:8]
+    _current_render.set((render_id, page))
+    return render_id
+
+
+def current_render() -> Optional[str]:
+    """Id of the render in progress, if any."""
+    return _current_render.get()[0]
+
+
+def add_traffic(num_bytes: int):
+    """Count one HTTP response toward the data-layer call in progress."""
+    counters = _current_call.get()
+    if counters is not None:
+        counters['round_trips'] += 1
+        counters['bytes'] += num_bytes
+
+
+def _count_rows(result) -> int:
+    """Rows in a result: list/frame length, summed over dict values."""
+    if result is None:
+        return 0
+    if isinstance(result, dict):
+        sized = [v for v in result.values() if isinstance(v, list) or hasattr(v, 'columns')]
+        return sum(len(v) for v in sized) if sized else 1
+    if isinstance(result, (list, tuple, set)) or hasattr(result, 'columns'):
+        return len(result)
+    return 1
+
+
+def _record(name: str, kind: str, seconds: float, **fields):
+    render_id, page = _current_render.get()
+    record = {
+        'name': name,
+        'kind': kind,
+        'at': datetime.now(timezone.utc).isoformat(),
+        'seconds': round(seconds, 4),
+        'rows': fields.get('rows', 0),
+        'round_trips': fields.get('round_trips', 0),
+        'bytes': fields.get('bytes', 0),
+        'cache': fields.get('cache'),
+        'error': fields.get('error'),
+        'render': render_id,
+        'page': page,
+    }
+    with _records_lock:
+        _records.append(record)
+
+
+def instrumented(func: Callable) -> Callable:
+    """
+    Record latency, rows and traffic of a data-layer function.
+
+    Calls made from inside another instrumented call are counted toward
+    the outer one only.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _current_call.get() is not None:
+            return func(*args, **kwargs)
+
+        counters = {'round_trips': 0, 'bytes': 0}
+        token = _current_call.set(counters)
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            _record(func.__name__, 'query', time.perf_counter() - start,
+                    error=str(e), **counters)
+            raise
+        finally:
+            _current_call.reset(token)
+
+        _record(func.__name__, 'query', time.perf_counter() - start,
+                rows=_count_rows(result), **counters)
+        return result
+
+    return wrapper
+
+
+def instrument_functions(namespace: dict, module: str, exclude: set):
+    """
+    Wrap every public function defined in a module namespace.
+
+    Args:
+        namespace: The module's globals()
+        module: The module's __name__ (imported helpers are left alone)
+        exclude: Names not to wrap
+    """
+    for name, value in list(namespace.items()):
+        if (callable(value) and getattr(value, '__module__', None) == module
+                and not isinstance(value, type)
+                and not name.startswith('_') and name not in exclude):
+            namespace[name] = instrumented(value)
+
+
+def cached_loader(**cache_kwargs) -> Callable:
+    """
+    st.cache_data that also records cache hits and misses.
+
+    Usage:
+        @cached_loader(ttl=300)
+        def get_holdings(): ...
+    """
+    import streamlit as st
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def body(*args, **kwargs):
+            ran = _loader_ran.get()
+            if ran is not None:
+                ran[0] = True
+            return func(*args, **kwargs)
+
+        cached = st.cache_data(**cache_kwargs)(body)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            ran = [False]
+            token = _loader_ran.set(ran)
+            start = time.perf_counter()
+            try:
+                result = cached(*args, **kwargs)
+            finally:
+                _loader_ran.reset(token)
+            _record(func.__name__, 'loader', time.perf_counter() - start,
+                    rows=_count_rows(result), cache='miss' if ran[0] else 'hit')
+            return result
+
+        wrapper.clear = cached.clear
+        return wrapper
+
+    return decorator
+
+
+def get_records(render: Optional[str] = None, kind: Optional[str] = None) -> list:
+    """
+    Get recorded calls, oldest first.
+
+    Args:
+        render: Only calls of this render id
+        kind: 'query' or 'loader'
+    """
+    with _records_lock:
+        records = list(_records)
+    return [
+        r for r in records
+        if (render is None or r['render'] == render) and (kind is None or r['kind'] == kind)
+    ]
+
+
+def slowest(n: int = 10, kind: str = 'query') -> list:
+    """The n slowest recent calls of a kind."""
+    return sorted(get_records(kind=kind), key=lambda r: r['seconds'], reverse=True)[:n]
+
+
+def render_totals(render: str) -> dict:
+    """Totals of one page render: queries, time, rows, traffic and cache hits."""
+    queries = get_records(render, 'query')
+    loaders = get_records(render, 'loader')
+    return {
+        'queries': len(queries),
+        'query_seconds': round(sum(r['seconds'] for r in queries), 3),
+        'rows': sum(r['rows'] for r in queries),
+        'round_trips': sum(r['round_trips'] for r in queries),
+        'bytes': sum(r['bytes'] for r in queries),
+        'cache_hits': sum(1 for r in loaders if r['cache'] == 'hit'),
+        'cache_misses': sum(1 for r in loaders if r['cache'] == 'miss'),
+    }
@@ -0,0 +1,229 @@
+"""
+Targeted recomputation of derived data after ledger changes.
+
+Transactions inserted or deleted since the last run are read from the
+ledger_changes table (filled by a trigger, see sql/ledger_changes.sql).
+Only the dividends and portfolio snapshots of the touched tickers, from
+the earliest touched date onward, are recomputed.
+"""
+
+import logging
+from bisect import bisect_right
+from datetime import date, datetime
+from typing import Optional
+
+from .price_fetcher import fetch_dividend_history
+from .calculations import calculate_position_series
+
+logger = logging.getLogger(__name__)
+
+# Transaction columns needed to replay a position (an index-only scan of
+# idx_transactions_ticker_date_covering)
+POSITION_COLUMNS = 'id, ticker, date, type, quantity, price'
+
+
+def _parse_timestamp(value: str) -> datetime:
+    """Parse a PostgREST timestamp."""
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def replay_before(transactions: list, changes: list) -> list:
+    """
+    Reconstruct a ticker's transactions as they were before some changes.
+
+    Args:
+        transactions: Current transactions of the ticker
+        changes: Ledger changes to undo, oldest first
+
+    Returns:
+        List of transaction dicts before the changes
+    """
+    state = {tx['id']: tx for tx in transactions}
+
+    for change in reversed(changes):
+        if change['operation'] == 'INSERT':
+            state.pop(change['transaction_id'], None)
+        else:
+            state[change['transaction_id']] = {
+                'id': change['transaction_id'],
+                'ticker': change['ticker'],
+                'date': change['date'],
+                'type': change['type'],
+                'quantity': change['quantity'],
+                'price': change['price'],
+            }
+
+    return list(state.values())
+
+
+def _load_price_series(repo, ticker: str, start: date) -> tuple:
+    """Daily closes of a ticker from start onward, plus the last one before it."""
+    days = (date.today() - start).days + 1
+
+    dates = []
+    prices = []
+
+    previous = repo.get_latest_close_before(ticker, start)
+    if previous is not None:
+        dates.append(date.min)
+        prices.append(previous)
+
+    # The close of a day is its last recorded price (price_daily)
+    for row in repo.get_price_daily(ticker, days=days):
+        day = date.fromisoformat(row['day'][:10])
+        if day < start:
+            continue
+        dates.append(day)
+        prices.append(float(row['close']))
+
+    return dates, prices
+
+
+def _price_on(series: tuple, day: date) -> Optional[float]:
+    """Last price recorded on or before a day."""
+    dates, prices = series
+    index = bisect_right(dates, day)
+    return prices[index - 1] if index else None
+
+
+def recompute_dividends(repo, ticker: str, start: date) -> int:
+    """
+    Recompute dividend rows of a ticker for payments on or after start.
+
+    Shares at each payment date are one position_ledger lookup
+    (repo.get_position_at), not a replay of the ticker's ledger.
+
+    Returns:
+        Number of dividend rows written or removed
+    """
+    div_history = fetch_dividend_history(ticker)
+    if div_history.empty:
+        return 0
+
+    touched = 0
+    for payment_date, dividend_per_share in div_history.items():
+        pay_date = payment_date.date() if hasattr(payment_date, 'date') else payment_date
+        if pay_date < start:
+            continue
+
+        shares = repo.get_position_at(ticker, pay_date)[0]
+        if shares > 0:
+            repo.upsert_dividend(
+                ticker=ticker,
+                payment_date=pay_date,
+                dividend_per_share=float(dividend_per_share),
+                shares_at_date=shares,
+                total_received=shares * float(dividend_per_share)
+            )
+        else:
+            repo.delete_dividend(ticker, pay_date)
+        touched += 1
+
+    return touched
+
+
+def recompute_pending(repo, limit: int = 1000) -> dict:
+    """
+    Apply pending ledger changes to dividends and portfolio snapshots.
+
+    Snapshots are adjusted by the difference between each touched
+    ticker's position before and after the changes, valued at the last
+    recorded price on the snapshot date. Snapshots written after a change
+    already include it and are left alone.
+
+    Args:
+        repo: Data repository (see utils.repository)
+        limit: Maximum number of changes processed per batch
+
+    Returns:
+        Dict with counts of changes, tickers, dividends and snapshots
+    """
+    totals = {'changes': 0, 'tickers': 0, 'dividends': 0, 'snapshots': 0}
+
+    while True:
+        changes = repo.get_pending_ledger_changes(limit=limit)
+        if not changes:
+            break
+
+        by_ticker = {}
+        for change in changes:
+            by_ticker.setdefault(change['ticker'], []).append(change)
+
+        start = min(_parse_timestamp(c['date']).date() for c in changes)
+        # days=0 would mean no window at all, so a change dated today still reads one day
+        window = max((date.today() - start).days + 1, 1)
+        snapshots = [
+            s for s in repo.get_portfolio_snapshots(days=window)
+            if date.fromisoformat(s['snapshot_date']) >= start
+        ]
+        deltas = {s['snapshot_date']: [0.0, 0.0] for s in snapshots}
+        # Snapshot cost is open-lot cost, so positions replay the lots
+        method = repo.get_lot_method()
+
+        for ticker, ticker_changes in by_ticker.items():
+            ticker_start = min(_parse_timestamp(c['date']).date() for c in ticker_changes)
+            after = repo.get_transactions_for_ticker(ticker, columns=POSITION_COLUMNS)
+
+            totals['dividends'] += recompute_dividends(repo, ticker, ticker_start)
+
+            # Snapshots grouped by the changes they don't include yet
+            # (usually all of them share one group)
+            groups = {}
+            for snapshot in snapshots:
+                day = date.fromisoformat(snapshot['snapshot_date'])
+                if day < ticker_start:
+                    continue
+
+                recorded_at = _parse_timestamp(snapshot['recorded_at'])
+                unapplied = [
+                    c for c in ticker_changes
+                    if _parse_timestamp(c['changed_at']) > recorded_at
+                ]
+                if unapplied:
+                    group = groups.setdefault(tuple(c['id'] for c in unapplied), (unapplied, []))
+                    group[1].append((day, snapshot['snapshot_date']))
+            if not groups:
+                continue
+
+            # One replay of the ledger for the after state, one per group for
+            # the before state, each valued over the group's days
+            series = _load_price_series(repo, ticker, ticker_start)
+            touched = sorted({day for _, members in groups.values() for day, _ in members})
+            after_positions = dict(zip(touched, calculate_position_series(after, ticker, touched, method)))
+            for unapplied, members in groups.values():
+                days = [day for day, _ in members]
+                before = replay_before(after, unapplied)
+                before_positions = calculate_position_series(before, ticker, days, method)
+
+                for (day, key), (shares_before, cost_before) in zip(members, before_positions):
+                    shares_after, cost_after = after_positions[day]
+                    price = _price_on(series, day) or 0.0
+                    deltas[key][0] += (shares_after - shares_before) * price
+                    deltas[key][1] += cost_after - cost_before
+
+        applied_at = max(_parse_timestamp(c['changed_at']) for c in changes)
+        for snapshot in snapshots:
+            value_delta, cost_delta = deltas[snapshot['snapshot_date']]
+            if value_delta == 0 and cost_delta == 0:
+                continue
+            repo.insert_portfolio_snapshot(
+                date.fromisoformat(snapshot['snapshot_date']),
+                float(snapshot['total_value']) + value_delta,
+                float(snapshot['total_cost']) + cost_delta,
+                recorded_at=applied_at
+            )
+            totals['snapshots'] += 1
+
+        repo.mark_ledger_changes_processed([c['id'] for c in changes])
+        totals['changes'] += len(changes)
+        totals['tickers'] += len(by_ticker)
+
+        if len(changes) < limit:
+            break
+
+    if totals['changes']:
+        logger.info(f'Recomputed {totals["changes"]} ledger changes: '
+                    f'{totals["tickers"]} tickers, {totals["dividends"]} dividends, '
+                    f'{totals["snapshots"]} snapshots')
+
+    return totals
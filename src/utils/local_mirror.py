@@ -0,0 +1,497 @@
+"""
+Local read-through mirror of the portfolio tables.
+
+The dashboard can read from a SQLite file instead of querying Supabase on
+every page load. The mirror pulls only rows whose updated_at /
+calculated_at moved past the last synced watermark, and the
+Postgres views are recreated in SQLite so reads return the same shapes as
+utils.supabase_client. When Supabase is slow or unreachable, the last
+synced data keeps being served.
+
+Enabled by setting LOCAL_MIRROR_PATH (e.g. LOCAL_MIRROR_PATH=daruma_mirror.db).
+It implements the read methods of the repository interface (utils.repository).
+"""
+
+import os
+import re
+import sqlite3
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+import pandas as pd
+
+from . import supabase_client as db
+from .instrumentation import instrumented
+from .repository import get_backend, get_repository
+from .calculations import downsample_last, snapshot_bucket_days
+
+logger = logging.getLogger(__name__)
+
+# Mirrored table -> primary key and the timestamp that moves on every write
+MIRROR_TABLES = {
+    'transactions': {'key': 'id', 'watermark': 'updated_at'},
+    'current_prices': {'key': 'ticker', 'watermark': 'updated_at'},
+    'current_fx_rates': {'key': 'pair', 'watermark': 'updated_at'},
+    'dividends': {'key': 'id', 'watermark': 'calculated_at'},
+    'portfolio_snapshots': {'key': 'id', 'watermark': 'updated_at'},
+    'tax_lots': {'key': 'id', 'watermark': 'updated_at'},
+}
+
+# Minimum seconds between two syncs (reads in between use the local file)
+SYNC_INTERVAL = int(os.getenv('MIRROR_SYNC_SECONDS', '30'))
+
+# Repository methods the mirror answers (read-only subset of REPOSITORY_METHODS)
+READ_METHODS = (
+    'get_holdings_frame',
+    'get_portfolio_summary',
+    'get_portfolio_snapshots_frame',
+    'get_dividends_frame',
+    'get_dividend_summary_frame',
+    'get_dividends_by_year_frame',
+    'get_unique_tickers',
+    'get_recent_transactions',
+    'get_dashboard_bundle',
+)
+
+# Same tables and views as sql/schema.sql, in SQLite types
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,
+    ticker TEXT NOT NULL,
+    name TEXT,
+    type TEXT NOT NULL,
+    asset_type TEXT,
+    quantity REAL NOT NULL,
+    price REAL NOT NULL,
+    total_amount REAL,
+    currency TEXT,
+    exchange TEXT,
+    platform TEXT,
+    notes TEXT,
+    created_at TEXT,
+    updated_at TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions(date, id);
+
+CREATE TABLE IF NOT EXISTS current_prices (
+    ticker TEXT PRIMARY KEY,
+    price REAL NOT NULL,
+    currency TEXT,
+    updated_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS current_fx_rates (
+    pair TEXT PRIMARY KEY,
+    rate REAL NOT NULL,
+    updated_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS dividends (
+    id INTEGER PRIMARY KEY,
+    ticker TEXT NOT NULL,
+    payment_date TEXT NOT NULL,
+    dividend_per_share REAL NOT NULL,
+    shares_at_date REAL NOT NULL,
+    total_received REAL NOT NULL,
+    currency TEXT,
+    calculated_at TEXT,
+    UNIQUE(ticker, payment_date)
+);
+
+CREATE TABLE IF NOT EXISTS portfolio_snapshots (
+    id INTEGER PRIMARY KEY,
+    snapshot_date TEXT NOT NULL UNIQUE,
+    total_value REAL NOT NULL,
+    total_cost REAL NOT NULL,
+    recorded_at TEXT,
+    updated_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS tax_lots (
+    id INTEGER PRIMARY KEY,
+    transaction_id INTEGER NOT NULL,
+    ticker TEXT NOT NULL,
+    opened_at TEXT NOT NULL,
+    quantity REAL NOT NULL,
+    remaining REAL NOT NULL,
+    cost_per_share REAL NOT NULL,
+    updated_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    table_name TEXT PRIMARY KEY,
+    watermark TEXT,
+    synced_at TEXT
+);
+
+-- Cost basis from the open tax lots (sql/tax_lots.sql); recreated so
+-- mirror files built before tax lots pick it up
+DROP VIEW IF EXISTS current_holdings;
+CREATE VIEW current_holdings AS
+SELECT
+    t.ticker,
+    t.name,
+    t.asset_type,
+    t.shares,
+    COALESCE(l.cost, 0) as total_cost,
+    COALESCE(l.cost, 0) / t.shares as avg_buy_price,
+    t.first_buy_date,
+    t.last_buy_date
+FROM (
+    SELECT
+        ticker,
+        MAX(name) as name,
+        MAX(asset_type) as asset_type,
+        SUM(CASE
+            WHEN type = 'BUY' THEN quantity
+            WHEN type = 'SELL' THEN -quantity
+            ELSE 0
+        END) as shares,
+        MIN(CASE WHEN type = 'BUY' THEN date END) as first_buy_date,
+        MAX(CASE WHEN type = 'BUY' THEN date END) as last_buy_date
+    FROM transactions
+    GROUP BY ticker
+) t
+LEFT JOIN (
+    SELECT ticker, SUM(remaining * cost_per_share) as cost
+    FROM tax_lots
+    WHERE remaining > 0
+    GROUP BY ticker
+) l ON l.ticker = t.ticker
+WHERE t.shares > 0;
+
+CREATE VIEW IF NOT EXISTS holdings_with_value AS
+SELECT
+    h.ticker,
+    h.name,
+    h.asset_type,
+    h.shares,
+    h.avg_buy_price,
+    h.total_cost,
+    h.first_buy_date,
+    h.last_buy_date,
+    cp.price as current_price,
+    cp.updated_at as price_updated_at,
+    h.shares * cp.price as current_value,
+    (h.shares * cp.price) - h.total_cost as pnl,
+    CASE
+        WHEN h.total_cost > 0
+        THEN ((h.shares * cp.price) - h.total_cost) / h.total_cost * 100
+        ELSE 0
+    END as pnl_percent
+FROM current_holdings h
+LEFT JOIN current_prices cp ON h.ticker = cp.ticker;
+
+CREATE VIEW IF NOT EXISTS dividend_summary AS
+SELECT
+    ticker,
+    SUM(total_received) as total_dividends,
+    COUNT(*) as dividend_count,
+    MAX(payment_date) as last_dividend_date,
+    MIN(payment_date) as first_dividend_date
+FROM dividends
+GROUP BY ticker;
+
+CREATE VIEW IF NOT EXISTS dividends_by_year AS
+SELECT
+    CAST(strftime('%Y', payment_date) AS INTEGER) as year,
+    ticker,
+    SUM(total_received) as total_received,
+    COUNT(*) as payments
+FROM dividends
+GROUP BY strftime('%Y', payment_date), ticker
+ORDER BY year DESC, total_received DESC;
+
+CREATE VIEW IF NOT EXISTS portfolio_summary AS
+SELECT
+    SUM(current_value) as total_value,
+    SUM(total_cost) as total_invested,
+    SUM(pnl) as total_pnl,
+    CASE
+        WHEN SUM(total_cost) > 0
+        THEN SUM(pnl) / SUM(total_cost) * 100
+        ELSE 0
+    END as total_pnl_percent,
+    COUNT(*) as num_holdings
+FROM holdings_with_value;
+"""
+
+_IDENTIFIER = re.compile(r'^[a-z_][a-z0-9_]*$')
+
+
+def _projection(columns: str) -> str:
+    """Turn a PostgREST select string into a SQL column list."""
+    if columns.strip() == '*':
+        return '*'
+    names = [c.strip() for c in columns.split(',') if c.strip()]
+    for name in names:
+        if not _IDENTIFIER.match(name):
+            raise ValueError(f'Invalid column name: {name}')
+    return ', '.join(names)
+
+
+def _parse_timestamp(value: str) -> datetime:
+    """Parse a PostgREST timestamp."""
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+class LocalMirror:
+    """SQLite copy of the portfolio tables, synced incrementally from Supabase."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._last_sync = None
+        self._columns = {}
+
+        with self._lock:
+            self._conn.executescript(SCHEMA)
+            for table, spec in MIRROR_TABLES.items():
+                info = self._conn.execute(f'PRAGMA table_info({table})').fetchall()
+                self._columns[table] = [row['name'] for row in info]
+                # Files created before a watermark column existed
+                if spec['watermark'] not in self._columns[table]:
+                    self._conn.execute(f'ALTER TABLE {table} ADD COLUMN {spec["watermark"]} TEXT')
+                    self._columns[table].append(spec['watermark'])
+
+    # ----- Sync -----
+
+    def _get_watermark(self, table: str) -> Optional[str]:
+        row = self._conn.execute(
+            'SELECT watermark FROM sync_state WHERE table_name = ?', (table,)
+        ).fetchone()
+        return row['watermark'] if row else None
+
+    def _set_watermark(self, table: str, watermark: Optional[str]):
+        self._conn.execute(
+            'INSERT OR REPLACE INTO sync_state (table_name, watermark, synced_at) '
+            'VALUES (?, ?, ?)',
+            (table, watermark, datetime.utcnow().isoformat())
+        )
+
+    def _store(self, table: str, rows: list):
+        """Insert or replace rows, keeping only the mirrored columns."""
+        if not rows:
+            return
+        columns = self._columns[table]
+        placeholders = ', '.join('?' for _ in columns)
+        self._conn.executemany(
+            f'INSERT OR REPLACE INTO {table} ({", ".join(columns)}) VALUES ({placeholders})',
+            [tuple(row.get(column) for column in columns) for row in rows]
+        )
+
+    def _fetch(self, client, table: str, since: Optional[str]) -> list:
+        """Pull rows of a table changed at or after since."""
+        spec = MIRROR_TABLES[table]
+        if spec['key'] == 'id':
+            pages = db.iter_rows_since(client, table, spec['watermark'], since)
+            return [row for page in pages for row in page]
+        return db.get_rows_since(client, table, spec['watermark'], since)
+
+    def _sync_table(self, client, table: str) -> int:
+        """
+        Pull one table's changes.
+
+        Deletes don't move a watermark, so the row counts are compared
+        afterwards and the table is reloaded in full when they differ.
+
+        Returns:
+            Number of rows pulled
+        """
+        spec = MIRROR_TABLES[table]
+        with self._lock:
+            since = self._get_watermark(table)
+
+        rows = self._fetch(client, table, since)
+        remote_count = db.count_rows(client, table, spec['key'])
+
+        with self._lock, self._conn:
+            self._store(table, rows)
+            local_count = self._conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+
+        if local_count != remote_count:
+            logger.info(f'Mirror: reloading {table} ({local_count} local, {remote_count} remote)')
+            rows = self._fetch(client, table, None)
+            since = None
+            with self._lock, self._conn:
+                self._conn.execute(f'DELETE FROM {table}')
+                self._store(table, rows)
+
+        stamps = [row[spec['watermark']] for row in rows if row.get(spec['watermark'])]
+        if since:
+            stamps.append(since)
+        watermark = max(stamps, key=_parse_timestamp) if stamps else None
+
+        with self._lock, self._conn:
+            self._set_watermark(table, watermark)
+
+        return len(rows)
+
+    @instrumented
+    def sync(self, client) -> dict:
+        """
+        Pull changes of every mirrored table from Supabase.
+
+        Returns:
+            Dict {table: rows pulled}
+        """
+        pulled = {table: self._sync_table(client, table) for table in MIRROR_TABLES}
+        self._last_sync = time.monotonic()
+        logger.debug(f'Mirror synced: {pulled}')
+        return pulled
+
+    def sync_if_stale(self, max_age: int = SYNC_INTERVAL) -> bool:
+        """
+        Sync when the last sync is older than max_age seconds.
+
+        Errors are logged and the local data keeps being served.
+
+        Returns:
+            True if the mirror is up to date
+        """
+        # One sync at a time; concurrent readers wait for it and reuse it
+        with self._sync_lock:
+            if self._last_sync is not None and time.monotonic() - self._last_sync < max_age:
+                return True
+            try:
+                self.sync(db.get_client())
+                return True
+            except Exception as e:
+                logger.warning(f'Mirror sync failed, serving local data: {e}')
+                # Don't retry on every read while Supabase is down
+                self._last_sync = time.monotonic()
+                return False
+
+    def invalidate(self):
+        """Force a sync on the next read (call after writing to Supabase)."""
+        self._last_sync = None
+
+    # ----- Reads (same results as the supabase_client functions) -----
+
+    def _query(self, sql: str, params: tuple = ()) -> list:
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params).fetchall()]
+
+    def get_holdings_frame(self, columns: str) -> pd.DataFrame:
+        """Get holdings with value as a typed frame."""
+        rows = self._query(f'SELECT {_projection(columns)} FROM holdings_with_value')
+        return db.to_frame(rows, columns)
+
+    def get_portfolio_summary(self, columns: str = '*') -> dict:
+        """Get portfolio summary, numeric fields as floats (0.0 if NULL)."""
+        rows = self._query(f'SELECT {_projection(columns)} FROM portfolio_summary')
+        if not rows:
+            return {}
+        return db.summary_row(db.to_frame(rows, columns))
+
+    def get_portfolio_snapshots_frame(self, columns: str, days: Optional[int] = None,
+                                      points: Optional[int] = None,
+                                      bucket_days: Optional[int] = None) -> pd.DataFrame:
+        """Get portfolio snapshots as a typed frame, oldest first (optionally downsampled)."""
+        bucketed = points is not None or bucket_days is not None
+        sql = f'SELECT {"*" if bucketed else _projection(columns)} FROM portfolio_snapshots'
+        params = ()
+        if days:
+            sql += ' WHERE snapshot_date >= ?'
+            params = ((date.today() - timedelta(days=days)).isoformat(),)
+        rows = self._query(sql + ' ORDER BY snapshot_date, id', params)
+
+        if bucketed and rows:
+            start = date.fromisoformat(params[0] if params else rows[0]['snapshot_date'])
+            width = bucket_days or snapshot_bucket_days((date.today() - start).days, points)
+            rows = downsample_last(rows, start, width)
+            if columns.strip() != '*':
+                rows = [{name: row[name] for name in _projection(columns).split(', ')}
+                        for row in rows]
+        return db.to_frame(rows, columns)
+
+    def get_dividends_frame(self, columns: str, ticker: Optional[str] = None,
+                            limit: Optional[int] = None) -> pd.DataFrame:
+        """Get dividends as a typed frame, newest first; limit keeps only the latest rows."""
+        sql = f'SELECT {_projection(columns)} FROM dividends'
+        params = ()
+        if ticker:
+            sql += ' WHERE ticker = ?'
+            params = (ticker,)
+        sql += ' ORDER BY payment_date DESC, id DESC'
+        if limit:
+            sql += ' LIMIT ?'
+            params += (limit,)
+        return db.to_frame(self._query(sql, params), columns)
+
+    def get_dividend_summary_frame(self, columns: str) -> pd.DataFrame:
+        """Get dividend summary by ticker as a typed frame."""
+        rows = self._query(f'SELECT {_projection(columns)} FROM dividend_summary')
+        return db.to_frame(rows, columns)
+
+    def get_dividends_by_year_frame(self, columns: str) -> pd.DataFrame:
+        """Get dividends aggregated by year and ticker as a typed frame."""
+        rows = self._query(f'SELECT {_projection(columns)} FROM dividends_by_year')
+        return db.to_frame(rows, columns)
+
+    def get_dashboard_bundle(self, days: Optional[int] = 365) -> dict:
+        """Get holdings, summary totals and a snapshot window (see dashboard_bundle)."""
+        return {
+            'holdings': self.get_holdings_frame(db.DASHBOARD_HOLDING_COLUMNS),
+            'summary': self.get_portfolio_summary(),
+            'snapshots': self.get_portfolio_snapshots_frame(db.DASHBOARD_SNAPSHOT_COLUMNS, days),
+        }
+
+    def get_unique_tickers(self) -> list[str]:
+        """Get list of unique tickers from transactions."""
+        rows = self._query('SELECT DISTINCT ticker FROM transactions ORDER BY ticker')
+        return [row['ticker'] for row in rows]
+
+    def get_recent_transactions(self, limit: int = 20, columns: str = '*') -> list:
+        """Get the most recent transactions, newest first."""
+        return self._query(
+            f'SELECT {_projection(columns)} FROM transactions ORDER BY date DESC, id DESC LIMIT ?',
+            (limit,)
+        )
+
+
+_mirror: Optional[LocalMirror] = None
+_mirror_lock = threading.Lock()
+
+
+def get_mirror() -> Optional[LocalMirror]:
+    """Get the process-wide mirror, or None if LOCAL_MIRROR_PATH is not set."""
+    global _mirror
+    path = os.getenv('LOCAL_MIRROR_PATH')
+    if not path or get_backend() != 'supabase':
+        return None
+    if _mirror is None:
+        with _mirror_lock:
+            if _mirror is None:
+                _mirror = LocalMirror(path)
+    return _mirror
+
+
+def get_reader():
+    """
+    Get the object the dashboard reads from.
+
+    Returns:
+        The local mirror (synced if stale) when LOCAL_MIRROR_PATH is set,
+        otherwise the repository of the configured backend
+    """
+    mirror = get_mirror()
+    if mirror is None:
+        return get_repository()
+    mirror.sync_if_stale()
+    return mirror
+
+
+def invalidate_reader():
+    """Make the next read sync the mirror (call after writing to Supabase)."""
+    mirror = get_mirror()
+    if mirror is not None:
+        mirror.invalidate()
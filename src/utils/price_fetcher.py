@@ -16,7 +16,8 @@ logger = logging.getLogger(__name__)
 
 
 def fetch_price_with_retry(ticker: str, max_retries: int = 3,
-                           base_delay: float = 1.0) -> Optional[float]:
+                           base_delay: float = 1.0,
+                           stats: Optional[dict] = None) -> Optional[float]:
     """
     Fetch current price for a ticker with exponential backoff retry.
 
@@ -24,6 +25,7 @@ def fetch_price_with_retry(ticker: str, max_retries: int = 3,
         ticker: Internal ticker symbol
         max_retries: Maximum number of retry attempts
         base_delay: Base delay in seconds (doubles each retry)
+        stats: Optional dict; 'attempts' is set to the number of attempts made
 
     Returns:
         Current price or None if failed
@@ -31,6 +33,8 @@ def fetch_price_with_retry(ticker: str, max_retries: int = 3,
     yf_ticker = get_yfinance_ticker(ticker)
 
     for attempt in range(max_retries):
+        if stats is not None:
+            stats['attempts'] = attempt + 1
         try:
             stock = yf.Ticker(yf_ticker)
 
@@ -0,0 +1,213 @@
+"""
+Refresh tiers for the price updater.
+
+Each ticker belongs to one tier based on its asset class. A tier is due when
+its interval has elapsed since the tier last ran; US equities additionally only
+refresh during market hours (plus one catch-up run after the close).
+"""
+
+import os
+from datetime import datetime, time, timedelta, timezone
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+from .ticker_mapping import is_crypto, is_chilean_stock
+
+# Tier name -> refresh settings
+#   interval_minutes: minimum time between two refreshes of the tier
+#   market: optional (timezone, open, close) trading session, Mon-Fri only
+REFRESH_TIERS = {
+    'crypto': {
+        'interval_minutes': 60,
+        'market': None,
+    },
+    'us_equity': {
+        'interval_minutes': 30,
+        'market': ('America/New_York', time(9, 30), time(16, 0)),
+    },
+    'cl_equity': {
+        'interval_minutes': 24 * 60,
+        'market': None,
+    },
+    'fund': {
+        'interval_minutes': 24 * 60,
+        'market': None,
+    },
+}
+
+# Jobs that are not tied to a ticker universe, scheduled the same way
+REFRESH_JOBS = {
+    'fx': {
+        'interval_minutes': 60,
+        'market': None,
+    },
+    'dividends': {
+        'interval_minutes': 24 * 60,
+        'market': None,
+    },
+    'price_maintenance': {
+        'interval_minutes': 24 * 60,
+        'market': None,
+    },
+}
+
+# Intervals can be overridden per entry, e.g. REFRESH_CRYPTO_MINUTES=15
+for _name, _settings in {**REFRESH_TIERS, **REFRESH_JOBS}.items():
+    _override = os.getenv(f'REFRESH_{_name.upper()}_MINUTES')
+    if _override:
+        _settings['interval_minutes'] = int(_override)
+
+# Cron runners start a few minutes late; don't skip a tier because of that
+SCHEDULE_GRACE = timedelta(minutes=5)
+
+
+def get_ticker_tier(ticker: str, asset_type: Optional[str] = None) -> str:
+    """
+    Assign a ticker to a refresh tier.
+
+    Args:
+        ticker: Internal ticker symbol
+        asset_type: Asset type stored on the transactions ('STOCK', 'FUND', 'CRYPTO')
+
+    Returns:
+        Tier name (key of REFRESH_TIERS)
+    """
+    if asset_type == 'CRYPTO' or is_crypto(ticker):
+        return 'crypto'
+    if asset_type == 'FUND':
+        return 'fund'
+    if is_chilean_stock(ticker):
+        return 'cl_equity'
+    return 'us_equity'
+
+
+def group_tickers_by_tier(asset_types: dict) -> dict[str, list[str]]:
+    """
+    Group tickers by refresh tier.
+
+    Args:
+        asset_types: Dict {ticker: asset_type}
+
+    Returns:
+        Dict {tier: [tickers]} containing every tier in REFRESH_TIERS
+    """
+    groups = {tier: [] for tier in REFRESH_TIERS}
+    for ticker, asset_type in sorted(asset_types.items()):
+        groups[get_ticker_tier(ticker, asset_type)].append(ticker)
+    return groups
+
+
+def _last_session_close(market: tuple, now: datetime) -> datetime:
+    """Most recent market close at or before now (UTC)."""
+    tz_name, _, close = market
+    local_now = now.astimezone(ZoneInfo(tz_name))
+    day = local_now.date()
+
+    while True:
+        if day.weekday() < 5:
+            close_dt = datetime.combine(day, close, tzinfo=ZoneInfo(tz_name))
+            if close_dt <= local_now:
+                return close_dt.astimezone(timezone.utc)
+        day -= timedelta(days=1)
+
+
+def is_market_open(market: Optional[tuple], now: datetime) -> bool:
+    """Check whether a trading session is open (always True without a session)."""
+    if market is None:
+        return True
+
+    tz_name, open_time, close_time = market
+    local_now = now.astimezone(ZoneInfo(tz_name))
+    if local_now.weekday() >= 5:
+        return False
+    return open_time <= local_now.time() < close_time
+
+
+def is_due(settings: dict, last_run: Optional[datetime], now: datetime) -> bool:
+    """
+    Decide whether a tier or job should run now.
+
+    Args:
+        settings: Entry from REFRESH_TIERS / REFRESH_JOBS
+        last_run: When it last ran (UTC), or None if never
+        now: Current time (UTC)
+
+    Returns:
+        True if the refresh is due
+    """
+    if last_run is None:
+        return True
+
+    market = settings.get('market')
+    if not is_market_open(market, now):
+        # Outside the session: only catch the closing price once
+        return last_run < _last_session_close(market, now)
+
+    interval = timedelta(minutes=settings['interval_minutes'])
+    return now - last_run >= interval - SCHEDULE_GRACE
+
+
+def get_due(schedule: dict, last_runs: dict, now: Optional[datetime] = None) -> list[str]:
+    """
+    List the tiers or jobs of a schedule that are due.
+
+    Args:
+        schedule: REFRESH_TIERS or REFRESH_JOBS
+        last_runs: Dict {name: last run datetime (UTC)}
+        now: Current time (defaults to now, UTC)
+
+    Returns:
+        Names of due entries, in schedule order
+    """
+    now = now or datetime.now(timezone.utc)
+    return [
+        name for name, settings in schedule.items()
+        if is_due(settings, last_runs.get(name), now)
+    ]
+
+
+def _next_session_open(market: tuple, after: datetime) -> datetime:
+    """First market open at or after a time (UTC)."""
+    tz_name, open_time, _ = market
+    local_after = after.astimezone(ZoneInfo(tz_name))
+    day = local_after.date()
+
+    while True:
+        if day.weekday() < 5:
+            open_dt = datetime.combine(day, open_time, tzinfo=ZoneInfo(tz_name))
+            if open_dt >= local_after:
+                return open_dt.astimezone(timezone.utc)
+        day += timedelta(days=1)
+
+
+def next_due_time(schedule: dict, last_runs: dict,
+                  now: Optional[datetime] = None) -> datetime:
+    """
+    Estimate when the next entry of a schedule becomes due.
+
+    Args:
+        schedule: REFRESH_TIERS or REFRESH_JOBS
+        last_runs: Dict {name: last run datetime (UTC)}
+        now: Current time (defaults to now, UTC)
+
+    Returns:
+        Earliest due time (UTC); now if something is already due
+    """
+    now = now or datetime.now(timezone.utc)
+    candidates = []
+
+    for name, settings in schedule.items():
+        last_run = last_runs.get(name)
+        if is_due(settings, last_run, now):
+            return now
+
+        candidate = (last_run + timedelta(minutes=settings['interval_minutes'])
+                     - SCHEDULE_GRACE)
+        market = settings.get('market')
+        if market is not None and not is_market_open(market, candidate):
+            # Closed at that time: next refresh is at the close or the next open
+            close = _last_session_close(market, candidate)
+            candidate = close if close > now else _next_session_open(market, candidate)
+        candidates.append(candidate)
+
+    return min(candidates)
@@ -0,0 +1,1021 @@
+"""
+Repository interface over the data layer.
+
+The pipeline, importer and pages talk to a repository object whose methods
+are the utils.supabase_client functions without the client argument:
+
+    repo = get_repository()
+    repo.get_holdings_frame('ticker, current_value')
+
+SupabaseRepository forwards every call to Supabase. InMemoryRepository keeps
+the tables in Python structures with the same semantics (views, fingerprint
+deduplication, ledger change log), so everything can be load-tested and
+profiled on synthetic data with no network. Select the backend with
+DARUMA_BACKEND=supabase (default) or DARUMA_BACKEND=memory.
+"""
+
+import os
+import math
+import random
+import bisect
+import threading
+import functools
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Optional
+
+import pandas as pd
+
+from . import supabase_client as db
+from .calculations import (
+    calculate_shares_at_date,
+    calculate_position_at_date,
+    apply_lot_transaction,
+    build_tax_lots,
+    lot_position,
+    LOT_METHODS,
+    downsample_ohlc,
+    downsample_daily,
+    downsample_last,
+    merge_daily_bar,
+    snapshot_bucket_days
+)
+
+# Methods every repository provides (same names and arguments as the
+# supabase_client functions, minus the client)
+REPOSITORY_METHODS = (
+    # Transactions
+    'get_all_transactions',
+    'get_recent_transactions',
+    'get_transactions_for_ticker',
+    'get_transactions_version',
+    'get_ticker_directory',
+    'get_unique_tickers',
+    'get_ticker_asset_types',
+    'get_holdings_at',
+    'get_position_at',
+    'rebuild_position_ledger',
+    'insert_transaction',
+    'insert_transactions',
+    'delete_transaction',
+    'transaction_exists',
+    # Tax lots
+    'get_open_lots',
+    'get_realized_pnl',
+    'get_lot_method',
+    'set_lot_method',
+    # Prices
+    'upsert_current_price',
+    'insert_price_history',
+    'upsert_current_prices',
+    'insert_price_history_batch',
+    'get_current_prices',
+    'get_price_history',
+    'get_price_daily',
+    'get_latest_close_before',
+    'maintain_price_history',
+    # FX rates
+    'upsert_current_fx_rate',
+    'insert_fx_history',
+    'get_current_fx_rate',
+    # Dividends
+    'upsert_dividend',
+    'delete_dividend',
+    'get_dividends',
+    'get_dividends_frame',
+    # Views
+    'get_holdings_with_value',
+    'get_holdings_frame',
+    'get_portfolio_summary',
+    'get_dividend_summary',
+    'get_dividend_summary_frame',
+    'get_dividends_by_year',
+    'get_dividends_by_year_frame',
+    'get_dashboard_bundle',
+    # Portfolio snapshots
+    'insert_portfolio_snapshot',
+    'backfill_portfolio_snapshots',
+    'get_portfolio_snapshots',
+    'get_portfolio_snapshots_frame',
+    # Refresh state, ledger changes, pipeline runs
+    'get_refresh_state',
+    'mark_refreshed',
+    'get_pending_ledger_changes',
+    'mark_ledger_changes_processed',
+    'insert_pipeline_run',
+)
+
+
+class SupabaseRepository:
+    """Repository backed by Supabase; each method calls the supabase_client function."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def __getattr__(self, name: str):
+        if name not in REPOSITORY_METHODS:
+            raise AttributeError(name)
+        return functools.partial(getattr(db, name), self.client)
+
+
+# ----- In-memory backend -----
+
+def _timestamp(value) -> str:
+    """Normalize a date/datetime/ISO string to a UTC ISO timestamp, like PostgREST returns."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    elif isinstance(value, date) and not isinstance(value, datetime):
+        value = datetime.combine(value, time.min)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat()
+
+
+def _day(value) -> str:
+    """Normalize a date or ISO string to YYYY-MM-DD."""
+    return value.isoformat() if isinstance(value, date) else str(value)[:10]
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _project(rows: list, columns: str) -> list:
+    """Apply a PostgREST-style select string to row dicts."""
+    if columns.strip() == '*':
+        return [dict(row) for row in rows]
+    names = [c.strip() for c in columns.split(',') if c.strip()]
+    return [{name: row.get(name) for name in names} for row in rows]
+
+
+class InMemoryRepository:
+    """
+    Pure Python implementation of the repository.
+
+    Mirrors the Postgres behaviour the app relies on: serial ids, default
+    timestamps, the transaction fingerprint unique index, the ledger_changes
+    and tax lot triggers and the holdings/dividend/summary views. Thread-safe.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._ids = {}
+        self.transactions = {}
+        self._fingerprints = {}
+        self.lot_method = 'FIFO'
+        self.tax_lots = {}
+        self.realized_pnl = {}
+        self._lot_marks = {}
+        self.price_history = {}
+        self.price_daily = {}
+        self.current_prices = {}
+        self.fx_rates = []
+        self.current_fx_rates = {}
+        self.dividends = {}
+        self.portfolio_snapshots = {}
+        self.refresh_state = {}
+        self.ledger_changes = []
+        self.pipeline_runs = []
+
+    def _next_id(self, table: str) -> int:
+        self._ids[table] = self._ids.get(table, 0) + 1
+        return self._ids[table]
+
+    # ----- Transactions -----
+
+    @staticmethod
+    def _fingerprint(row: dict) -> tuple:
+        """Natural key of a transaction (see sql/transaction_fingerprint.sql)."""
+        return (
+            row['ticker'].upper(),
+            row['date'],
+            row['type'],
+            round(row['quantity'], 8),
+            round(row['price'], 4),
+            row.get('platform') or '',
+        )
+
+    def _log_change(self, operation: str, row: dict):
+        self.ledger_changes.append({
+            'id': self._next_id('ledger_changes'),
+            'transaction_id': row['id'],
+            'operation': operation,
+            'ticker': row['ticker'],
+            'date': row['date'],
+            'type': row['type'],
+            'quantity': row['quantity'],
+            'price': row['price'],
+            'changed_at': _now(),
+            'processed_at': None,
+        })
+
+    def _insert_transaction(self, transaction: dict, log: bool = True) -> dict:
+        """Validate and store one transaction; raises ValueError like a rejected insert."""
+        for field in ('date', 'ticker', 'type', 'quantity', 'price'):
+            if transaction.get(field) is None:
+                raise ValueError(f'null value in column "{field}" violates not-null constraint')
+        if transaction['type'] not in ('BUY', 'SELL'):
+            raise ValueError('new row violates check constraint "transactions_type_check"')
+
+        row = {
+            'name': None, 'asset_type': None, 'total_amount': None, 'currency': 'USD',
+            'exchange': None, 'platform': None, 'notes': None,
+            **transaction,
+            'date': _timestamp(transaction['date']),
+            'quantity': float(transaction['quantity']),
+            'price': float(transaction['price']),
+        }
+        fingerprint = self._fingerprint(row)
+        if fingerprint in self._fingerprints:
+            raise ValueError('duplicate key value violates unique constraint '
+                             '"idx_transactions_fingerprint"')
+
+        row['id'] = self._next_id('transactions')
+        row['created_at'] = row['updated_at'] = _now()
+        self.transactions[row['id']] = row
+        self._fingerprints[fingerprint] = row['id']
+        self._apply_lots(row)
+        if log:
+            self._log_change('INSERT', row)
+        return dict(row)
+
+    def _apply_lots(self, row: dict):
+        """Apply a new transaction to the lots, replaying the ticker if it is backdated."""
+        ticker = row['ticker']
+        mark = self._lot_marks.get(ticker)
+        if mark is None or (row['date'], row['id']) <= mark:
+            self._rebuild_lots([ticker])
+            return
+        self.realized_pnl.setdefault(ticker, []).extend(
+            apply_lot_transaction(self.tax_lots.setdefault(ticker, []), row, self.lot_method)
+        )
+        self._lot_marks[ticker] = (row['date'], row['id'])
+
+    def _rebuild_lots(self, tickers: Optional[list] = None):
+        """Replay the lots of some tickers (all when None), like rebuild_tax_lots."""
+        transactions = [
+            row for row in self.transactions.values()
+            if tickers is None or row['ticker'] in tickers
+        ]
+        for ticker in (tickers if tickers is not None else list(self.tax_lots)):
+            self.tax_lots.pop(ticker, None)
+            self.realized_pnl.pop(ticker, None)
+            self._lot_marks.pop(ticker, None)
+        lots, realized = build_tax_lots(transactions, self.lot_method)
+        self.tax_lots.update(lots)
+        for row in realized:
+            self.realized_pnl.setdefault(row['ticker'], []).append(row)
+        for row in transactions:
+            mark = self._lot_marks.get(row['ticker'])
+            if mark is None or (row['date'], row['id']) > mark:
+                self._lot_marks[row['ticker']] = (row['date'], row['id'])
+
+    def _sorted_transactions(self, desc: bool = False, ticker: Optional[str] = None) -> list:
+        rows = [
+            row for row in self.transactions.values()
+            if ticker is None or row['ticker'] == ticker
+        ]
+        return sorted(rows, key=lambda r: (r['date'], r['id']), reverse=desc)
+
+    def get_all_transactions(self) -> list:
+        """Get all transactions ordered by date (newest first)."""
+        with self._lock:
+            return [dict(row) for row in self._sorted_transactions(desc=True)]
+
+    def get_recent_transactions(self, limit: int = 20, columns: str = '*') -> list:
+        """Get the most recent transactions, newest first."""
+        with self._lock:
+            return _project(self._sorted_transactions(desc=True)[:limit], columns)
+
+    def get_transactions_for_ticker(self, ticker: str, columns: str = '*') -> list:
+        """Get all transactions of one ticker ordered by date."""
+        with self._lock:
+            return _project(self._sorted_transactions(ticker=ticker), columns)
+
+    def get_transactions_version(self) -> tuple:
+        """Get (row count, highest id, latest updated_at) of the transactions table."""
+        with self._lock:
+            return (
+                len(self.transactions),
+                max(self.transactions, default=None),
+                max((row['updated_at'] for row in self.transactions.values()), default=None),
+            )
+
+    def get_ticker_directory(self) -> list:
+        """Get one row per distinct ticker with its latest non-null name/asset type."""
+        directory = {}
+        with self._lock:
+            for row in self._sorted_transactions():
+                entry = directory.setdefault(row['ticker'], {
+                    'ticker': row['ticker'], 'name': None, 'asset_type': None,
+                })
+                entry['currency'] = row['currency']
+                for field in ('name', 'asset_type'):
+                    if row[field] is not None:
+                        entry[field] = row[field]
+        return [directory[ticker] for ticker in sorted(directory)]
+
+    def get_unique_tickers(self) -> list[str]:
+        """Get list of unique tickers from transactions."""
+        return [row['ticker'] for row in self.get_ticker_directory()]
+
+    def get_ticker_asset_types(self) -> dict:
+        """Get asset type per ticker as dict {ticker: asset_type}."""
+        return {row['ticker']: row['asset_type'] for row in self.get_ticker_directory()}
+
+    def get_holdings_at(self, dates: list, tickers: Optional[list] = None) -> dict:
+        """Get shares held per ticker at the end of each date (like holdings_at)."""
+        days = sorted({_day(d) for d in dates})
+        with self._lock:
+            ordered = self._sorted_transactions()
+        # Running position per ticker: day of each transaction and shares after it
+        running = {}
+        for tx in ordered:
+            if tickers is not None and tx['ticker'] not in tickers:
+                continue
+            tx_days, positions = running.setdefault(tx['ticker'], ([], []))
+            quantity = tx['quantity'] if tx['type'] == 'BUY' else -tx['quantity']
+            tx_days.append(tx['date'][:10])
+            positions.append((positions[-1] if positions else 0.0) + quantity)
+
+        holdings = {}
+        for day in days:
+            holdings[day] = {}
+            for ticker, (tx_days, positions) in running.items():
+                index = bisect.bisect_right(tx_days, day)
+                if index and positions[index - 1] > 0:
+                    holdings[day][ticker] = positions[index - 1]
+        return holdings
+
+    def get_position_at(self, ticker: str, day: date) -> tuple:
+        """Get (shares, total_cost) of a ticker at the end of a day."""
+        with self._lock:
+            transactions = self._sorted_transactions(ticker=ticker)
+            method = self.lot_method
+        return calculate_position_at_date(transactions, ticker, day, method)
+
+    def rebuild_position_ledger(self, tickers: Optional[list] = None) -> int:
+        """Positions are computed from the lots directly; nothing to rebuild."""
+        with self._lock:
+            return sum(
+                1 for row in self.transactions.values()
+                if tickers is None or row['ticker'] in tickers
+            )
+
+    def insert_transaction(self, transaction: dict) -> dict:
+        """Insert a new transaction."""
+        with self._lock:
+            return self._insert_transaction(transaction)
+
+    def insert_transactions(self, rows: list, chunk_size: int = 500,
+                            ignore_duplicates: bool = False) -> dict:
+        """Insert many transactions; same result shape as supabase_client.insert_transactions."""
+        inserted = []
+        failed = []
+        with self._lock:
+            for row in rows:
+                try:
+                    inserted.append(self._insert_transaction(row))
+                except ValueError as e:
+                    if ignore_duplicates and 'idx_transactions_fingerprint' in str(e):
+                        continue
+                    failed.append({'row': row, 'error': str(e)})
+        return {'inserted': inserted, 'failed': failed}
+
+    def delete_transaction(self, transaction_id: int) -> bool:
+        """Delete a transaction by ID."""
+        with self._lock:
+            row = self.transactions.pop(transaction_id, None)
+            if row is None:
+                return False
+            self._fingerprints.pop(self._fingerprint(row), None)
+            self._rebuild_lots([row['ticker']])
+            self._log_change('DELETE', row)
+            return True
+
+    def transaction_exists(self, ticker: str, date_str: str, quantity: float) -> bool:
+        """Check if a transaction already exists."""
+        tx_date = _timestamp(date_str)
+        with self._lock:
+            return any(
+                row['ticker'] == ticker and row['date'] == tx_date
+                and row['quantity'] == float(quantity)
+                for row in self.transactions.values()
+            )
+
+    # ----- Tax lots -----
+
+    def get_open_lots(self, ticker: Optional[str] = None) -> list:
+        """Get open tax lots (remaining > 0) in opening order."""
+        with self._lock:
+            return [
+                dict(lot)
+                for lot_ticker in sorted(self.tax_lots)
+                if ticker is None or lot_ticker == ticker
+                for lot in self.tax_lots[lot_ticker]
+                if lot['remaining'] > 0
+            ]
+
+    def get_realized_pnl(self, columns: str = '*') -> list:
+        """Get realized P&L per ticker (like the realized_pnl_summary view)."""
+        summary = []
+        with self._lock:
+            for ticker in sorted(self.realized_pnl):
+                rows = self.realized_pnl[ticker]
+                if not rows:
+                    continue
+                summary.append({
+                    'ticker': ticker,
+                    'quantity_sold': sum(r['quantity'] for r in rows),
+                    'proceeds': sum(r['proceeds'] for r in rows),
+                    'cost': sum(r['cost'] for r in rows),
+                    'realized_pnl': sum(r['realized'] for r in rows),
+                    'last_sale_date': max(r['closed_at'] for r in rows),
+                })
+        return _project(summary, columns)
+
+    def get_lot_method(self) -> str:
+        """Get the cost basis method ('FIFO' or 'AVERAGE')."""
+        with self._lock:
+            return self.lot_method
+
+    def set_lot_method(self, method: str):
+        """Switch the cost basis method and replay every ticker."""
+        if method not in LOT_METHODS:
+            raise ValueError(f'Unknown lot method: {method}')
+        with self._lock:
+            self.lot_method = method
+            self._rebuild_lots()
+
+    # ----- Prices -----
+
+    def upsert_current_price(self, ticker: str, price: float, currency: str = 'USD'):
+        """Update or insert current price for a ticker."""
+        self.upsert_current_prices([{'ticker': ticker, 'price': price, 'currency': currency}])
+
+    def insert_price_history(self, ticker: str, price: float, currency: str = 'USD'):
+        """Insert a price history record."""
+        self.insert_price_history_batch([{'ticker': ticker, 'price': price, 'currency': currency}])
+
+    def upsert_current_prices(self, rows: list):
+        """Update or insert current prices for several tickers."""
+        updated_at = _now()
+        with self._lock:
+            for row in rows:
+                self.current_prices[row['ticker']] = {
+                    'ticker': row['ticker'],
+                    'price': float(row['price']),
+                    'currency': row.get('currency', 'USD'),
+                    'updated_at': updated_at,
+                }
+
+    def insert_price_history_batch(self, rows: list):
+        """Insert several price history records."""
+        with self._lock:
+            for row in rows:
+                record = {
+                    'id': self._next_id('price_history'),
+                    'ticker': row['ticker'],
+                    'price': float(row['price']),
+                    'currency': row.get('currency', 'USD'),
+                    'recorded_at': _timestamp(row['recorded_at']) if row.get('recorded_at') else _now(),
+                }
+                bisect.insort(
+                    self.price_history.setdefault(row['ticker'], []), record,
+                    key=lambda r: (r['recorded_at'], r['id'])
+                )
+                daily = self.price_daily.setdefault(row['ticker'], {})
+                day = record['recorded_at'][:10]
+                daily[day] = merge_daily_bar(daily.get(day), record)
+
+    def get_current_prices(self) -> dict:
+        """Get all current prices as dict {ticker: price}."""
+        with self._lock:
+            return {ticker: row['price'] for ticker, row in self.current_prices.items()}
+
+    def get_price_history(self, ticker: str, days: Optional[int] = 365,
+                          points: int = 300,
+                          bucket: Optional[timedelta] = None) -> list:
+        """Get a ticker's price history as OHLC buckets, oldest first."""
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            history = self.price_history.get(ticker, [])
+            if days:
+                cutoff = _timestamp(now - timedelta(days=days))
+                history = history[bisect.bisect_left(history, cutoff, key=lambda r: r['recorded_at']):]
+            history = [dict(row) for row in history]
+            bars = sorted(self.price_daily.get(ticker, {}).values(), key=lambda r: r['day'])
+        if days:
+            start = now - timedelta(days=days)
+        elif bars:
+            start = datetime.fromisoformat(bars[0]['day']).replace(tzinfo=timezone.utc)
+        elif history:
+            start = datetime.fromisoformat(history[0]['recorded_at'])
+        else:
+            return []
+        width = bucket or max((now - start) / max(points, 1), timedelta(minutes=1))
+
+        # Buckets of a day or more come from the daily bars, like the RPC
+        if width >= timedelta(days=1):
+            start = start.replace(hour=0, minute=0, second=0, microsecond=0)
+            bars = [bar for bar in bars if bar['day'] >= start.date().isoformat()]
+            return downsample_daily(bars, start, width)
+        return downsample_ohlc(history, start, width)
+
+    def get_price_daily(self, ticker: str, days: Optional[int] = 365) -> list:
+        """Get daily OHLC rows of a ticker, oldest first."""
+        since = (date.today() - timedelta(days=days)).isoformat() if days else ''
+        with self._lock:
+            bars = sorted(self.price_daily.get(ticker, {}).values(), key=lambda r: r['day'])
+        return _project([bar for bar in bars if bar['day'] >= since],
+                        'day, open, high, low, close, n')
+
+    def get_latest_close_before(self, ticker: str, day: date) -> Optional[float]:
+        """Get the daily close of a ticker on the last day strictly before a date."""
+        with self._lock:
+            earlier = [d for d in self.price_daily.get(ticker, {}) if d < _day(day)]
+            return self.price_daily[ticker][max(earlier)]['close'] if earlier else None
+
+    def maintain_price_history(self, raw_days: int = db.PRICE_HISTORY_RAW_DAYS,
+                               months_ahead: int = 2) -> dict:
+        """Drop whole months older than the raw window (price_daily already has them)."""
+        raw_since = datetime.now(timezone.utc) - timedelta(days=raw_days)
+        # Start of the oldest month that is kept raw
+        cutoff = _timestamp(raw_since.replace(day=1, hour=0, minute=0, second=0, microsecond=0))
+
+        months = set()
+        rolled = 0
+        with self._lock:
+            for ticker, history in self.price_history.items():
+                index = bisect.bisect_left(history, cutoff, key=lambda r: r['recorded_at'])
+                if not index:
+                    continue
+                expired = history[:index]
+                del history[:index]
+                months.update(row['recorded_at'][:7] for row in expired)
+                rolled += len({row['recorded_at'][:10] for row in expired})
+
+        return {'partitions_created': 0, 'partitions_dropped': len(months), 'daily_rows': rolled}
+
+    # ----- FX Rates -----
+
+    def upsert_current_fx_rate(self, pair: str, rate: float):
+        """Update or insert current FX rate."""
+        with self._lock:
+            self.current_fx_rates[pair] = {'pair': pair, 'rate': float(rate), 'updated_at': _now()}
+
+    def insert_fx_history(self, pair: str, rate: float):
+        """Insert FX rate history record."""
+        with self._lock:
+            self.fx_rates.append({
+                'id': self._next_id('fx_rates'), 'pair': pair,
+                'rate': float(rate), 'recorded_at': _now(),
+            })
+
+    def get_current_fx_rate(self, pair: str) -> Optional[float]:
+        """Get current FX rate for a pair."""
+        with self._lock:
+            row = self.current_fx_rates.get(pair)
+            return row['rate'] if row else None
+
+    # ----- Dividends -----
+
+    def upsert_dividend(self, ticker: str, payment_date: date, dividend_per_share: float,
+                        shares_at_date: float, total_received: float, currency: str = 'USD'):
+        """Insert or update dividend record."""
+        key = (ticker, _day(payment_date))
+        with self._lock:
+            existing = self.dividends.get(key)
+            self.dividends[key] = {
+                'id': existing['id'] if existing else self._next_id('dividends'),
+                'ticker': ticker,
+                'payment_date': key[1],
+                'dividend_per_share': float(dividend_per_share),
+                'shares_at_date': float(shares_at_date),
+                'total_received': float(total_received),
+                'currency': currency,
+                'calculated_at': _now(),
+            }
+
+    def delete_dividend(self, ticker: str, payment_date: date):
+        """Delete the dividend record of a ticker on a payment date."""
+        with self._lock:
+            self.dividends.pop((ticker, _day(payment_date)), None)
+
+    def get_dividends(self, ticker: Optional[str] = None, columns: str = '*') -> list:
+        """Get dividends, newest payment first, optionally filtered by ticker."""
+        with self._lock:
+            rows = [
+                row for row in self.dividends.values()
+                if ticker is None or row['ticker'] == ticker
+            ]
+        rows.sort(key=lambda r: (r['payment_date'], r['id']), reverse=True)
+        return _project(rows, columns)
+
+    def get_dividends_frame(self, columns: str, ticker: Optional[str] = None,
+                            limit: Optional[int] = None) -> pd.DataFrame:
+        """Get dividends as a typed frame, newest first; limit keeps only the latest rows."""
+        rows = self.get_dividends(ticker, columns)
+        return db.to_frame(rows[:limit] if limit else rows, columns)
+
+    # ----- Views -----
+
+    def _holdings(self) -> list:
+        """Rows of the holdings_with_value view."""
+        with self._lock:
+            transactions = list(self.transactions.values())
+            prices = dict(self.current_prices)
+            lot_costs = {
+                ticker: sum(lot['remaining'] * lot['cost_per_share']
+                            for lot in lots if lot['remaining'] > 0)
+                for ticker, lots in self.tax_lots.items()
+            }
+
+        groups = {}
+        for tx in transactions:
+            h = groups.setdefault(tx['ticker'], {
+                'ticker': tx['ticker'], 'name': None, 'asset_type': None,
+                'shares': 0.0, 'first_buy_date': None, 'last_buy_date': None,
+            })
+            # MAX(name) / MAX(asset_type)
+            for field in ('name', 'asset_type'):
+                if tx[field] is not None and (h[field] is None or tx[field] > h[field]):
+                    h[field] = tx[field]
+            sign = 1 if tx['type'] == 'BUY' else -1
+            h['shares'] += sign * tx['quantity']
+            if tx['type'] == 'BUY':
+                h['first_buy_date'] = min(filter(None, (h['first_buy_date'], tx['date'])))
+                h['last_buy_date'] = max(filter(None, (h['last_buy_date'], tx['date'])))
+
+        holdings = []
+        for h in groups.values():
+            if h['shares'] <= 0:
+                continue
+            # Cost basis of the open lots
+            h['total_cost'] = lot_costs.get(h['ticker'], 0.0)
+            price_row = prices.get(h['ticker'])
+            price = price_row['price'] if price_row else None
+            value = h['shares'] * price if price is not None else None
+            pnl = value - h['total_cost'] if value is not None else None
+            holdings.append({
+                'ticker': h['ticker'],
+                'name': h['name'],
+                'asset_type': h['asset_type'],
+                'shares': h['shares'],
+                'avg_buy_price': h['total_cost'] / h['shares'],
+                'total_cost': h['total_cost'],
+                'first_buy_date': h['first_buy_date'],
+                'last_buy_date': h['last_buy_date'],
+                'current_price': price,
+                'price_updated_at': price_row['updated_at'] if price_row else None,
+                'current_value': value,
+                'pnl': pnl,
+                'pnl_percent': (pnl / h['total_cost'] * 100
+                                if pnl is not None and h['total_cost'] > 0 else 0.0),
+            })
+        return holdings
+
+    def get_holdings_with_value(self, columns: str = '*') -> list:
+        """Get holdings with current value and P&L."""
+        return _project(self._holdings(), columns)
+
+    def get_holdings_frame(self, columns: str) -> pd.DataFrame:
+        """Get holdings with value as a typed frame."""
+        return db.to_frame(self.get_holdings_with_value(columns), columns)
+
+    def get_portfolio_summary(self, columns: str = '*') -> dict:
+        """Get portfolio summary, numeric fields as floats (0.0 if NULL)."""
+        holdings = self._holdings()
+        values = [h['current_value'] for h in holdings if h['current_value'] is not None]
+        pnls = [h['pnl'] for h in holdings if h['pnl'] is not None]
+        total_cost = sum(h['total_cost'] for h in holdings)
+        summary = {
+            'total_value': sum(values) if values else None,
+            'total_invested': total_cost if holdings else None,
+            'total_pnl': sum(pnls) if pnls else None,
+            'total_pnl_percent': sum(pnls) / total_cost * 100 if pnls and total_cost > 0 else 0,
+            'num_holdings': len(holdings),
+        }
+        return db.summary_row(db.to_frame(_project([summary], columns), columns))
+
+    def get_dividend_summary(self, columns: str = '*') -> list:
+        """Get dividend summary by ticker."""
+        summary = {}
+        for row in self.get_dividends():
+            s = summary.setdefault(row['ticker'], {
+                'ticker': row['ticker'], 'total_dividends': 0.0, 'dividend_count': 0,
+                'last_dividend_date': row['payment_date'],
+                'first_dividend_date': row['payment_date'],
+            })
+            s['total_dividends'] += row['total_received']
+            s['dividend_count'] += 1
+            s['last_dividend_date'] = max(s['last_dividend_date'], row['payment_date'])
+            s['first_dividend_date'] = min(s['first_dividend_date'], row['payment_date'])
+        return _project(list(summary.values()), columns)
+
+    def get_dividend_summary_frame(self, columns: str) -> pd.DataFrame:
+        """Get dividend summary by ticker as a typed frame."""
+        return db.to_frame(self.get_dividend_summary(columns), columns)
+
+    def get_dividends_by_year(self, columns: str = '*') -> list:
+        """Get dividends aggregated by year and ticker, latest year and largest first."""
+        groups = {}
+        for row in self.get_dividends():
+            key = (int(row['payment_date'][:4]), row['ticker'])
+            g = groups.setdefault(key, {
+                'year': key[0], 'ticker': key[1], 'total_received': 0.0, 'payments': 0,
+            })
+            g['total_received'] += row['total_received']
+            g['payments'] += 1
+        rows = sorted(groups.values(), key=lambda g: (-g['year'], -g['total_received']))
+        return _project(rows, columns)
+
+    def get_dividends_by_year_frame(self, columns: str) -> pd.DataFrame:
+        """Get dividends aggregated by year and ticker as a typed frame."""
+        return db.to_frame(self.get_dividends_by_year(columns), columns)
+
+    def get_dashboard_bundle(self, days: Optional[int] = 365) -> dict:
+        """Get holdings, summary totals and a snapshot window (see dashboard_bundle)."""
+        return {
+            'holdings': self.get_holdings_frame(db.DASHBOARD_HOLDING_COLUMNS),
+            'summary': self.get_portfolio_summary(),
+            'snapshots': self.get_portfolio_snapshots_frame(db.DASHBOARD_SNAPSHOT_COLUMNS, days),
+        }
+
+    # ----- Portfolio Snapshots -----
+
+    def insert_portfolio_snapshot(self, snapshot_date: date, total_value: float,
+                                  total_cost: float, recorded_at: Optional[datetime] = None):
+        """Insert or update portfolio snapshot."""
+        key = _day(snapshot_date)
+        with self._lock:
+            existing = self.portfolio_snapshots.get(key)
+            self.portfolio_snapshots[key] = {
+                'id': existing['id'] if existing else self._next_id('portfolio_snapshots'),
+                'snapshot_date': key,
+                'total_value': float(total_value),
+                'total_cost': float(total_cost),
+                'recorded_at': _timestamp(recorded_at) if recorded_at else _now(),
+                'updated_at': _now(),
+            }
+
+    def backfill_portfolio_snapshots(self, start: Optional[date] = None,
+                                     end: Optional[date] = None,
+                                     overwrite: bool = False) -> int:
+        """Fill daily snapshots from the ledger and daily closes, like the RPC."""
+        with self._lock:
+            ordered = self._sorted_transactions()
+            method = self.lot_method
+            closes = {
+                ticker: sorted((day, bar['close']) for day, bar in bars.items())
+                for ticker, bars in self.price_daily.items()
+            }
+        if not ordered:
+            return 0
+        start = start or date.fromisoformat(ordered[0]['date'][:10])
+        end = end or date.today() - timedelta(days=1)
+
+        written = 0
+        lots = {}
+        positions = {}
+        index = 0
+        day = start
+        while day <= end:
+            key = day.isoformat()
+            # Apply every transaction up to the end of the day to its lots
+            while index < len(ordered) and ordered[index]['date'][:10] <= key:
+                tx = ordered[index]
+                ticker_lots = lots.setdefault(tx['ticker'], [])
+                apply_lot_transaction(ticker_lots, tx, method)
+                positions[tx['ticker']] = lot_position(ticker_lots)
+                index += 1
+
+            open_positions = {t: p for t, p in positions.items() if p[0] > 0}
+            if open_positions and (overwrite or key not in self.portfolio_snapshots):
+                total_value = 0.0
+                for ticker, (shares, _) in open_positions.items():
+                    series = closes.get(ticker, [])
+                    at = bisect.bisect_right(series, (key, math.inf))
+                    if at:
+                        total_value += shares * series[at - 1][1]
+                total_cost = sum(cost for _, cost in open_positions.values())
+                self.insert_portfolio_snapshot(day, total_value, total_cost)
+                written += 1
+            day += timedelta(days=1)
+        return written
+
+    def get_portfolio_snapshots(self, days: Optional[int] = None, columns: str = '*',
+                                points: Optional[int] = None,
+                                bucket_days: Optional[int] = None) -> list:
+        """Get portfolio snapshots, oldest first (last per bucket with points/bucket_days)."""
+        from_date = (date.today() - timedelta(days=days)).isoformat() if days else ''
+        with self._lock:
+            rows = [
+                row for key, row in sorted(self.portfolio_snapshots.items())
+                if key >= from_date
+            ]
+
+        if (points is not None or bucket_days is not None) and rows:
+            start = date.fromisoformat(from_date or rows[0]['snapshot_date'])
+            width = bucket_days or snapshot_bucket_days((date.today() - start).days, points)
+            rows = downsample_last(rows, start, width)
+        return _project(rows, columns)
+
+    def get_portfolio_snapshots_frame(self, columns: str, days: Optional[int] = None,
+                                      points: Optional[int] = None,
+                                      bucket_days: Optional[int] = None) -> pd.DataFrame:
+        """Get portfolio snapshots as a typed frame, oldest first."""
+        rows = self.get_portfolio_snapshots(days, columns, points, bucket_days)
+        return db.to_frame(rows, columns)
+
+    # ----- Refresh State / Ledger Changes / Pipeline Runs -----
+
+    def get_refresh_state(self) -> dict:
+        """Get last run time per refresh tier/job as dict {name: datetime}."""
+        with self._lock:
+            return dict(self.refresh_state)
+
+    def mark_refreshed(self, names: list[str]):
+        """Record that refresh tiers/jobs ran now."""
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            for name in names:
+                self.refresh_state[name] = now
+
+    def get_pending_ledger_changes(self, limit: int = 1000) -> list:
+        """Get unprocessed ledger changes in the order they happened."""
+        with self._lock:
+            pending = [c for c in self.ledger_changes if c['processed_at'] is None]
+            return [dict(c) for c in pending[:limit]]
+
+    def mark_ledger_changes_processed(self, change_ids: list[int]):
+        """Mark ledger changes as applied."""
+        ids = set(change_ids)
+        now = _now()
+        with self._lock:
+            for change in self.ledger_changes:
+                if change['id'] in ids:
+                    change['processed_at'] = now
+
+    def insert_pipeline_run(self, report: dict):
+        """Store a pipeline run report."""
+        with self._lock:
+            self.pipeline_runs.append({
+                'id': self._next_id('pipeline_runs'),
+                'started_at': report['started_at'],
+                'finished_at': report['finished_at'],
+                'status': report['status'],
+                'duration_seconds': report['duration_seconds'],
+                'report': report,
+            })
+
+    # ----- Synthetic data -----
+
+    @classmethod
+    def synthetic(cls, tickers: int = 20, transactions: int = 200, days: int = 365,
+                  prices_per_day: int = 1, seed: int = 0) -> 'InMemoryRepository':
+        """
+        Build a repository filled with a reproducible synthetic portfolio.
+
+        Prices follow a random walk per ticker; transactions are mostly buys
+        (sells never exceed the position); stocks pay quarterly dividends and
+        there is one snapshot per day. Nothing is left in the ledger log.
+
+        Args:
+            tickers: Number of tickers
+            transactions: Number of transactions across all tickers
+            days: Length of the price/snapshot history
+            prices_per_day: Price history rows per ticker per day
+            seed: Random seed
+
+        Returns:
+            Populated InMemoryRepository
+        """
+        rng = random.Random(seed)
+        repo = cls()
+        today = date.today()
+        start = today - timedelta(days=days)
+
+        # Price paths: one close per day, plus intraday rows for price_history
+        closes = {}
+        history = []
+        symbols = []
+        for i in range(tickers):
+            asset_type = rng.choices(['STOCK', 'FUND', 'CRYPTO'], weights=[7, 2, 1])[0]
+            ticker = f'SYN{i:04d}-USD' if asset_type == 'CRYPTO' else f'SYN{i:04d}'
+            symbols.append((ticker, asset_type))
+            price = rng.uniform(5, 500)
+            closes[ticker] = []
+            for offset in range(days + 1):
+                day = start + timedelta(days=offset)
+                for step in range(prices_per_day):
+                    price = max(0.01, price * math.exp(rng.gauss(0.0003, 0.02)))
+                    recorded = datetime.combine(day, time(14), tzinfo=timezone.utc) + timedelta(
+                        hours=step * 24 / prices_per_day
+                    )
+                    history.append({'ticker': ticker, 'price': round(price, 4),
+                                    'recorded_at': recorded.isoformat()})
+                closes[ticker].append(round(price, 4))
+
+        repo.insert_price_history_batch(history)
+        repo.upsert_current_prices([
+            {'ticker': ticker, 'price': closes[ticker][-1]} for ticker, _ in symbols
+        ])
+
+        # Transactions, oldest first, never selling more than is held
+        positions = {ticker: 0.0 for ticker, _ in symbols}
+        tx_days = sorted(rng.randrange(days) for _ in range(transactions))
+        for n, offset in enumerate(tx_days):
+            ticker, asset_type = rng.choice(symbols)
+            price = closes[ticker][offset]
+            tx_type = 'SELL' if positions[ticker] > 0 and rng.random() < 0.2 else 'BUY'
+            quantity = round(rng.uniform(1, 50) if tx_type == 'BUY'
+                             else positions[ticker] * rng.uniform(0.1, 0.5), 8)
+            positions[ticker] += quantity if tx_type == 'BUY' else -quantity
+            tx_time = datetime.combine(start + timedelta(days=offset), time(15),
+                                       tzinfo=timezone.utc) + timedelta(seconds=n)
+            repo._insert_transaction({
+                'date': tx_time.isoformat(),
+                'ticker': ticker,
+                'name': f'Synthetic {ticker}',
+                'type': tx_type,
+                'asset_type': asset_type,
+                'quantity': quantity,
+                'price': price,
+                'total_amount': round(quantity * price, 4),
+                'platform': 'Synthetic',
+            }, log=False)
+
+        # Quarterly dividends for stocks
+        for ticker, asset_type in symbols:
+            if asset_type != 'STOCK':
+                continue
+            ticker_transactions = repo.get_transactions_for_ticker(ticker)
+            for offset in range(45, days + 1, 91):
+                pay_date = start + timedelta(days=offset)
+                shares = calculate_shares_at_date(ticker_transactions, ticker, pay_date)
+                if shares > 0:
+                    per_share = round(closes[ticker][offset] * 0.004, 6)
+                    repo.upsert_dividend(ticker, pay_date, per_share, shares, shares * per_share)
+
+        # Daily snapshots from a running replay of the lots
+        ordered = repo._sorted_transactions()
+        lots = {}
+        positions = {}
+        index = 0
+        for offset in range(days + 1):
+            day = start + timedelta(days=offset)
+            day_end = _timestamp(datetime.combine(day + timedelta(days=1), time.min))
+            while index < len(ordered) and ordered[index]['date'] < day_end:
+                tx = ordered[index]
+                ticker_lots = lots.setdefault(tx['ticker'], [])
+                apply_lot_transaction(ticker_lots, tx, repo.lot_method)
+                positions[tx['ticker']] = lot_position(ticker_lots)
+                index += 1
+            held = [t for t, (s, _) in positions.items() if s > 0]
+            if held:
+                repo.insert_portfolio_snapshot(
+                    day,
+                    sum(positions[t][0] * closes[t][offset] for t in held),
+                    sum(positions[t][1] for t in held),
+                )
+
+        return repo
+
+
+# ----- Backend selection -----
+
+_memory_repository: Optional[InMemoryRepository] = None
+_memory_lock = threading.Lock()
+
+
+def get_backend() -> str:
+    """Configured backend: 'supabase' (default) or 'memory'."""
+    return os.getenv('DARUMA_BACKEND', 'supabase')
+
+
+def get_repository():
+    """
+    Get the repository for the configured backend.
+
+    With DARUMA_BACKEND=memory a process-wide InMemoryRepository with
+    synthetic data is used; DARUMA_SYNTHETIC_SCALE=100 makes it 100 times
+    the default size (transactions scale linearly, tickers with the square
+    root).
+    """
+    global _memory_repository
+    backend = get_backend()
+
+    if backend == 'supabase':
+        return SupabaseRepository(db.get_client())
+    if backend != 'memory':
+        raise ValueError(f'Unknown DARUMA_BACKEND: {backend}')
+
+    if _memory_repository is None:
+        with _memory_lock:
+            if _memory_repository is None:
+                scale = int(os.getenv('DARUMA_SYNTHETIC_SCALE', '1'))
+                _memory_repository = InMemoryRepository.synthetic(
+                    tickers=20 * math.ceil(math.sqrt(scale)),
+                    transactions=200 * scale,
+                )
+    return _memory_repository
@@ -0,0 +1,120 @@
+"""
+Machine-readable report of one price update run.
+
+Collects stage durations, per-ticker fetch latency and retries, database
+round trips and bytes, rows written, and deferred/failed symbols.
+"""
+
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Optional
+
+from .supabase_client import get_db_stats
+
+# Upper bounds (seconds) of the fetch latency histogram buckets
+LATENCY_BUCKETS = [0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0]
+
+
+class RunReport:
+    """Accumulates metrics for one pipeline run."""
+
+    def __init__(self, trigger: str = 'cron'):
+        self.trigger = trigger
+        self.started_at = datetime.now(timezone.utc)
+        self._start = time.monotonic()
+        self._db_start = get_db_stats()
+        self._lock = threading.Lock()
+        self.stages = {}
+        self.fetches = {}
+        self.rows_written = {}
+        self.deferred = []
+        self.failed = []
+        self.tiers = []
+        self.jobs = []
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a pipeline stage."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.stages[name] = round(time.monotonic() - start, 3)
+
+    def record_fetch(self, ticker: str, seconds: float, attempts: int, ok: bool):
+        """Record one provider fetch (thread-safe)."""
+        with self._lock:
+            self.fetches[ticker] = {
+                'seconds': round(seconds, 3),
+                'attempts': attempts,
+                'ok': ok,
+            }
+
+    def add_rows(self, table: str, count: int):
+        """Count rows written to a table."""
+        with self._lock:
+            self.rows_written[table] = self.rows_written.get(table, 0) + count
+
+    def latency_histogram(self) -> dict:
+        """Fetch latency counts per bucket, keyed by upper bound."""
+        labels = [f'<={bound}s' for bound in LATENCY_BUCKETS] + [f'>{LATENCY_BUCKETS[-1]}s']
+        counts = dict.fromkeys(labels, 0)
+        for fetch in self.fetches.values():
+            for bound, label in zip(LATENCY_BUCKETS, labels):
+                if fetch['seconds'] <= bound:
+                    counts[label] += 1
+                    break
+            else:
+                counts[labels[-1]] += 1
+        return counts
+
+    def to_dict(self, status: str = 'ok', error: Optional[str] = None) -> dict:
+        """Build the JSON-serializable report."""
+        db_now = get_db_stats()
+        latencies = sorted(f['seconds'] for f in self.fetches.values())
+
+        return {
+            'trigger': self.trigger,
+            'status': status,
+            'error': error,
+            'started_at': self.started_at.isoformat(),
+            'finished_at': datetime.now(timezone.utc).isoformat(),
+            'duration_seconds': round(time.monotonic() - self._start, 3),
+            'tiers': self.tiers,
+            'jobs': self.jobs,
+            'stages': self.stages,
+            'fetch': {
+                'count': len(latencies),
+                'retries': sum(f['attempts'] - 1 for f in self.fetches.values()),
+                'p50_seconds': latencies[len(latencies) // 2] if latencies else None,
+                'max_seconds': latencies[-1] if latencies else None,
+                'histogram': self.latency_histogram(),
+                'per_ticker': self.fetches,
+            },
+            'db': {
+                'round_trips': db_now['round_trips'] - self._db_start['round_trips'],
+                'bytes_received': db_now['bytes_received'] - self._db_start['bytes_received'],
+            },
+            'rows_written': self.rows_written,
+            'deferred': sorted(self.deferred),
+            'failed': sorted(self.failed),
+        }
+
+
+def write_report_json(report: dict, report_dir: str) -> str:
+    """
+    Write a run report to report_dir as run_<timestamp>.json.
+
+    Returns:
+        Path of the written file
+    """
+    os.makedirs(report_dir, exist_ok=True)
+    started = datetime.fromisoformat(report['started_at'])
+    path = os.path.join(report_dir, f'run_{started.strftime("%Y%m%dT%H%M%SZ")}.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    return path
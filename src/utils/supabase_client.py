@@ -3,18 +3,55 @@ Supabase client and database operations.
 """
 
 import os
-from datetime import datetime, date
-from typing import Optional
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, date, timedelta, timezone
+from typing import Callable, Iterator, Optional
 from decimal import Decimal
 
+import pandas as pd
 from supabase import create_client, Client
+from supabase.lib.client_options import ClientOptions
 from dotenv import load_dotenv
 
+from .calculations import LOT_METHODS
+from .instrumentation import add_traffic, instrument_functions
+
 load_dotenv()
 
+# Process-wide PostgREST traffic counters (see get_db_stats)
+_db_stats = {'round_trips': 0, 'bytes_received': 0}
+_db_stats_lock = threading.Lock()
 
-def get_client() -> Client:
-    """Get Supabase client instance."""
+
+def _count_response(response):
+    """httpx response hook: count one round trip and its downloaded bytes."""
+    response.read()
+    with _db_stats_lock:
+        _db_stats['round_trips'] += 1
+        _db_stats['bytes_received'] += response.num_bytes_downloaded
+    add_traffic(response.num_bytes_downloaded)
+
+
+def _install_stats_hooks(client: Client):
+    """Attach traffic counters to the client's PostgREST HTTP session."""
+    try:
+        hooks = client.postgrest.session.event_hooks
+        hooks['response'] = list(hooks.get('response', [])) + [_count_response]
+    except AttributeError:
+        # Older/newer client layouts without an exposed httpx session
+        pass
+
+
+def get_db_stats() -> dict:
+    """Get a copy of the process-wide round trip and byte counters."""
+    with _db_stats_lock:
+        return dict(_db_stats)
+
+
+def _get_credentials() -> tuple:
+    """Read SUPABASE_URL and SUPABASE_KEY from Streamlit secrets or the environment."""
     url = None
     key = None
 
@@ -41,22 +78,420 @@ def get_client() -> Client:
     if not url or not key:
         raise ValueError('SUPABASE_URL and SUPABASE_KEY must be set')
 
-    return create_client(url, key)
+    return url, key
+
+
+def create_new_client() -> Client:
+    """Create a dedicated Supabase client (most callers want get_client)."""
+    url, key = _get_credentials()
+    options = ClientOptions(
+        headers={'Accept-Encoding': 'gzip'},
+        postgrest_client_timeout=30
+    )
+    client = create_client(url, key, options=options)
+    # Touching client.postgrest builds the HTTP session now, so threads
+    # sharing this client never race to create their own
+    _install_stats_hooks(client)
+    return client
+
+
+_client: Optional[Client] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> Client:
+    """
+    Get the process-wide Supabase client.
+
+    Created once and shared by every Streamlit session, thread and job in
+    the process. Its httpx session keeps connections alive in a pool, so
+    repeated queries skip the TLS handshake; responses are gzip-compressed.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = create_new_client()
+    return _client
+
+
+def reset_client():
+    """Drop the shared client so the next get_client() reconnects."""
+    global _client
+    with _client_lock:
+        _client = None
+
+
+# ----- Concurrent Queries -----
+
+# Shared pool for independent page queries (see gather)
+QUERY_WORKERS = int(os.getenv('DB_QUERY_WORKERS', '8'))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Get the process-wide query thread pool."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=QUERY_WORKERS, thread_name_prefix='db-query'
+                )
+    return _executor
+
+
+def gather(*calls: Callable) -> list:
+    """
+    Run independent queries concurrently and collect their results.
+
+    The calls share the pooled client, so the page waits for the slowest
+    query instead of the sum of all of them. Each call runs in a copy of
+    the caller's context (context variables carry over).
+
+    Args:
+        *calls: Zero-argument callables, e.g. lambda: get_dividend_summary(client)
+
+    Returns:
+        Results in the same order as calls
+
+    Raises:
+        The first exception raised by a call, after all calls finished
+    """
+    if len(calls) <= 1:
+        return [call() for call in calls]
+
+    executor = _get_executor()
+    futures = [executor.submit(contextvars.copy_context().run, call) for call in calls]
+    wait(futures)
+    return [future.result() for future in futures]
+
+
+# ----- Typed Frames -----
+
+# DECIMAL columns; PostgREST may return them as strings
+NUMERIC_COLUMNS = {
+    'quantity', 'price', 'total_amount', 'rate',
+    'dividend_per_share', 'shares_at_date', 'total_received', 'total_dividends',
+    'shares', 'avg_buy_price', 'total_cost', 'current_price', 'current_value',
+    'pnl', 'pnl_percent', 'total_value', 'total_invested', 'total_pnl',
+    'total_pnl_percent', 'open', 'high', 'low', 'close',
+}
+
+
+def _column_list(columns: str) -> list[str]:
+    """Split a select string like 'ticker, price' into column names."""
+    return [c.strip() for c in columns.split(',') if c.strip()]
+
+
+def _with_keys(columns: str, key: str) -> str:
+    """Make sure a projection includes the keyset columns."""
+    if columns.strip() == '*':
+        return columns
+    names = _column_list(columns)
+    for required in (key, 'id'):
+        if required not in names:
+            names.append(required)
+    return ', '.join(names)
+
+
+def to_frame(rows: list, columns: str = '*') -> pd.DataFrame:
+    """
+    Build a typed DataFrame from PostgREST rows.
+
+    Numeric columns are parsed in one vectorized pass per column, with
+    NULLs as 0.0 (the same as the float(x or 0) the pages used to do).
+
+    Args:
+        rows: Row dicts as returned by PostgREST
+        columns: Projection used for the query; fixes column order and
+            keeps the frame well-formed when there are no rows
+    """
+    names = None if columns.strip() == '*' else _column_list(columns)
+    frame = pd.DataFrame.from_records(rows, columns=names)
+    for column in frame.columns:
+        if column in NUMERIC_COLUMNS:
+            frame[column] = pd.to_numeric(frame[column], errors='coerce').fillna(0.0).astype(float)
+    return frame
+
+
+# Integer columns of one-row summaries (iloc[0] upcasts them to float)
+COUNT_COLUMNS = {'num_holdings'}
+
+
+def summary_row(frame: pd.DataFrame) -> dict:
+    """First row of a typed summary frame as a dict, with count columns as int."""
+    row = frame.iloc[0].to_dict()
+    for column in COUNT_COLUMNS & row.keys():
+        if pd.notna(row[column]):
+            row[column] = int(row[column])
+    return row
+
+
+def to_holding_rows(frame: pd.DataFrame) -> list:
+    """
+    Convert a holdings frame to the row dicts used by the pages.
+
+    A missing name falls back to the ticker and a missing asset type to
+    STOCK; avg_buy_price, pnl_percent and asset_type are renamed to
+    avg_price, pnl_pct and type.
+    """
+    frame = frame.assign(
+        name=frame['name'].mask(frame['name'].isna() | (frame['name'] == ''), frame['ticker']),
+        asset_type=frame['asset_type'].fillna('STOCK').replace('', 'STOCK')
+    )
+    return frame.rename(columns={
+        'avg_buy_price': 'avg_price',
+        'pnl_percent': 'pnl_pct',
+        'asset_type': 'type'
+    }).to_dict('records')
+
+
+# ----- Paging -----
+
+# Must not exceed the PostgREST max-rows setting (1000 on Supabase)
+DEFAULT_PAGE_SIZE = 1000
+
+
+def iter_pages(build_query: Callable, key: str, desc: bool = False,
+               page_size: int = DEFAULT_PAGE_SIZE,
+               tiebreak: str = 'id') -> Iterator[list]:
+    """
+    Yield fixed-size pages of rows using keyset pagination on (key, tiebreak).
+
+    Each page continues strictly after the last row of the previous one,
+    so results never silently stop at the PostgREST row limit and each
+    request stays an index range scan.
+
+    Args:
+        build_query: Returns a fresh filtered select; must select key and tiebreak
+        key: Sort column (equal to tiebreak to page by that column alone)
+        desc: Page newest/highest first
+        page_size: Rows per page
+        tiebreak: Column that is unique within the filtered rows
+
+    Yields:
+        Lists of up to page_size row dicts
+    """
+    op = 'lt' if desc else 'gt'
+    last = None
+
+    while True:
+        query = build_query()
+        if last is not None:
+            if key == tiebreak:
+                query = getattr(query, op)(tiebreak, last[tiebreak])
+            else:
+                value = f'"{last[key]}"'
+                query = query.or_(
+                    f'{key}.{op}.{value},'
+                    f'and({key}.eq.{value},{tiebreak}.{op}.{last[tiebreak]})'
+                )
+        if key != tiebreak:
+            query = query.order(key, desc=desc)
+        rows = query.order(tiebreak, desc=desc).limit(page_size).execute().data
+
+        if rows:
+            yield rows
+        if len(rows) < page_size:
+            return
+        last = rows[-1]
 
 
 # ----- Transactions -----
 
+def iter_transactions(client: Client, ticker: Optional[str] = None,
+                      desc: bool = False,
+                      page_size: int = DEFAULT_PAGE_SIZE,
+                      columns: str = '*') -> Iterator[list]:
+    """Yield pages of transactions ordered by (date, id)."""
+    def build_query():
+        query = client.table('transactions').select(_with_keys(columns, 'date'))
+        if ticker:
+            query = query.eq('ticker', ticker)
+        return query
+
+    return iter_pages(build_query, 'date', desc=desc, page_size=page_size)
+
+
 def get_all_transactions(client: Client) -> list:
-    """Get all transactions ordered by date."""
-    response = client.table('transactions').select('*').order('date', desc=True).execute()
-    return response.data
+    """Get all transactions ordered by date (newest first)."""
+    return [row for page in iter_transactions(client, desc=True) for row in page]
+
+
+def get_recent_transactions(client: Client, limit: int = 20, columns: str = '*') -> list:
+    """
+    Get the most recent transactions, newest first.
+
+    Selecting only the columns of idx_transactions_recent (id, date, ticker,
+    type, quantity, price, total_amount) makes this an index-only scan.
+    """
+    return next(iter_transactions(client, desc=True, page_size=limit, columns=columns), [])
+
+
+def get_transactions_for_ticker(client: Client, ticker: str, columns: str = '*') -> list:
+    """
+    Get all transactions of one ticker ordered by date.
+
+    Selecting only id, ticker, date, type, quantity and price makes this an
+    index-only scan of idx_transactions_ticker_date_covering.
+    """
+    pages = iter_transactions(client, ticker=ticker, columns=columns)
+    return [row for page in pages for row in page]
+
+
+def get_transactions_version(client: Client) -> tuple:
+    """
+    Get a cheap change marker for the transactions table.
+
+    Returns (row count, highest id, latest updated_at): inserts and deletes
+    change the first two, edits the last (sql/transactions_updated_at.sql).
+    """
+    response = client.table('transactions').select(
+        'id', count='exact'
+    ).order('id', desc=True).limit(1).execute()
+    max_id = response.data[0]['id'] if response.data else None
+    latest = client.table('transactions').select('updated_at').order(
+        'updated_at', desc=True
+    ).limit(1).execute()
+    updated_at = latest.data[0]['updated_at'] if latest.data else None
+    return (response.count, max_id, updated_at)
+
+
+def get_ticker_directory(client: Client) -> list:
+    """
+    Get one row per distinct ticker (ticker_directory RPC).
+
+    The distinct tickers are found with an index skip scan on the server,
+    so the cost grows with the number of tickers, not of transactions.
+
+    Returns:
+        List of {'ticker', 'name', 'asset_type', 'currency'} ordered by
+        ticker; name and asset type are the latest non-null values
+    """
+    return client.rpc('ticker_directory').execute().data or []
 
 
 def get_unique_tickers(client: Client) -> list[str]:
     """Get list of unique tickers from transactions."""
-    response = client.table('transactions').select('ticker').execute()
-    tickers = set(row['ticker'] for row in response.data)
-    return list(tickers)
+    return [row['ticker'] for row in get_ticker_directory(client)]
+
+
+def get_ticker_asset_types(client: Client) -> dict:
+    """Get asset type per ticker as dict {ticker: asset_type}."""
+    return {row['ticker']: row['asset_type'] for row in get_ticker_directory(client)}
+
+
+def get_holdings_at(client: Client, dates: list,
+                    tickers: Optional[list] = None) -> dict:
+    """
+    Get shares held per ticker at the end of each date (holdings_at RPC).
+
+    Computed on the server with running sums over the ledger, the same as
+    calculate_shares_at_date for every (ticker, date) pair.
+
+    Args:
+        client: Supabase client
+        dates: Dates (date objects or YYYY-MM-DD strings)
+        tickers: Only these tickers (all when omitted)
+
+    Returns:
+        Dict {YYYY-MM-DD: {ticker: shares}} with every requested date;
+        tickers with no open position are left out
+    """
+    days = sorted({d.isoformat() if isinstance(d, date) else str(d)[:10] for d in dates})
+    if not days:
+        return {}
+    params = {'p_dates': days}
+    if tickers is not None:
+        params['p_tickers'] = list(tickers)
+    data = client.rpc('holdings_at', params).execute().data or {}
+    return {
+        day: {ticker: float(shares) for ticker, shares in data.get(day, {}).items()}
+        for day in days
+    }
+
+
+def get_position_at(client: Client, ticker: str, day: date) -> tuple:
+    """
+    Get shares and cost of a ticker at the end of a (UTC) day.
+
+    One index probe of the position_ledger table, which the lot engine
+    writes with the open-lot cost basis; same result as
+    calculate_position_at_date over the ticker's transactions with the
+    current lot method.
+
+    Returns:
+        Tuple of (shares, total_cost); (0, 0) for a closed position
+    """
+    end = datetime.combine(day + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+    response = client.table('position_ledger').select('shares, total_cost').eq(
+        'ticker', ticker
+    ).lt(
+        'date', end.isoformat()
+    ).order('date', desc=True).order('transaction_id', desc=True).limit(1).execute()
+
+    if not response.data:
+        return (0.0, 0.0)
+    shares = float(response.data[0]['shares'])
+    if shares <= 0:
+        return (0.0, 0.0)
+    return (shares, float(response.data[0]['total_cost']))
+
+
+def rebuild_position_ledger(client: Client, tickers: Optional[list] = None) -> int:
+    """Replay the lots, and so position_ledger, of all or some tickers; returns transactions replayed."""
+    params = {} if tickers is None else {'p_tickers': list(tickers)}
+    return client.rpc('rebuild_position_ledger', params).execute().data
+
+
+def get_open_lots(client: Client, ticker: Optional[str] = None) -> list:
+    """
+    Get open tax lots (remaining > 0) in opening order.
+
+    Served by the idx_tax_lots_open partial index, so the cost is
+    proportional to the open lots, not to the ledger.
+
+    Args:
+        client: Supabase client
+        ticker: Only this ticker (all when omitted)
+
+    Returns:
+        List of lot dicts (transaction_id, ticker, opened_at, quantity,
+        remaining, cost_per_share)
+    """
+    def build_query():
+        query = client.table('tax_lots').select('*').gt('remaining', 0)
+        if ticker:
+            query = query.eq('ticker', ticker)
+        return query
+
+    return [row for page in iter_pages(build_query, 'opened_at') for row in page]
+
+
+def get_realized_pnl(client: Client, columns: str = '*') -> list:
+    """Get realized P&L per ticker from the realized_pnl_summary view."""
+    response = client.table('realized_pnl_summary').select(columns).execute()
+    return response.data
+
+
+def get_lot_method(client: Client) -> str:
+    """Get the cost basis method ('FIFO' or 'AVERAGE')."""
+    response = client.table('lot_settings').select('method').eq('id', True).execute()
+    return response.data[0]['method'] if response.data else 'FIFO'
+
+
+def set_lot_method(client: Client, method: str):
+    """
+    Switch the cost basis method ('FIFO' or 'AVERAGE').
+
+    Updating lot_settings replays the lots of every ticker on the server.
+    """
+    if method not in LOT_METHODS:
+        raise ValueError(f'Unknown lot method: {method}')
+    client.table('lot_settings').update({'method': method}).eq('id', True).execute()
 
 
 def insert_transaction(client: Client, transaction: dict) -> dict:
@@ -65,6 +500,52 @@ def insert_transaction(client: Client, transaction: dict) -> dict:
     return response.data[0] if response.data else None
 
 
+def insert_transactions(client: Client, rows: list, chunk_size: int = 500,
+                        ignore_duplicates: bool = False) -> dict:
+    """
+    Insert many transactions with one request per chunk.
+
+    When a chunk is rejected it is split in half and retried until the
+    failing rows are isolated, so one bad row never blocks the others.
+
+    Args:
+        client: Supabase client
+        rows: Transaction dicts (same keys in every row)
+        chunk_size: Rows per insert request
+        ignore_duplicates: Skip rows whose fingerprint already exists
+            (requires sql/transaction_fingerprint.sql)
+
+    Returns:
+        Dict with 'inserted' (rows returned by the database, duplicates
+        excluded) and 'failed' (list of {'row', 'error'} per rejected row)
+    """
+    inserted = []
+    failed = []
+
+    def insert_chunk(chunk: list):
+        try:
+            if ignore_duplicates:
+                query = client.table('transactions').upsert(
+                    chunk, on_conflict='fingerprint', ignore_duplicates=True
+                )
+            else:
+                query = client.table('transactions').insert(chunk)
+            response = query.execute()
+            inserted.extend(response.data or [])
+        except Exception as e:
+            if len(chunk) == 1:
+                failed.append({'row': chunk[0], 'error': str(e)})
+                return
+            middle = len(chunk) // 2
+            insert_chunk(chunk[:middle])
+            insert_chunk(chunk[middle:])
+
+    for start in range(0, len(rows), chunk_size):
+        insert_chunk(rows[start:start + chunk_size])
+
+    return {'inserted': inserted, 'failed': failed}
+
+
 def delete_transaction(client: Client, transaction_id: int) -> bool:
     """Delete a transaction by ID."""
     response = client.table('transactions').delete().eq('id', transaction_id).execute()
@@ -72,7 +553,12 @@ def delete_transaction(client: Client, transaction_id: int) -> bool:
 
 
 def transaction_exists(client: Client, ticker: str, date_str: str, quantity: float) -> bool:
-    """Check if a transaction already exists (for deduplication)."""
+    """
+    Check if a transaction already exists.
+
+    Bulk imports deduplicate with insert_transactions(ignore_duplicates=True)
+    instead of calling this once per row.
+    """
     response = client.table('transactions').select('id').eq(
         'ticker', ticker
     ).eq(
@@ -106,24 +592,115 @@ def insert_price_history(client: Client, ticker: str, price: float, currency: st
     client.table('price_history').insert(data).execute()
 
 
+def upsert_current_prices(client: Client, rows: list):
+    """Update or insert current prices for several tickers in one request."""
+    if not rows:
+        return
+    updated_at = datetime.utcnow().isoformat()
+    data = [
+        {'currency': 'USD', **row, 'updated_at': updated_at}
+        for row in rows
+    ]
+    client.table('current_prices').upsert(data).execute()
+
+
+def insert_price_history_batch(client: Client, rows: list):
+    """Insert several price history records in one request."""
+    if not rows:
+        return
+    data = [{'currency': 'USD', **row} for row in rows]
+    client.table('price_history').insert(data).execute()
+
+
 def get_current_prices(client: Client) -> dict:
     """Get all current prices as dict {ticker: price}."""
     response = client.table('current_prices').select('ticker, price').execute()
     return {row['ticker']: float(row['price']) for row in response.data}
 
 
-def get_price_history(client: Client, ticker: str, days: int = 365) -> list:
-    """Get price history for a ticker."""
-    from datetime import timedelta
-    from_date = None
-    if days:
-        from_date = datetime.utcnow() - timedelta(days=days)
+def get_price_history(client: Client, ticker: str, days: Optional[int] = 365,
+                      points: int = 300,
+                      bucket: Optional[timedelta] = None) -> list:
+    """
+    Get a ticker's price history as a chart series, oldest first.
+
+    Downsampled on the server (price_history_buckets RPC): one OHLC row
+    per bucket whose 'price' is the close and 'recorded_at' the time of
+    the last price in the bucket. No page charts single tickers yet; this
+    is the read path for one, so raw rows never have to be paged in.
+
+    Args:
+        client: Supabase client
+        ticker: Ticker symbol
+        days: Window in days (None for all history)
+        points: Target number of buckets
+        bucket: Bucket width (takes precedence over points)
+    """
+    params = {'p_ticker': ticker, 'p_days': days, 'p_points': points}
+    if bucket is not None:
+        params['p_bucket'] = f'{int(bucket.total_seconds())} seconds'
+    return client.rpc('price_history_buckets', params).execute().data or []
+
+
+def get_price_daily(client: Client, ticker: str, days: Optional[int] = 365) -> list:
+    """
+    Get daily OHLC rows of a ticker (price_daily), oldest first.
+
+    Args:
+        client: Supabase client
+        ticker: Ticker symbol
+        days: Window in days (None for all history)
+    """
+    since = (date.today() - timedelta(days=days)).isoformat() if days else None
+
+    def build_query():
+        query = client.table('price_daily').select(
+            'day, open, high, low, close, n'
+        ).eq('ticker', ticker)
+        if since:
+            query = query.gte('day', since)
+        return query
+
+    # day is unique per ticker, so it is its own tiebreaker
+    return [row for page in iter_pages(build_query, 'day', tiebreak='day') for row in page]
 
-    query = client.table('price_history').select('*').eq('ticker', ticker)
-    if from_date:
-        query = query.gte('recorded_at', from_date.isoformat())
 
-    response = query.order('recorded_at').execute()
+def get_latest_close_before(client: Client, ticker: str, day: date) -> Optional[float]:
+    """Get the daily close of a ticker on the last day strictly before a date."""
+    response = client.table('price_daily').select('close').eq(
+        'ticker', ticker
+    ).lt(
+        'day', day.isoformat()
+    ).order('day', desc=True).limit(1).execute()
+    if response.data:
+        return float(response.data[0]['close'])
+    return None
+
+
+# Raw price rows older than this many days are kept only as daily OHLC
+PRICE_HISTORY_RAW_DAYS = int(os.getenv('PRICE_HISTORY_RAW_DAYS', '90'))
+
+
+def maintain_price_history(client: Client, raw_days: int = PRICE_HISTORY_RAW_DAYS,
+                           months_ahead: int = 2) -> dict:
+    """
+    Run the price_history partition maintenance (maintain_price_history RPC).
+
+    Creates the partitions of the next months, rolls partitions older than
+    the raw window up into price_daily and drops them. Idempotent.
+
+    Args:
+        client: Supabase client
+        raw_days: Days of raw (intraday) rows to keep
+        months_ahead: Future monthly partitions to create
+
+    Returns:
+        Dict with 'partitions_created', 'partitions_dropped' and 'daily_rows'
+    """
+    response = client.rpc('maintain_price_history', {
+        'p_raw_days': raw_days,
+        'p_months_ahead': months_ahead
+    }).execute()
     return response.data
 
 
@@ -177,50 +754,132 @@ def upsert_dividend(client: Client, ticker: str, payment_date: date,
     ).execute()
 
 
-def get_dividends(client: Client, ticker: Optional[str] = None) -> list:
+def delete_dividend(client: Client, ticker: str, payment_date: date):
+    """Delete the dividend record of a ticker on a payment date."""
+    client.table('dividends').delete().eq(
+        'ticker', ticker
+    ).eq(
+        'payment_date', payment_date.isoformat()
+    ).execute()
+
+
+def iter_dividends(client: Client, ticker: Optional[str] = None,
+                   page_size: int = DEFAULT_PAGE_SIZE,
+                   columns: str = '*') -> Iterator[list]:
+    """Yield pages of dividends, newest payment first."""
+    select = _with_keys(columns, 'payment_date')
+
+    def build_query():
+        query = client.table('dividends').select(select)
+        if ticker:
+            query = query.eq('ticker', ticker)
+        return query
+
+    return iter_pages(build_query, 'payment_date', desc=True, page_size=page_size)
+
+
+def get_dividends(client: Client, ticker: Optional[str] = None,
+                  columns: str = '*') -> list:
     """Get dividends, optionally filtered by ticker."""
-    query = client.table('dividends').select('*')
-    if ticker:
-        query = query.eq('ticker', ticker)
-    response = query.order('payment_date', desc=True).execute()
-    return response.data
+    return [row for page in iter_dividends(client, ticker, columns=columns) for row in page]
+
+
+def get_dividends_frame(client: Client, columns: str, ticker: Optional[str] = None,
+                        limit: Optional[int] = None) -> pd.DataFrame:
+    """Get dividends as a typed frame, newest first; limit keeps only the latest rows."""
+    if limit:
+        rows = next(iter_dividends(client, ticker, page_size=limit, columns=columns), [])
+    else:
+        rows = get_dividends(client, ticker, columns=columns)
+    return to_frame(rows, columns)
 
 
 # ----- Views (read-only) -----
 
-def get_holdings_with_value(client: Client) -> list:
+# Columns returned by the dashboard_bundle RPC (sql/dashboard_bundle.sql)
+DASHBOARD_HOLDING_COLUMNS = (
+    'ticker, name, asset_type, shares, avg_buy_price, total_cost, '
+    'current_price, current_value, pnl, pnl_percent'
+)
+DASHBOARD_SNAPSHOT_COLUMNS = 'snapshot_date, total_value, total_cost'
+
+
+def get_holdings_with_value(client: Client, columns: str = '*') -> list:
     """Get holdings with current value and P&L from view."""
-    response = client.table('holdings_with_value').select('*').execute()
+    response = client.table('holdings_with_value').select(columns).execute()
     return response.data
 
 
-def get_portfolio_summary(client: Client) -> dict:
-    """Get portfolio summary from view."""
-    response = client.table('portfolio_summary').select('*').execute()
-    return response.data[0] if response.data else {}
+def get_holdings_frame(client: Client, columns: str) -> pd.DataFrame:
+    """Get holdings with value as a typed frame."""
+    return to_frame(get_holdings_with_value(client, columns), columns)
+
+
+def get_portfolio_summary(client: Client, columns: str = '*') -> dict:
+    """Get portfolio summary from view, numeric fields as floats (0.0 if NULL)."""
+    response = client.table('portfolio_summary').select(columns).execute()
+    if not response.data:
+        return {}
+    return summary_row(to_frame(response.data, columns))
 
 
-def get_dividend_summary(client: Client) -> list:
+def get_dividend_summary(client: Client, columns: str = '*') -> list:
     """Get dividend summary by ticker from view."""
-    response = client.table('dividend_summary').select('*').execute()
+    response = client.table('dividend_summary').select(columns).execute()
     return response.data
 
 
-def get_dividends_by_year(client: Client) -> list:
+def get_dividend_summary_frame(client: Client, columns: str) -> pd.DataFrame:
+    """Get dividend summary by ticker as a typed frame."""
+    return to_frame(get_dividend_summary(client, columns), columns)
+
+
+def get_dividends_by_year(client: Client, columns: str = '*') -> list:
     """Get dividends aggregated by year from view."""
-    response = client.table('dividends_by_year').select('*').execute()
+    response = client.table('dividends_by_year').select(columns).execute()
     return response.data
 
 
+def get_dividends_by_year_frame(client: Client, columns: str) -> pd.DataFrame:
+    """Get dividends aggregated by year and ticker as a typed frame."""
+    return to_frame(get_dividends_by_year(client, columns), columns)
+
+
+def get_dashboard_bundle(client: Client, days: Optional[int] = 365) -> dict:
+    """
+    Get everything the Home page needs in one request (dashboard_bundle RPC).
+
+    Args:
+        client: Supabase client
+        days: Snapshot window in days (None for all snapshots)
+
+    Returns:
+        Dict with 'holdings' (typed frame of holdings_with_value),
+        'summary' (portfolio_summary totals as floats) and 'snapshots'
+        (typed frame of snapshot_date, total_value, total_cost, oldest first)
+    """
+    bundle = client.rpc('dashboard_bundle', {'p_days': days}).execute().data or {}
+    summary = to_frame([bundle['summary']]) if bundle.get('summary') else None
+    return {
+        'holdings': to_frame(bundle.get('holdings') or [], DASHBOARD_HOLDING_COLUMNS),
+        'summary': summary_row(summary) if summary is not None else {},
+        'snapshots': to_frame(bundle.get('snapshots') or [], DASHBOARD_SNAPSHOT_COLUMNS),
+    }
+
+
 # ----- Portfolio Snapshots -----
 
 def insert_portfolio_snapshot(client: Client, snapshot_date: date,
-                               total_value: float, total_cost: float):
+                               total_value: float, total_cost: float,
+                               recorded_at: Optional[datetime] = None):
     """Insert or update portfolio snapshot."""
+    if recorded_at is None:
+        recorded_at = datetime.now(timezone.utc)
     data = {
         'snapshot_date': snapshot_date.isoformat(),
         'total_value': total_value,
-        'total_cost': total_cost
+        'total_cost': total_cost,
+        'recorded_at': recorded_at.isoformat()
     }
     client.table('portfolio_snapshots').upsert(
         data,
@@ -228,12 +887,186 @@ def insert_portfolio_snapshot(client: Client, snapshot_date: date,
     ).execute()
 
 
-def get_portfolio_snapshots(client: Client, days: Optional[int] = None) -> list:
-    """Get portfolio snapshots for chart."""
-    from datetime import timedelta
-    query = client.table('portfolio_snapshots').select('*')
+def backfill_portfolio_snapshots(client: Client, start: Optional[date] = None,
+                                 end: Optional[date] = None,
+                                 overwrite: bool = False) -> int:
+    """
+    Fill daily portfolio snapshots for a date range on the server.
+
+    Values come from the ledger and the last daily close on or before each
+    day (backfill_portfolio_snapshots RPC), written in one statement.
+
+    Args:
+        client: Supabase client
+        start: First day (defaults to the first transaction)
+        end: Last day (defaults to yesterday)
+        overwrite: Replace snapshots that already exist
+
+    Returns:
+        Number of snapshots written
+    """
+    params = {'p_overwrite': overwrite}
+    if start is not None:
+        params['p_from'] = start.isoformat()
+    if end is not None:
+        params['p_to'] = end.isoformat()
+    return client.rpc('backfill_portfolio_snapshots', params).execute().data or 0
+
+
+def iter_portfolio_snapshots(client: Client, days: Optional[int] = None,
+                             page_size: int = DEFAULT_PAGE_SIZE,
+                             columns: str = '*') -> Iterator[list]:
+    """Yield pages of portfolio snapshots ordered by (snapshot_date, id)."""
+    from_date = None
     if days:
         from_date = date.today() - timedelta(days=days)
-        query = query.gte('snapshot_date', from_date.isoformat())
-    response = query.order('snapshot_date').execute()
+    select = _with_keys(columns, 'snapshot_date')
+
+    def build_query():
+        query = client.table('portfolio_snapshots').select(select)
+        if from_date:
+            query = query.gte('snapshot_date', from_date.isoformat())
+        return query
+
+    return iter_pages(build_query, 'snapshot_date', page_size=page_size)
+
+
+def get_portfolio_snapshots(client: Client, days: Optional[int] = None,
+                            columns: str = '*', points: Optional[int] = None,
+                            bucket_days: Optional[int] = None) -> list:
+    """
+    Get portfolio snapshots for chart, oldest first.
+
+    With points or bucket_days only the last snapshot of each bucket is
+    returned, selected on the server (portfolio_snapshot_buckets RPC).
+    """
+    if points is None and bucket_days is None:
+        pages = iter_portfolio_snapshots(client, days, columns=columns)
+        return [row for page in pages for row in page]
+
+    rows = client.rpc('portfolio_snapshot_buckets', {
+        'p_days': days,
+        'p_points': points or 300,
+        'p_bucket_days': bucket_days,
+    }).execute().data or []
+    if columns.strip() == '*':
+        return rows
+    names = _column_list(columns)
+    return [{name: row.get(name) for name in names} for row in rows]
+
+
+def get_portfolio_snapshots_frame(client: Client, columns: str,
+                                  days: Optional[int] = None,
+                                  points: Optional[int] = None,
+                                  bucket_days: Optional[int] = None) -> pd.DataFrame:
+    """Get portfolio snapshots as a typed frame, oldest first (optionally downsampled)."""
+    rows = get_portfolio_snapshots(client, days, columns=columns,
+                                   points=points, bucket_days=bucket_days)
+    return to_frame(rows, columns)
+
+
+# ----- Refresh State -----
+
+def get_refresh_state(client: Client) -> dict:
+    """Get last run time per refresh tier/job as dict {name: datetime}."""
+    response = client.table('refresh_state').select('name, last_run_at').execute()
+    return {
+        row['name']: datetime.fromisoformat(row['last_run_at'].replace('Z', '+00:00'))
+        for row in response.data
+    }
+
+
+def mark_refreshed(client: Client, names: list[str]):
+    """Record that refresh tiers/jobs ran now."""
+    if not names:
+        return
+    now = datetime.utcnow().isoformat() + '+00:00'
+    data = [{'name': name, 'last_run_at': now} for name in names]
+    client.table('refresh_state').upsert(data).execute()
+
+
+# ----- Ledger Changes -----
+
+def get_pending_ledger_changes(client: Client, limit: int = 1000) -> list:
+    """Get unprocessed ledger changes in the order they happened."""
+    response = client.table('ledger_changes').select('*').is_(
+        'processed_at', 'null'
+    ).order('id').limit(limit).execute()
     return response.data
+
+
+def mark_ledger_changes_processed(client: Client, change_ids: list[int]):
+    """Mark ledger changes as applied."""
+    if not change_ids:
+        return
+    client.table('ledger_changes').update({
+        'processed_at': datetime.utcnow().isoformat() + '+00:00'
+    }).in_('id', change_ids).execute()
+
+
+# ----- Pipeline Runs -----
+
+def insert_pipeline_run(client: Client, report: dict):
+    """Store a pipeline run report."""
+    data = {
+        'started_at': report['started_at'],
+        'finished_at': report['finished_at'],
+        'status': report['status'],
+        'duration_seconds': report['duration_seconds'],
+        'report': report
+    }
+    client.table('pipeline_runs').insert(data).execute()
+
+
+# ----- Incremental Sync -----
+
+def iter_rows_since(client: Client, table: str, column: str,
+                    since: Optional[str] = None,
+                    page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[list]:
+    """
+    Yield pages of rows changed at or after a watermark.
+
+    Args:
+        client: Supabase client
+        table: Table with an id column
+        column: Timestamp column that moves forward on every write
+        since: ISO watermark (None pulls the whole table)
+        page_size: Rows per page
+
+    Yields:
+        Lists of row dicts ordered by (column, id)
+    """
+    def build_query():
+        query = client.table(table).select('*')
+        if since:
+            query = query.gte(column, since)
+        return query
+
+    return iter_pages(build_query, column, page_size=page_size)
+
+
+def get_rows_since(client: Client, table: str, column: str,
+                   since: Optional[str] = None) -> list:
+    """Rows of a small keyed table (one row per ticker/pair) changed at or after since."""
+    query = client.table(table).select('*')
+    if since:
+        query = query.gte(column, since)
+    return query.order(column).execute().data
+
+
+def count_rows(client: Client, table: str, key: str = 'id') -> int:
+    """Count the rows of a table without downloading them."""
+    response = client.table(table).select(key, count='exact').limit(1).execute()
+    return response.count or 0
+
+
+# ----- Instrumentation -----
+
+# Every other public function records latency, rows and traffic per call
+# (lazy iter_* generators are measured through the functions consuming them)
+_UNINSTRUMENTED = {
+    'get_client', 'create_new_client', 'reset_client', 'get_db_stats',
+    'to_frame', 'summary_row', 'to_holding_rows', 'gather',
+} | {name for name in globals() if name.startswith('iter_')}
+
+instrument_functions(globals(), __name__, _UNINSTRUMENTED)